@@ -26,15 +26,93 @@
 # AUTHORS
 # Rachid RIAD, Hadrien TITEUX, Léopold FAVRE
 
-from .continuum import Continuum, GammaResults, Unit
-from .alignment import Alignment, UnitaryAlignment
-from .dissimilarity import *
-from .sampler import (AbstractContinuumSampler,
-                      ShuffleContinuumSampler,
-                      StatisticalContinuumSampler)
-from .cst import CorpusShufflingTool
-
-try:
+# The submodules (and numba, scipy or pyannote.core, that they import) are only loaded when one of their objects is
+# first used, so that importing pygamma_agreement, or running its command line tools, stays fast.
+import importlib
+import importlib.util
+from typing import TYPE_CHECKING
+
+_LAZY_OBJECTS = {
+    "continuum": ["Continuum", "GammaResults", "Unit", "warmup"],
+    "alignment": ["Alignment", "UnitaryAlignment"],
+    "dissimilarity": ["AbstractDissimilarity",
+                      "PositionalSporadicDissimilarity",
+                      "CategoricalDissimilarity",
+                      "AbsoluteCategoricalDissimilarity",
+                      "PrecomputedCategoricalDissimilarity",
+                      "LambdaCategoricalDissimilarity",
+                      "LevenshteinCategoricalDissimilarity",
+                      "OrdinalCategoricalDissimilarity",
+                      "NumericalCategoricalDissimilarity",
+                      "CombinedCategoricalDissimilarity",
+                      "PairwiseDissimilaritiesCache",
+                      "pairwise_dissimilarities_cache",
+                      "dissimilarity_dec",
+                      "batch_dissimilarity_dec",
+                      "array_fingerprint",
+                      "continuum_fingerprint",
+                      "BATCHED_DISSIMILARITIES_MIN_PAIRS",
+                      "PAIRWISE_CACHE_MAX_BYTES",
+                      "COMPILED_KERNELS_MAX_SIZE"],
+    "sampler": ["AbstractContinuumSampler", "ShuffleContinuumSampler", "StatisticalContinuumSampler"],
+    "cst": ["CorpusShufflingTool"],
+    "solvers": ["AbstractAlignmentSolver",
+                "AutoAlignmentSolver",
+                "HighsAlignmentSolver",
+                "MatchingAlignmentSolver",
+                "NativeAlignmentSolver",
+                "CBCAlignmentSolver",
+                "GLPKAlignmentSolver",
+                "SolverReport",
+                "SolverSession",
+                "register_solver",
+                "calibrate_solvers"],
+    "storage": ["ScratchStorage"],
+    "incremental": ["IncrementalAligner"],
+    "notebook": ["show_continuum", "show_alignment"],
+}
+_OBJECTS_MODULES = {name: module for module, names in _LAZY_OBJECTS.items() for name in names}
+
+# The notebook functions are only exported when matplotlib is installed
+__all__ = [name for module, names in _LAZY_OBJECTS.items() for name in names
+           if module != "notebook" or importlib.util.find_spec("matplotlib") is not None]
+
+
+def __getattr__(name: str):
+    module = _OBJECTS_MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    try:
+        value = getattr(importlib.import_module(f".{module}", __name__), name)
+    except ImportError as e:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r} ({e})") from e
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+if TYPE_CHECKING:
+    from .continuum import Continuum, GammaResults, Unit, warmup
+    from .alignment import Alignment, UnitaryAlignment
+    from .dissimilarity import *
+    from .sampler import (AbstractContinuumSampler,
+                          ShuffleContinuumSampler,
+                          StatisticalContinuumSampler)
+    from .cst import CorpusShufflingTool
+    from .solvers import (AbstractAlignmentSolver,
+                          AutoAlignmentSolver,
+                          HighsAlignmentSolver,
+                          MatchingAlignmentSolver,
+                          NativeAlignmentSolver,
+                          CBCAlignmentSolver,
+                          GLPKAlignmentSolver,
+                          SolverReport,
+                          SolverSession,
+                          register_solver,
+                          calibrate_solvers)
+    from .storage import ScratchStorage
+    from .incremental import IncrementalAligner
     from .notebook import show_continuum, show_alignment
-except ImportError:
-    pass
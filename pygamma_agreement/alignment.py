@@ -37,6 +37,7 @@ from sortedcontainers import SortedSet, SortedDict
 
 from .continuum import Continuum
 from .dissimilarity import AbstractDissimilarity, CombinedCategoricalDissimilarity
+from .solvers import SolverReport
 
 UnitsTuple = List[Tuple[str, Optional['Unit']]]
 
@@ -159,6 +160,8 @@ class Alignment(AbstractAlignment):
         self.unitary_alignments = list(unitary_alignments)
         self.continuum = continuum
         self._disorder: Optional[float] = disorder
+        # Set by the best alignment computation : how the alignment problem was solved
+        self.solver_report: Optional['SolverReport'] = None
 
         if not check_validity:
             return
@@ -192,6 +195,17 @@ class Alignment(AbstractAlignment):
         return SortedSet([annotator for annotator, _
                           in self.unitary_alignments[0].n_tuple])
 
+    @property
+    def gap(self) -> Optional[float]:
+        """
+        Relative optimality gap of the alignment : 0 if it is proven to be the best alignment, and otherwise
+        the relative difference between its disorder and a lower bound of the best alignment's disorder (e.g.,
+        when the solver reached its time limit). None if the alignment wasn't computed by a solver.
+        """
+        if self.solver_report is None:
+            return None
+        return self.solver_report.gap
+
     @property
     def categories(self):
         if self.continuum is not None:
@@ -40,7 +40,10 @@ from pygamma_agreement import (Continuum,
                                LevenshteinCategoricalDissimilarity,
                                NumericalCategoricalDissimilarity,
                                ShuffleContinuumSampler,
-                               CombinedCategoricalDissimilarity)
+                               CombinedCategoricalDissimilarity,
+                               warmup)
+from pygamma_agreement.solvers import SOLVERS, AutoAlignmentSolver, calibrate_solvers, default_calibration_path
+from pygamma_agreement.storage import DEFAULT_MEMORY_BUDGET, ScratchStorage
 
 
 class RawAndDefaultArgumentFormatter(RawTextHelpFormatter,
@@ -123,6 +126,68 @@ argparser.add_argument("-m", "--mathet-sampler",
                        action="store_true",
                        help="Set the expected dissimilarity sampler to the one \n"
                             "chosen by Mathet et Al.")
+argparser.add_argument("--solver", type=str, choices=[AutoAlignmentSolver.name] + list(SOLVERS),
+                       default=AutoAlignmentSolver.name,
+                       help="MIP solver used to find the best alignments. 'auto' picks \n"
+                            "the fastest installed solver for each problem's size \n"
+                            "(see the pygamma-agreement-calibrate command)")
+argparser.add_argument("--lp-first", action="store_true",
+                       help="Solve the LP relaxation of each alignment problem first, \n"
+                            "and skip the MIP solver when its solution is integral")
+argparser.add_argument("--time-limit", type=float, default=None,
+                       help="Maximal solving time (in seconds) of each best alignment. \n"
+                            "When it is reached, the best alignment found so far is used")
+argparser.add_argument("--mip-gap", type=float, default=None,
+                       help="Relative optimality gap at which the MIP solver stops \n"
+                            "(by default, the best alignments are found)")
+argparser.add_argument("--memory-budget", type=float, default=None,
+                       help="Maximal total size (in MiB) of the arrays of the alignment problems \n"
+                            "kept in memory : the ones that don't fit in it are stored in temporary files")
+argparser.add_argument("--scratch-dir", type=Path, default=None,
+                       help="Directory of the temporary files used when the memory \n"
+                            "budget is exceeded (implies --memory-budget, which defaults to 1024)")
+
+
+calibrate_argparser = argparse.ArgumentParser(
+    formatter_class=RawAndDefaultArgumentFormatter,
+    description="""
+    Measures the solving time of each installed MIP solver on randomly generated 
+    continua of increasing size, and records the problem sizes at which the 
+    fastest solver changes. These crossover points are then used by the 'auto' 
+    solver to pick a solver for each problem.
+    """)
+calibrate_argparser.add_argument("-o", "--output", type=Path, default=None,
+                                 help=f"Path to the output calibration file \n"
+                                      f"(default: {default_calibration_path()})")
+calibrate_argparser.add_argument("--solvers", type=str, nargs="+", choices=list(SOLVERS), default=None,
+                                 help="Solvers to benchmark (default: all installed solvers)")
+calibrate_argparser.add_argument("-r", "--repeats", default=3, type=int,
+                                 help="Number of measures per solver and problem")
+calibrate_argparser.add_argument("-v", "--verbose",
+                                 action="store_true",
+                                 help="Logs the measured timings")
+
+warmup_argparser = argparse.ArgumentParser(
+    formatter_class=RawAndDefaultArgumentFormatter,
+    description="""
+    Compiles the numba kernels used to compute the gamma-agreement, and caches 
+    them on disk (in numba's cache directory, which can be set with the 
+    NUMBA_CACHE_DIR environment variable), so that the pygamma-agreement 
+    command doesn't compile them again. Meant to be run once, e.g. when 
+    building a container image.
+    """)
+warmup_argparser.add_argument("-e", "--empty-delta",
+                              default=1, type=float,
+                              help="Delta empty coefficient of the combined dissimilarity to compile")
+warmup_argparser.add_argument("-a", "--alpha",
+                              default=1, type=float,
+                              help="Alpha coefficient of the combined dissimilarity to compile")
+warmup_argparser.add_argument("-b", "--beta",
+                              default=1, type=float,
+                              help="Beta coefficient of the combined dissimilarity to compile")
+warmup_argparser.add_argument("--no-parallel", action="store_true",
+                              help="Don't compile the parallel search of possible unitary alignments \n"
+                                   "(used for long continua), which takes long")
 
 
 def pygamma_cmd():
@@ -177,11 +242,22 @@ def pygamma_cmd():
         if args.mathet_sampler:
             sampler = ShuffleContinuumSampler()
 
+        storage = None
+        if args.memory_budget is not None or args.scratch_dir is not None:
+            memory_budget = (DEFAULT_MEMORY_BUDGET if args.memory_budget is None
+                             else int(args.memory_budget * 2 ** 20))
+            storage = ScratchStorage(memory_budget, args.scratch_dir)
+
         gamma = continuum.compute_gamma(dissimilarity=dissim,
                                         precision_level=args.precision_level,
                                         fast=True,
                                         sampler=sampler,
-                                        n_samples=args.n_samples)
+                                        n_samples=args.n_samples,
+                                        solver=args.solver,
+                                        lp_first=args.lp_first,
+                                        time_limit=args.time_limit,
+                                        mip_gap=args.mip_gap,
+                                        storage=storage)
         logging.info(f"Finished computing best alignment & gamma in {(time.time() - start) * 1000} ms")
         # start = time.time()
 
@@ -219,3 +295,20 @@ def pygamma_cmd():
             json.dump(json_dict, output_json, indent=4)
 
 
+def pygamma_calibrate_cmd():
+    args = calibrate_argparser.parse_args()
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.ERROR)
+    calibration = calibrate_solvers(solvers=args.solvers, repeats=args.repeats, output_path=args.output)
+    for nb_annotators, crossovers in calibration["crossovers"].items():
+        print(f"{nb_annotators} annotators:")
+        for max_nb_candidates, solver in crossovers:
+            limit = "any size" if max_nb_candidates is None else f"up to {max_nb_candidates} unitary alignments"
+            print(f"    {solver}: {limit}")
+
+
+def pygamma_warmup_cmd():
+    args = warmup_argparser.parse_args()
+    start = time.time()
+    warmup([CombinedCategoricalDissimilarity(alpha=args.alpha, beta=args.beta, delta_empty=args.empty_delta)],
+           parallel=not args.no_parallel)
+    print(f"Compiled the numba kernels in {time.time() - start:.1f} s")
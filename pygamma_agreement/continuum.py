@@ -29,34 +29,42 @@ Continuum and corpus
 """
 import csv
 import logging
+import multiprocessing
 import os
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from copy import deepcopy
 from dataclasses import dataclass
-from functools import total_ordering
+from functools import partial, total_ordering
 from pathlib import Path
-from typing import Optional, Tuple, List, Union, TYPE_CHECKING, Generator
+from typing import Optional, Tuple, List, Union, TYPE_CHECKING, Generator, Iterator, Iterable
 
-import cvxpy as cp
+import numba as nb
 import numpy as np
 from pyannote.core import Annotation, Segment, Timeline
-from pyannote.database.util import load_rttm
+from scipy import sparse
 from sortedcontainers import SortedDict, SortedSet
 from typing_extensions import Literal
 
 from .dissimilarity import AbstractDissimilarity
-from .numba_utils import build_A
+from .numba_utils import build_A, fill_A_indptr, fill_A_indices
+from .solvers import AbstractAlignmentSolver, SolverReport, SolverSession, get_solver
+from .storage import ScratchStorage
 
 if TYPE_CHECKING:
     from .alignment import UnitaryAlignment, Alignment, SoftAlignment
     from .sampler import AbstractContinuumSampler, StatisticalContinuumSampler
 
 CHUNK_SIZE = (10**6) // os.cpu_count()
+# Minimal number of units of the observed continuum for its possible unitary alignments to be searched
+# in parallel by compute_gamma (below, the compilation of the parallel search takes longer than the search)
+PARALLEL_SEARCH_MIN_UNITS = 5000
 
 # defining Annotator type
 Annotator = str
 PivotType = Literal["float_pivot", "int_pivot"]
 PrecisionLevel = Literal["high", "medium", "low"]
+ExecutorType = Literal["thread", "process"]
 
 # percentages for the precision
 PRECISION_LEVEL = {
@@ -66,6 +74,55 @@ PRECISION_LEVEL = {
 }
 
 
+def _build_constraint_matrix(possible_unitary_alignments: np.ndarray,
+                             sizes: np.ndarray,
+                             storage: Optional[ScratchStorage] = None) -> sparse.csc_matrix:
+    """
+    Returns the (sparse) constraint matrix of the alignment problem, i.e. A[u, a] = 1 if and only
+    if the unit u is in the unitary alignment a. If a ``storage`` is given, the arrays of the matrix are
+    stored in it.
+    """
+    nb_units = int(np.sum(sizes))
+    if storage is None:
+        indptr, indices = build_A(possible_unitary_alignments, sizes)
+        return sparse.csc_matrix((np.ones(len(indices), dtype=np.float32), indices, indptr),
+                                 shape=(nb_units, len(possible_unitary_alignments)))
+    nb_alignments, nb_annotators = possible_unitary_alignments.shape
+    # The index arrays have the index type scipy would choose, so that they are used without being copied
+    index_dtype = np.int32 if max(nb_alignments * nb_annotators, nb_units) <= np.iinfo(np.int32).max else np.int64
+    indptr = storage.empty(nb_alignments + 1, index_dtype)
+    fill_A_indptr(possible_unitary_alignments, sizes, indptr)
+    nnz = int(indptr[nb_alignments])
+    indices = storage.empty(nnz, index_dtype)
+    fill_A_indices(possible_unitary_alignments, sizes, indptr, indices)
+    data = storage.empty(nnz, np.float32)
+    data.fill(1.)
+    return sparse.csc_matrix((data, indices, indptr), shape=(nb_units, nb_alignments), copy=False)
+
+
+def _find_unitary_alignments(possible_unitary_alignments: np.ndarray,
+                             unitary_alignments: np.ndarray,
+                             sizes: np.ndarray) -> np.ndarray:
+    """
+    Returns the indexes, in ``possible_unitary_alignments``, of the given unitary alignments (both given as
+    arrays of units indexes, with ``sizes[i]`` standing for the null unit of annotator i). Unitary
+    alignments that are not possible ones are ignored.
+    """
+    if np.prod(sizes.astype(np.float64) + 1) < 2 ** 62:
+        # Each unitary alignment is identified by its index in the product of the annotators' units
+        dims = tuple(int(size) + 1 for size in sizes)
+        keys = np.ravel_multi_index(unitary_alignments.T.astype(np.int64), dims)
+        ids = [np.zeros(0, dtype=np.int64)]
+        # By chunks, since the possible unitary alignments may be memory-mapped (see ScratchStorage)
+        for start in range(0, len(possible_unitary_alignments), CHUNK_SIZE):
+            chunk = possible_unitary_alignments[start:start + CHUNK_SIZE]
+            possible_keys = np.ravel_multi_index(chunk.T.astype(np.int64), dims)
+            ids.append(start + np.flatnonzero(np.isin(possible_keys, keys)))
+        return np.concatenate(ids)
+    keys = set(map(tuple, unitary_alignments.tolist()))
+    return np.array([i for i, possible_unitary_alignment in enumerate(possible_unitary_alignments.tolist())
+                     if tuple(possible_unitary_alignment) in keys], dtype=np.int64)
+
 
 @total_ordering
 @dataclass(frozen=True, eq=True)
@@ -189,6 +246,8 @@ class Continuum:
         continuum : Continuum
             New continuum object loaded from the RTTM file
         """
+        # pyannote.database is long to import, and only needed here
+        from pyannote.database.util import load_rttm
         annotations = load_rttm(str(path))
         continuum = cls()
         for uri, annot in annotations.items():
@@ -575,31 +634,24 @@ class Continuum:
         """
         return iter(self._annotations[annotator])
 
-    def get_best_soft_alignment(self,  dissimilarity: AbstractDissimilarity) -> 'SoftAlignment':
+    def get_best_soft_alignment(self,
+                                dissimilarity: AbstractDissimilarity,
+                                solver: Union[str, AbstractAlignmentSolver, SolverSession, None] = None,
+                                parallel: bool = False,
+                                storage: Optional[ScratchStorage] = None) -> 'SoftAlignment':
         assert len(self.annotators) >= 2 and self, "Disorder cannot be computed with less than two annotators, or " \
                                                    "without annotations."
+        solver = get_solver(solver)
 
         sizes = np.empty(self.num_annotators, dtype=np.int32)
         for i, units in enumerate(self._annotations.values()):
             sizes[i] = len(units)
 
-        disorders, possible_unitary_alignments = dissimilarity.valid_alignments(self)
-        # Definition of the integer linear program
-        n = len(disorders)
-        # Constraints matrix ("every unit must appear once and only once")
-        A = build_A(possible_unitary_alignments, sizes)
-
-        x = cp.Variable(shape=(n,), boolean=True)
-        try:
-            import cylp
-            cp.Problem(cp.Minimize(disorders.T @ x), [A @ x >= 1]).solve(solver=cp.CBC)
-        except (ImportError, cp.SolverError):
-            logging.warning("CBC solver not installed. Using GLPK.")
-            cp.Problem(cp.Minimize(disorders.T @ x), [A @ x >= 1]).solve(solver=cp.GLPK_MI)
-        assert x.value is not None, "The linear solver couldn't find an alignment with minimal disorder " \
-                                    "(likely because the amount of possible unitary alignments was too high)"
-        # compare with 0.9 as cvxpy returns 1.000 or small values i.e. 10e-14
-        chosen_alignments_ids, = np.where(x.value > 0.9)
+        disorders, possible_unitary_alignments = dissimilarity.valid_alignments(self, parallel=parallel,
+                                                                                storage=storage)
+        # Constraints matrix ("every unit must appear at least once")
+        A = _build_constraint_matrix(possible_unitary_alignments, sizes, storage)
+        chosen_alignments_ids, solver_report = solver.solve_with_report(disorders, A, soft=True)
 
         chosen_alignments: np.ndarray = possible_unitary_alignments[chosen_alignments_ids]
         alignments_disorders: np.ndarray = disorders[chosen_alignments_ids]
@@ -619,10 +671,12 @@ class Continuum:
             unitary_alignment = UnitaryAlignment(list(u_align_tuple))
             unitary_alignment.disorder = alignments_disorders[alignment_id]
             set_unitary_alignements.append(unitary_alignment)
-        return SoftAlignment(set_unitary_alignements,
-                             continuum=self,
-                             check_validity=False,
-                             disorder=np.sum(alignments_disorders) / self.avg_num_annotations_per_annotator)
+        alignment = SoftAlignment(set_unitary_alignements,
+                                  continuum=self,
+                                  check_validity=False,
+                                  disorder=np.sum(alignments_disorders) / self.avg_num_annotations_per_annotator)
+        alignment.solver_report = solver_report
+        return alignment
 
     def get_first_window(self, dissimilarity: AbstractDissimilarity, w: int = 1) -> Tuple['Continuum', float]:
         """
@@ -679,10 +733,14 @@ class Continuum:
                 index += 1
         return window, x_limit
 
-    def get_fast_alignment(self, dissimilarity: AbstractDissimilarity, window_size: int) -> 'Alignment':
+    def get_fast_alignment(self,
+                           dissimilarity: AbstractDissimilarity,
+                           window_size: int,
+                           solver: Union[str, AbstractAlignmentSolver, SolverSession, None] = None) -> 'Alignment':
         """Returns an 'approximation' of the best alignment (Very likely to be the actual best alignment for
          continua with limited overlapping)"""
         from .alignment import Alignment
+        solver = get_solver(solver)
         copy = self.copy()
         unitary_alignments = []
         disorders = []
@@ -692,7 +750,7 @@ class Continuum:
             # Window contains each annotator's first annotations
             # We retain only the leftmost unitary alignment in the best alignment of the window,
             # as it is the most likely to be in the global best alignment
-            best_alignment = window.get_best_alignment(dissimilarity)
+            best_alignment = window.get_best_alignment(dissimilarity, solver)
             for chosen in best_alignment.take_until_limit(x_limit):
                 unitary_alignments.append(chosen)
                 disorders.append(chosen.disorder)
@@ -704,13 +762,15 @@ class Continuum:
                          check_validity=False,  # Validity has been thoroughly tested
                          disorder=np.sum(disorders) / self.avg_num_annotations_per_annotator)
 
-    def measure_best_window_size(self, dissimilarity: AbstractDissimilarity):
+    def measure_best_window_size(self,
+                                 dissimilarity: AbstractDissimilarity,
+                                 solver: Union[str, AbstractAlignmentSolver, SolverSession, None] = None):
         """
         Sets the best window size for computing the fast-gamma of this continuum, by using the
         sampling the computing complexity function.
         """
         smallest_window, _ = self.get_first_window(dissimilarity, 1)
-        smallest_window.get_best_alignment(dissimilarity)
+        smallest_window.get_best_alignment(dissimilarity, solver)
 
         s = smallest_window.max_num_annotations_per_annotator
         n = int(self.avg_num_annotations_per_annotator)
@@ -739,7 +799,48 @@ class Continuum:
         else:
             logging.warning("Fast-gamma disadvantageous, using normal gamma.")
 
-    def get_best_alignment(self, dissimilarity: AbstractDissimilarity) -> 'Alignment':
+    def _alignment_to_indexes(self, alignment: 'Alignment') -> np.ndarray:
+        """
+        Returns the unitary alignments of the given alignment as an array of units indexes (the index
+        of each annotator's null unit being its number of units), in the order of the annotators.
+        """
+        indexes = np.empty((len(alignment.unitary_alignments), self.num_annotators), dtype=np.int64)
+        for alignment_id, unitary_alignment in enumerate(alignment.unitary_alignments):
+            units = dict(unitary_alignment.n_tuple)
+            for annotator_id, (annotator, annotator_units) in enumerate(self._annotations.items()):
+                unit = units.get(annotator)
+                indexes[alignment_id, annotator_id] = (len(annotator_units) if unit is None
+                                                       else annotator_units.index(unit))
+        return indexes
+
+    def _indexes_to_unitary_alignments(self,
+                                       alignments: np.ndarray,
+                                       disorders: np.ndarray) -> List['UnitaryAlignment']:
+        """
+        Returns the unitary alignments given as arrays of units indexes (see `_alignment_to_indexes`), with their
+        disorders.
+        """
+        from .alignment import UnitaryAlignment
+
+        # Lists are much faster to index than sorted sets
+        annotators_units = [(annotator, list(units)) for annotator, units in self._annotations.items()]
+        unitary_alignments = []
+        for alignment_id, alignment in enumerate(alignments.tolist()):
+            u_align_tuple = []
+            for (annotator, units), unit_id in zip(annotators_units, alignment):
+                # the index of the "null unit" is the number of units
+                u_align_tuple.append((annotator, units[unit_id] if unit_id < len(units) else None))
+            unitary_alignment = UnitaryAlignment(u_align_tuple)
+            unitary_alignment.disorder = disorders[alignment_id]
+            unitary_alignments.append(unitary_alignment)
+        return unitary_alignments
+
+    def get_best_alignment(self,
+                           dissimilarity: AbstractDissimilarity,
+                           solver: Union[str, AbstractAlignmentSolver, SolverSession, None] = None,
+                           warm_start: Union[bool, 'Alignment'] = False,
+                           parallel: bool = False,
+                           storage: Optional[ScratchStorage] = None) -> 'Alignment':
         """
         Returns the best alignment of the continuum for the given dissimilarity. This alignment comes
         with the associated disorder, so you can obtain it in constant time with alignment.disorder.
@@ -751,56 +852,81 @@ class Continuum:
         ----------
         dissimilarity: AbstractDissimilarity
             the dissimilarity that will be used to compute unit-to-unit disorder.
+        solver: str or AbstractAlignmentSolver, optional
+            the MIP solver used to find the best alignment, or its name ("highs", "cbc", "glpk"...).
+            If not set, defaults to "auto", which picks the fastest installed solver for the problem's size.
+        warm_start: bool or Alignment
+            If set to True, the alignment found by the fast-gamma algorithm (see `get_fast_alignment`) is
+            given to the solver as a starting solution, which bounds the disorder of the best alignment.
+            An already known alignment of this continuum can also be given instead.
+        parallel: bool
+            If set to True, the possible unitary alignments are searched on all of numba's threads.
+        storage: ScratchStorage, optional
+            If set, the possible unitary alignments and the constraint matrix of the problem are stored in this
+            storage, i.e. in temporary files when they exceed its memory budget (and the search is sequential).
+        """
+        return self._best_alignment_from_indexes(*self._solve_best_alignment(dissimilarity, solver, warm_start,
+                                                                             parallel, storage))
+
+    def _solve_best_alignment(self,
+                              dissimilarity: AbstractDissimilarity,
+                              solver: Union[str, AbstractAlignmentSolver, SolverSession, None] = None,
+                              warm_start: Union[bool, 'Alignment'] = False,
+                              parallel: bool = False,
+                              storage: Optional[ScratchStorage] = None) -> Tuple[np.ndarray, np.ndarray, SolverReport]:
+        """
+        Numerical part of `get_best_alignment` : returns the unitary alignments of the best alignment as arrays of
+        units indexes, their disorders, and the solver's report. Its computations are done by numba kernels and
+        solvers that release the GIL, so that it can run in parallel threads (see `compute_gamma`).
         """
         assert len(self.annotators) >= 2 and self, "Disorder cannot be computed with less than two annotators, or " \
                                                    "without annotations."
+        solver = get_solver(solver)
+
+        if warm_start is True:
+            if self.best_window_size == np.inf:
+                self.measure_best_window_size(dissimilarity, solver)
+            # If the fast-gamma algorithm isn't advantageous, the problem is small enough to do without
+            warm_start = (self.get_fast_alignment(dissimilarity, self.best_window_size, solver)
+                          if self.best_window_size != np.inf else None)
 
         sizes = np.empty(self.num_annotators, dtype=np.int32)
         for i, units in enumerate(self._annotations.values()):
             sizes[i] = len(units)
 
-        disorders, possible_unitary_alignments = dissimilarity.valid_alignments(self)
+        disorders, possible_unitary_alignments = dissimilarity.valid_alignments(self, parallel=parallel,
+                                                                                storage=storage)
         # Definition of the integer linear program
-        n = len(disorders)
         # Constraints matrix ("every unit must appear once and only once")
-        A = build_A(possible_unitary_alignments, sizes)
-
-        x = cp.Variable(shape=(n,), boolean=True)
-        try:
-            import cylp
-            cp.Problem(cp.Minimize(disorders.T @ x), [A @ x == 1]).solve(solver=cp.CBC)
-        except (ImportError, cp.SolverError):
-            logging.warning("CBC solver not installed. Using GLPK.")
-            matmul = A @ x
-            cp.Problem(cp.Minimize(disorders.T @ x), [1 <= matmul, matmul <= 1]).solve(solver=cp.GLPK_MI)
-        assert x.value is not None, "The linear solver couldn't find an alignment with minimal disorder " \
-                                    "(likely because the amount of possible unitary alignments was too high)"
-        # compare with 0.9 as cvxpy returns 1.000 or small values i.e. 10e-14
-        chosen_alignments_ids, = np.where(x.value > 0.9)
-
-        chosen_alignments: np.ndarray = possible_unitary_alignments[chosen_alignments_ids]
-        alignments_disorders: np.ndarray = disorders[chosen_alignments_ids]
+        A = _build_constraint_matrix(possible_unitary_alignments, sizes, storage)
+        incumbent = None
+        if warm_start:
+            incumbent = _find_unitary_alignments(possible_unitary_alignments,
+                                                 self._alignment_to_indexes(warm_start),
+                                                 sizes)
+            if len(incumbent) != len(warm_start.unitary_alignments):
+                logging.warning("The alignment given as a warm-start isn't made of possible unitary alignments "
+                                "of this continuum : it is ignored.")
+                incumbent = None
+        chosen_alignments_ids, solver_report = solver.solve_with_report(disorders, A, incumbent=incumbent)
+        return possible_unitary_alignments[chosen_alignments_ids], disorders[chosen_alignments_ids], solver_report
+
+    def _best_alignment_from_indexes(self,
+                                     chosen_alignments: np.ndarray,
+                                     alignments_disorders: np.ndarray,
+                                     solver_report: SolverReport) -> 'Alignment':
+        """
+        Builds the best alignment found by `_solve_best_alignment`.
+        """
+        from .alignment import Alignment
 
-        from .alignment import UnitaryAlignment, Alignment
-
-        set_unitary_alignements = []
-        for alignment_id, alignment in enumerate(chosen_alignments):
-            u_align_tuple = []
-            for annotator_id, unit_id in enumerate(alignment):
-                annotator, units = self._annotations.peekitem(annotator_id)
-                try:
-                    unit = units[unit_id]
-                    u_align_tuple.append((annotator, unit))
-                except IndexError:  # it's a "null unit"
-                    u_align_tuple.append((annotator, None))
-            unitary_alignment = UnitaryAlignment(list(u_align_tuple))
-            unitary_alignment.disorder = alignments_disorders[alignment_id]
-            set_unitary_alignements.append(unitary_alignment)
-        return Alignment(set_unitary_alignements,
-                         continuum=self,
-                         # Validity of results from get_best_alignments have been thoroughly tested :
-                         check_validity=False,
-                         disorder=np.sum(alignments_disorders) / self.avg_num_annotations_per_annotator)
+        alignment = Alignment(self._indexes_to_unitary_alignments(chosen_alignments, alignments_disorders),
+                              continuum=self,
+                              # Validity of results from get_best_alignments have been thoroughly tested :
+                              check_validity=False,
+                              disorder=np.sum(alignments_disorders) / self.avg_num_annotations_per_annotator)
+        alignment.solver_report = solver_report
+        return alignment
 
     def compute_gamma(self,
                       dissimilarity: Optional['AbstractDissimilarity'] = None,
@@ -809,7 +935,14 @@ class Continuum:
                       ground_truth_annotators: Optional[SortedSet] = None,
                       sampler: 'AbstractContinuumSampler' = None,
                       fast: bool = False,
-                      soft: bool = False) -> 'GammaResults':
+                      soft: bool = False,
+                      solver: Union[str, AbstractAlignmentSolver, SolverSession, None] = None,
+                      warm_start: bool = False,
+                      lp_first: Optional[bool] = None,
+                      time_limit: Optional[float] = None,
+                      mip_gap: Optional[float] = None,
+                      storage: Optional[ScratchStorage] = None,
+                      executor: Union[ExecutorType, Executor, None] = None) -> 'GammaResults':
         """
 
         Parameters
@@ -839,6 +972,37 @@ class Continuum:
             Activate soft-gamma, an alternative measure that uses a slighlty different definition of an
             alignment. For further information, please consult the 'Soft-Gamma' section of the documentation.
             Incompatible with fast-gamma : raises an error if both 'fast' and 'soft' are set to True.
+        solver: str or AbstractAlignmentSolver, optional
+            MIP solver (or its name) used to compute the best alignments. If not set, defaults to "auto", which
+            picks the fastest installed solver for each problem's size. All the alignments are computed in a
+            single session of the solver (see `SolverSession`).
+        warm_start:
+            Starts each best alignment search from the alignment found by the fast-gamma algorithm (with the window
+            size measured on this continuum), which gives the solver an upper bound on the disorder. The result is
+            the same as with the default algorithm.
+            Only used by the default algorithm (i.e., not with 'fast' or 'soft').
+        lp_first:
+            If set, the LP relaxation of each alignment problem is solved first, and used directly when its solution
+            is integral (which is most often the case). If not set, the solver's own setting is used.
+        time_limit:
+            Maximal time (in seconds) spent by the solver on each best alignment problem. When it is reached,
+            the best alignment found so far is used, and its optimality gap is available as ``alignment.gap``.
+            If not set, the solver's own setting is used.
+        mip_gap:
+            Relative optimality gap at which the solver stops (0 meaning that the best alignments are found).
+            If not set, the solver's own setting is used.
+        storage:
+            If set, the possible unitary alignments of each alignment problem, and its constraint matrix, are stored
+            in this storage : the ones that exceed its memory budget are stored in temporary files
+            (see `ScratchStorage`).
+        executor: "thread", "process" or Executor, optional
+            How the alignments are computed in parallel. With "thread" (the default), they are computed by a pool of
+            threads, whose numerical kernels run in parallel while the construction of the samples and alignments is
+            serialized by the GIL. With "process", the samples are generated and aligned by a pool of processes, that
+            send back their alignments as compact arrays. A `concurrent.futures.Executor` can also be given (and isn't
+            shut down) : a ``ThreadPoolExecutor`` is used as a pool of threads, any other (e.g. a
+            ``ProcessPoolExecutor`` with a given number of "forkserver" workers, or the executor of a cluster) as a pool
+            of processes. It is also used by `GammaResults.gamma_cat` and `GammaResults.gamma_k`.
         """
         from .dissimilarity import CombinedCategoricalDissimilarity
         if dissimilarity is None:
@@ -848,38 +1012,73 @@ class Continuum:
             from .sampler import StatisticalContinuumSampler
             sampler = StatisticalContinuumSampler()
         sampler.init_sampling(self, ground_truth_annotators)
+        solver = get_solver(solver, lp_first=lp_first, time_limit=time_limit, mip_gap=mip_gap)
+        if isinstance(solver, AbstractAlignmentSolver):
+            # The solver's objects (e.g. its highspy.Highs instance) are reused from one sample to the next
+            solver = solver.session()
 
         job = _compute_best_alignment_job
         if soft and fast:
             raise NotImplementedError("Fast-gamma and Soft-gamma are not compatible with each other.")
         if soft:
             job = _compute_soft_alignment_job
-        # Multiprocessed computation of sample disorder
+        elif warm_start and not fast:
+            # The window size of the fast-gamma alignments is measured once, by this thread, and only read by the jobs
+            if self.best_window_size == np.inf:
+                self.measure_best_window_size(dissimilarity, solver)
+            job = partial(_compute_warm_started_alignment_job, window_size=self.best_window_size)
+        # The fast-gamma window size is measured once, on the observed continuum
         if fast:
             job = _compute_fast_alignment_job
-            self.measure_best_window_size(dissimilarity)
+            self.measure_best_window_size(dissimilarity, solver)
 
-        # Multithreaded computation of sample disorder
-        with ThreadPoolExecutor(max_workers=os.cpu_count()) as p:
+        # Multithreaded (or multiprocessed) computation of sample disorder
+        with _executor_pool(executor) as p:
             # Launching jobs
             logging.info(f"Starting computation for the best alignment and a batch of {n_samples} random samples...")
-            best_alignment_task = p.submit(job,
-                                           *(dissimilarity, self))
-
-            result_pool = [
-                # Step one : computing the disorders of a batch of random samples from the continuum (done in parallel)
-                p.submit(job,
-                         *(dissimilarity, sampler.sample_from_continuum))
-                for _ in range(n_samples)
-            ]
+            # The possible unitary alignments of a long observed continuum are searched on all of numba's threads
+            parallel = nb.get_num_threads() > 1 and self.num_units >= PARALLEL_SEARCH_MIN_UNITS
+            if isinstance(p, ThreadPoolExecutor):
+                best_alignment_task = p.submit(job,
+                                               *(dissimilarity, self, solver, parallel, storage))
+
+                def sample_alignments(nb_samples: int) -> Iterator['Alignment']:
+                    result_pool = [
+                        # The samples themselves are pure Python : they are generated by the main thread,
+                        # when submitted.
+                        p.submit(job,
+                                 *(dissimilarity, sampler.sample_from_continuum, solver, False, storage))
+                        for _ in range(nb_samples)
+                    ]
+                    return (_job_alignment(result) for result in result_pool)
+            else:
+                # The solver's sessions stay in their process
+                process_solver = solver.solver if isinstance(solver, SolverSession) else solver
+                best_alignment_task = p.submit(_compute_compact_alignment_job,
+                                               *(job, dissimilarity, _CompactContinuum.from_continuum(self),
+                                                 process_solver, parallel, storage))
+
+                def sample_alignments(nb_samples: int) -> Iterator['Alignment']:
+                    # Each sample is generated by a worker, whose random generator is seeded independently
+                    seeds = np.random.SeedSequence(np.random.randint(2 ** 32, dtype=np.uint64)).spawn(nb_samples)
+                    result_pool = [
+                        p.submit(_compute_sample_alignment_job,
+                                 *(job, dissimilarity, sampler, process_solver, seed, storage))
+                        for seed in seeds
+                    ]
+                    return (result.result().to_alignment() for result in result_pool)
+
+            # Step one : computing the disorders of a batch of random samples from the continuum (done in parallel)
+            chance_alignments_results = sample_alignments(n_samples)
             chance_best_alignments: List[Alignment] = []
             chance_disorders: List[float] = []
 
             # Obtaining results
-            best_alignment = best_alignment_task.result()
+            best_alignment = (_job_alignment(best_alignment_task) if isinstance(p, ThreadPoolExecutor)
+                              else best_alignment_task.result().to_alignment(self))
             logging.info("Best alignment obtained")
-            for i, result in enumerate(result_pool):
-                chance_best_alignments.append(result.result())
+            for i, chance_alignment in enumerate(chance_alignments_results):
+                chance_best_alignments.append(chance_alignment)
                 logging.info(f"finished computation of random sample dissimilarity {i + 1}/{n_samples}")
                 chance_disorders.append(chance_best_alignments[-1].disorder)
             logging.info("done.")
@@ -897,13 +1096,8 @@ class Continuum:
                 if required_samples > n_samples:
                     logging.info(f"Computing second batch of {required_samples - n_samples} "
                                  f"because variation was too high.")
-                    result_pool = [
-                        p.submit(job,
-                                 *(dissimilarity, sampler.sample_from_continuum))
-                        for _ in range(required_samples - n_samples)
-                    ]
-                    for i, result in enumerate(result_pool):
-                        chance_best_alignments.append(result.result())
+                    for i, chance_alignment in enumerate(sample_alignments(required_samples - n_samples)):
+                        chance_best_alignments.append(chance_alignment)
                         logging.info(f"finished computation of additionnal random sample dissimilarity "
                                      f"{i + 1}/{required_samples - n_samples}")
                     logging.info("done.")
@@ -912,7 +1106,8 @@ class Continuum:
             best_alignment=best_alignment,
             chance_alignments=chance_best_alignments,
             precision_level=precision_level,
-            dissimilarity=dissimilarity
+            dissimilarity=dissimilarity,
+            executor=executor
         )
 
     def to_csv(self, path: Union[str, Path], delimiter=","):
@@ -946,6 +1141,7 @@ class GammaResults:
     chance_alignments: List['Alignment']
     dissimilarity: AbstractDissimilarity
     precision_level: Optional[float] = None
+    executor: Union[ExecutorType, Executor, None] = None
 
     @property
     def n_samples(self):
@@ -993,16 +1189,8 @@ class GammaResults:
     @property
     def gamma_cat(self) -> float:
         """Returns the gamma-cat value"""
-        with ThreadPoolExecutor(max_workers=os.cpu_count()) as p:
-
-            observed_disorder_job = p.submit(_compute_gamma_k_job,
-                                             *(self.dissimilarity, self.best_alignment, None))
-
-            chance_disorders_jobs = [
-                p.submit(_compute_gamma_k_job,
-                         *(self.dissimilarity, alignment, None))
-                for alignment in self.chance_alignments
-            ]
+        with _executor_pool(self.executor) as p:
+            observed_disorder_job, chance_disorders_jobs = self._submit_gamma_k_jobs(p, None)
             observed_disorder = observed_disorder_job.result()
             if observed_disorder == 0:
                 return 1
@@ -1013,15 +1201,8 @@ class GammaResults:
 
     def gamma_k(self, category: str) -> float:
         """Returns the gamma-k value for the given category"""
-        with ThreadPoolExecutor(max_workers=os.cpu_count()) as p:
-            observed_disorder_job = p.submit(_compute_gamma_k_job,
-                                             *(self.dissimilarity, self.best_alignment, category))
-
-            chance_disorders_jobs = [
-                p.submit(_compute_gamma_k_job,
-                         *(self.dissimilarity, alignment, category))
-                for alignment in self.chance_alignments
-            ]
+        with _executor_pool(self.executor) as p:
+            observed_disorder_job, chance_disorders_jobs = self._submit_gamma_k_jobs(p, category)
             observed_disorder = observed_disorder_job.result()
             if observed_disorder == 0:
                 return 1
@@ -1029,31 +1210,299 @@ class GammaResults:
 
         return 1 - observed_disorder / expected_disorder
 
+    def _submit_gamma_k_jobs(self, p: Executor, category: Optional[str]) -> Tuple[Future, List[Future]]:
+        """
+        Submits the computations of the gamma-k (or gamma-cat) disorders of the best alignment and of the chance
+        alignments. Pools of processes are sent the alignments as compact arrays (see `_CompactAlignment`).
+        """
+        if isinstance(p, ThreadPoolExecutor):
+            jobs = [p.submit(_compute_gamma_k_job, *(self.dissimilarity, alignment, category))
+                    for alignment in [self.best_alignment] + self.chance_alignments]
+        else:
+            jobs = [p.submit(_compute_compact_gamma_k_job,
+                             *(self.dissimilarity, _CompactAlignment.from_alignment(alignment), category))
+                    for alignment in [self.best_alignment] + self.chance_alignments]
+        return jobs[0], jobs[1:]
+
+
+@contextmanager
+def _executor_pool(executor: Union[ExecutorType, Executor, None]) -> Iterator[Executor]:
+    """
+    Pool of workers of the given ``executor`` (see `Continuum.compute_gamma`). Executors given by the user are used
+    as is, and aren't shut down.
+    """
+    if isinstance(executor, Executor):
+        yield executor
+    elif executor is None or executor == "thread":
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as p:
+            yield p
+    elif executor == "process":
+        # The threading layers of numba (such as TBB) aren't fork-safe : the workers are forked from a server process
+        # (started once), which only imports pygamma-agreement.
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["pygamma_agreement"])
+        else:
+            context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=context) as p:
+            yield p
+    else:
+        raise ValueError(f"Unknown executor '{executor}' : use 'thread', 'process' or an Executor instance.")
+
+
+@dataclass
+class _CompactContinuum:
+    """
+    Compact representation of a continuum, sent to (and from) the worker processes : its units are stored as arrays,
+    grouped by annotator (as in ``AbstractDissimilarity._build_arrays_continuum``).
+    """
+    uri: Optional[str]
+    annotators: List[Annotator]
+    categories: List[str]
+    # Starts and ends of the units
+    segments: np.ndarray
+    # Index in categories of the units' annotations (-1 for units without annotation)
+    annotations: np.ndarray
+    # Units of annotator i are units offsets[i]:offsets[i + 1]
+    offsets: np.ndarray
+    bounds: Tuple[float, float]
+    best_window_size: float
+
+    @classmethod
+    def from_continuum(cls, continuum: Continuum) -> '_CompactContinuum':
+        categories = list(continuum.categories)
+        categories_ids = {category: category_id for category_id, category in enumerate(categories)}
+        units = [unit for units in continuum._annotations.values() for unit in units]
+        return cls(uri=continuum.uri,
+                   annotators=list(continuum.annotators),
+                   categories=categories,
+                   segments=np.array([(unit.segment.start, unit.segment.end) for unit in units],
+                                     dtype=np.float64).reshape(-1, 2),
+                   annotations=np.array([categories_ids.get(unit.annotation, -1) for unit in units], dtype=np.int32),
+                   offsets=np.cumsum([0] + [len(units) for units in continuum._annotations.values()]),
+                   bounds=continuum.bounds,
+                   best_window_size=continuum.best_window_size)
+
+    def to_continuum(self) -> Continuum:
+        continuum = Continuum(self.uri)
+        categories = self.categories
+        segments, annotations = self.segments.tolist(), self.annotations.tolist()
+        for annotator, start, end in zip(self.annotators, self.offsets[:-1], self.offsets[1:]):
+            # The units are already sorted
+            continuum._annotations[annotator] = SortedSet(
+                Unit(Segment(*segment), None if annotation < 0 else categories[annotation])
+                for segment, annotation in zip(segments[start:end], annotations[start:end])
+            )
+        continuum._categories = SortedSet(categories)
+        continuum.bound_inf, continuum.bound_sup = self.bounds
+        continuum.best_window_size = self.best_window_size
+        return continuum
+
+
+@dataclass
+class _CompactAlignment:
+    """
+    Compact representation of an alignment, sent back by the worker processes : its unitary alignments are arrays
+    of units indexes (see `Continuum._alignment_to_indexes`), with their disorders. The continuum is left out when
+    the receiver already has it.
+    """
+    continuum: Optional[_CompactContinuum]
+    alignments: np.ndarray
+    disorders: np.ndarray
+    disorder: float
+    soft: bool = False
+    solver_report: Optional[SolverReport] = None
+
+    @classmethod
+    def from_alignment(cls, alignment: 'Alignment') -> '_CompactAlignment':
+        from .alignment import SoftAlignment
+
+        return cls(continuum=_CompactContinuum.from_continuum(alignment.continuum),
+                   alignments=alignment.continuum._alignment_to_indexes(alignment),
+                   disorders=np.array([unitary_alignment.disorder
+                                       for unitary_alignment in alignment.unitary_alignments]),
+                   disorder=alignment.disorder,
+                   soft=isinstance(alignment, SoftAlignment),
+                   solver_report=alignment.solver_report)
+
+    def to_alignment(self, continuum: Optional[Continuum] = None) -> 'Alignment':
+        """
+        Builds the alignment, of the given continuum if the compact alignment doesn't contain it.
+        """
+        from .alignment import Alignment, SoftAlignment
+
+        if continuum is None:
+            continuum = self.continuum.to_continuum()
+        alignment = (SoftAlignment if self.soft else Alignment)(
+            continuum._indexes_to_unitary_alignments(self.alignments, self.disorders),
+            continuum=continuum,
+            check_validity=False,
+            disorder=self.disorder
+        )
+        alignment.solver_report = self.solver_report
+        return alignment
+
 
 def _compute_best_alignment_job(dissimilarity: AbstractDissimilarity,
-                                continuum: Continuum):
+                                continuum: Continuum,
+                                solver: Union[AbstractAlignmentSolver, SolverSession],
+                                parallel: bool = False,
+                                storage: Optional[ScratchStorage] = None):
     """
     Function used to launch a multiprocessed job for calculating the best aligment of a continuum
-    using the given dissimilarity.
+    using the given dissimilarity. Only its numerical part is computed (see `_job_alignment`).
+    """
+    return continuum, continuum._solve_best_alignment(dissimilarity, solver, parallel=parallel, storage=storage)
+
+
+def _compute_warm_started_alignment_job(dissimilarity: AbstractDissimilarity,
+                                        continuum: Continuum,
+                                        solver: Union[AbstractAlignmentSolver, SolverSession],
+                                        parallel: bool = False,
+                                        storage: Optional[ScratchStorage] = None,
+                                        window_size: float = np.inf):
+    """
+    Exact best alignment, warm-started with the fast-gamma alignment of the given window size (numerical part only,
+    see `_job_alignment`). The window size is measured once by `Continuum.compute_gamma`, on the observed continuum :
+    if it is infinite (fast-gamma isn't advantageous), the search isn't warm-started.
+    """
+    warm_start = (continuum.get_fast_alignment(dissimilarity, window_size, solver)
+                  if window_size != np.inf else False)
+    return continuum, continuum._solve_best_alignment(dissimilarity, solver, warm_start=warm_start, parallel=parallel,
+                                                      storage=storage)
+
+
+def _job_alignment(job: Future) -> 'Alignment':
     """
-    return continuum.get_best_alignment(dissimilarity)
+    Alignment computed by a job. The best alignment jobs only compute the numerical part of the best alignment,
+    which releases the GIL : the Python objects of the alignment are built here, by the main thread, while the
+    other jobs keep running in parallel.
+    """
+    result = job.result()
+    if isinstance(result, tuple):
+        continuum, solution = result
+        return continuum._best_alignment_from_indexes(*solution)
+    return result
 
 
 def _compute_fast_alignment_job(dissimilarity: AbstractDissimilarity,
-                                continuum: Continuum):
+                                continuum: Continuum,
+                                solver: Union[AbstractAlignmentSolver, SolverSession],
+                                parallel: bool = False,
+                                storage: Optional[ScratchStorage] = None):
     """
     Function used to launch a multiprocessed job for calculating an approximation of
     the best aligment of a continuum, using the given dissimilarity.
     """
     if continuum.best_window_size == np.inf:  # window size is set to infinity when normal gamma is better.
-        return continuum.get_best_alignment(dissimilarity)
-    return continuum.get_fast_alignment(dissimilarity, continuum.best_window_size)
+        return continuum.get_best_alignment(dissimilarity, solver, parallel=parallel, storage=storage)
+    # The windows are too small for a parallel search of their possible unitary alignments
+    return continuum.get_fast_alignment(dissimilarity, continuum.best_window_size, solver)
+
 
 def _compute_soft_alignment_job(dissimilarity: AbstractDissimilarity,
-                                continuum: Continuum):
-    return continuum.get_best_soft_alignment(dissimilarity)
+                                continuum: Continuum,
+                                solver: Union[AbstractAlignmentSolver, SolverSession],
+                                parallel: bool = False,
+                                storage: Optional[ScratchStorage] = None):
+    return continuum.get_best_soft_alignment(dissimilarity, solver, parallel=parallel, storage=storage)
+
 
 def _compute_gamma_k_job(dissimilarity: AbstractDissimilarity,
                          alignment: 'Alignment',
                          category: Optional[str]):
     return alignment.gamma_k_disorder(dissimilarity, category)
+
+
+def _compact_alignment(job, dissimilarity: AbstractDissimilarity, continuum: Continuum,
+                       solver: AbstractAlignmentSolver, parallel: bool = False,
+                       storage: Optional[ScratchStorage] = None) -> _CompactAlignment:
+    """
+    Runs one of the alignment jobs, and returns its alignment in compact form.
+    """
+    result = job(dissimilarity, continuum, solver, parallel, storage)
+    if isinstance(result, tuple):
+        continuum, (alignments, disorders, solver_report) = result
+        return _CompactAlignment(continuum=_CompactContinuum.from_continuum(continuum),
+                                 alignments=alignments,
+                                 disorders=disorders,
+                                 disorder=np.sum(disorders) / continuum.avg_num_annotations_per_annotator,
+                                 solver_report=solver_report)
+    return _CompactAlignment.from_alignment(result)
+
+
+def _compute_compact_alignment_job(job, dissimilarity: AbstractDissimilarity, continuum: _CompactContinuum,
+                                   solver: AbstractAlignmentSolver, parallel: bool = False,
+                                   storage: Optional[ScratchStorage] = None) -> _CompactAlignment:
+    """
+    Worker process job : alignment of the (observed) continuum. Only its unitary alignments are sent back.
+    """
+    alignment = _compact_alignment(job, dissimilarity, continuum.to_continuum(), solver, parallel, storage)
+    alignment.continuum = None
+    return alignment
+
+
+def _compute_sample_alignment_job(job, dissimilarity: AbstractDissimilarity, sampler: 'AbstractContinuumSampler',
+                                  solver: AbstractAlignmentSolver, seed: np.random.SeedSequence,
+                                  storage: Optional[ScratchStorage] = None) -> _CompactAlignment:
+    """
+    Worker process job : alignment of a random sample of the sampler's continuum, generated with the given seed.
+    """
+    # The samplers use numpy's global random generator
+    np.random.seed(seed.generate_state(4))
+    return _compact_alignment(job, dissimilarity, sampler.sample_from_continuum, solver, False, storage)
+
+
+def _compute_compact_gamma_k_job(dissimilarity: AbstractDissimilarity,
+                                 alignment: _CompactAlignment,
+                                 category: Optional[str]):
+    return alignment.to_alignment().gamma_k_disorder(dissimilarity, category)
+
+
+def warmup(dissimilarities: Optional[Iterable[AbstractDissimilarity]] = None, parallel: bool = True):
+    """
+    Compiles all the numba kernels used to compute the gamma agreement, on a small continuum. The compiled
+    kernels are cached on disk (in numba's cache directory, see ``NUMBA_CACHE_DIR``), so that later processes
+    load them instead of compiling them again : this is meant to be run once, for instance when building
+    a container image (see the ``pygamma-agreement-warmup`` command).
+
+    Parameters
+    ----------
+    dissimilarities: iterable of AbstractDissimilarity, optional
+        Dissimilarities whose kernels are compiled. Their kernels depend on their parameters, which are cached
+        separately. Defaults to the combined categorical dissimilarity with the default parameters (the ones
+        used by the ``pygamma-agreement`` command).
+    parallel: bool
+        Also compiles the parallel search of the possible unitary alignments (see ``valid_alignments``),
+        which takes long.
+    """
+    from .dissimilarity import CombinedCategoricalDissimilarity
+
+    if dissimilarities is None:
+        dissimilarities = [CombinedCategoricalDissimilarity()]
+    continuum = Continuum()
+    for annotator, shift in [("annotator_a", 0.), ("annotator_b", 0.5), ("annotator_c", 1.)]:
+        for start, category in [(0., "A"), (5., "B"), (11., "A"), (18., "C")]:
+            continuum.add(annotator, Segment(start + shift, start + shift + 4), category)
+    # The samplers use numpy's global random generator, whose state is left untouched
+    random_state = np.random.get_state()
+    try:
+        for dissimilarity in dissimilarities:
+            # Batched dissimilarities are only used for long continua
+            _ = dissimilarity.d_batch
+            gamma_results = continuum.compute_gamma(dissimilarity, n_samples=2)
+            if isinstance(dissimilarity, CombinedCategoricalDissimilarity):
+                _ = gamma_results.gamma_cat, gamma_results.gamma_k("A")
+            # Fast-gamma isn't used on such a small continuum by compute_gamma
+            continuum.get_fast_alignment(dissimilarity, 2)
+            dissimilarity.valid_alignments(continuum, storage=ScratchStorage())
+            if parallel:
+                dissimilarity.valid_alignments(continuum, parallel=True)
+            # Search for the continua with more than 32766 units per annotator
+            units, offsets = dissimilarity._build_arrays_continuum(continuum)
+            sizes = np.diff(offsets).astype(np.int32)
+            dissimilarity._get_all_valid_alignments_int32(*dissimilarity._pairwise_dissimilarities(units, offsets,
+                                                                                                     sizes),
+                                                           sizes, dissimilarity.delta_empty)
+    finally:
+        np.random.set_state(random_state)
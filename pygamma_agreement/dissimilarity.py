@@ -29,22 +29,134 @@ Dissimilarity
 
 """
 import abc
+import hashlib
 import random
+import threading
+import uuid
 from abc import ABCMeta
+from collections import OrderedDict
 from typing import Iterable
-from typing import TYPE_CHECKING, Tuple, Callable, Optional
+from typing import TYPE_CHECKING, Tuple, Callable, Optional, Hashable, List
 
 import numba as nb
 import numpy as np
+from pyannote.core.segment import SEGMENT_PRECISION
 from sortedcontainers import SortedSet
 
-from .numba_utils import iter_tuples, extend_right_alignments, extend_right_disorders
+from .numba_utils import (lazy_njit, band_layout, fill_bands, fill_bands_batched, enumerate_valid_alignments,
+                          unit_index_dtype)
 
 if TYPE_CHECKING:
     from .continuum import Continuum
     from .alignment import Alignment
+    from .storage import ScratchStorage
 
-dissimilarity_dec = nb.njit(nb.float32(nb.float32[:], nb.float32[:]))
+dissimilarity_dec = nb.njit(nb.float32(nb.float32[:], nb.float32[:]), cache=True)
+# Batched dissimilarities (see AbstractDissimilarity.compile_d_batch) are compiled with numpy's error model,
+# which lets their loops be vectorized (divisions don't check for zeros).
+batch_dissimilarity_dec = nb.njit(nb.void(nb.float32[:, :], nb.float32[:, :], nb.float32[:, :]),
+                                  error_model="numpy", cache=True)
+
+# numba's parallel kernels can't be launched concurrently from several threads
+_parallel_search_lock = threading.Lock()
+
+# Minimal number of pairwise dissimilarities between the units of a continuum for them to be computed with the
+# batched dissimilarity, whose compilation (when it is first used) takes longer than computing fewer of them
+BATCHED_DISSIMILARITIES_MIN_PAIRS = 5 * 10 ** 6
+
+# Default maximal size (in bytes) of the pairwise dissimilarities kept in cache
+PAIRWISE_CACHE_MAX_BYTES = 2 ** 28
+
+
+class PairwiseDissimilaritiesCache:
+    """
+    Least recently used cache of the pairwise dissimilarities between the units of continua (see
+    ``AbstractDissimilarity.valid_alignments``), bounded by their total size in bytes. It is shared by all
+    the dissimilarities and threads.
+
+    Parameters
+    ----------
+    max_bytes: int
+        Maximal total size of the cached arrays. Setting it to 0 disables the cache.
+    """
+
+    def __init__(self, max_bytes: int = PAIRWISE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Tuple[np.ndarray, ...]]:
+        with self._lock:
+            arrays = self._entries.get(key)
+            if arrays is not None:
+                self._entries.move_to_end(key)
+            return arrays
+
+    def put(self, key: Hashable, arrays: Tuple[np.ndarray, ...]):
+        nbytes = sum(array.nbytes for array in arrays)
+        with self._lock:
+            if key in self._entries or nbytes > self.max_bytes:
+                return
+            self._entries[key] = arrays
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= sum(array.nbytes for array in evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+pairwise_dissimilarities_cache = PairwiseDissimilaritiesCache()
+
+# Compiled kernels of the dissimilarities, by cache token (see AbstractDissimilarity.kernel_key) : the identically
+# configured dissimilarities, and a dissimilarity unpickled several times (e.g. sent with each job of a pool of
+# processes), share their kernels.
+_compiled_kernels: OrderedDict = OrderedDict()
+_compiled_kernels_lock = threading.Lock()
+COMPILED_KERNELS_MAX_SIZE = 128
+
+
+def array_fingerprint(array: np.ndarray) -> str:
+    """
+    Hash of the type, shape and content of an array (e.g. a parameter of a dissimilarity, see
+    ``AbstractDissimilarity.kernel_key``).
+    """
+    array = np.ascontiguousarray(array)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{array.dtype.str}{array.shape}".encode())
+    digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def _identify_kernel(kernel: Optional[Callable], cache_token: str, name: str):
+    """
+    numba pickles the kernels captured by other kernels (e.g. by those of the combined dissimilarity) with a random
+    uuid, which would make the on-disk cache keys of the capturing kernels change in each process : the kernels of
+    a dissimilarity are given a uuid derived from its cache token instead.
+
+    This relies on numba's private API : if it isn't available (e.g. in another version of numba), the kernels are
+    left as they are, and the capturing kernels are compiled again by each process.
+    """
+    set_uuid = getattr(kernel, "_set_uuid", None)
+    if set_uuid is not None and getattr(kernel, "_MemoMixin__uuid", "") is None:
+        set_uuid(str(uuid.uuid5(uuid.UUID(cache_token), name)))
+
+
+def continuum_fingerprint(units: np.ndarray, offsets: np.ndarray) -> bytes:
+    """
+    Hash of the content of a continuum in arrays form (see ``AbstractDissimilarity._build_arrays_continuum``).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(offsets.tobytes())
+    digest.update(units.tobytes())
+    return digest.digest()
 
 
 class AbstractDissimilarity(metaclass=ABCMeta):
@@ -67,8 +179,69 @@ class AbstractDissimilarity(metaclass=ABCMeta):
             raise ValueError("Cannot declare categorical dissimilarity with no categories.")
         self.categories = categories
 
-        self.d_mat: Callable[[np.ndarray, np.ndarray], float] = self.compile_d_mat()
-        self.check_if_dissim()
+        if self._compile_kernels():
+            self.check_if_dissim()
+
+    def _compile_kernels(self) -> bool:
+        """
+        Sets the kernels of the dissimilarity (``d_mat``, and ``d_batch`` when it is first used) for its current
+        parameters : they are shared with the identically configured dissimilarities (see `kernel_key`), and only
+        compiled if there are none. Returns True if they were compiled.
+        """
+        key = self.kernel_key()
+        # Identifies the compiled dissimilarity in the cache of pairwise dissimilarities
+        self._cache_token = (uuid.uuid4().hex if key is None
+                             else hashlib.blake2b(repr((type(self), key)).encode(), digest_size=16).hexdigest())
+        return self._set_kernels()
+
+    def _set_kernels(self) -> bool:
+        """
+        Sets the kernels compiled for the cache token of the dissimilarity, compiling them if there are none.
+        Returns True if they were compiled.
+        """
+        with _compiled_kernels_lock:
+            kernels = _compiled_kernels.get(self._cache_token)
+            if kernels is not None:
+                _compiled_kernels.move_to_end(self._cache_token)
+        compiled = kernels is None
+        if compiled:
+            kernels = {"d_mat": self.compile_d_mat()}
+            _identify_kernel(kernels["d_mat"], self._cache_token, "d_mat")
+            with _compiled_kernels_lock:
+                kernels = _compiled_kernels.setdefault(self._cache_token, kernels)
+                if len(_compiled_kernels) > COMPILED_KERNELS_MAX_SIZE:
+                    _compiled_kernels.popitem(last=False)
+        self._kernels: dict = kernels
+        self.d_mat: Callable[[np.ndarray, np.ndarray], float] = kernels["d_mat"]
+        return compiled
+
+    def __getstate__(self) -> dict:
+        """
+        Only the parameters of the dissimilarity are pickled, not its compiled kernels (see `__setstate__`).
+        """
+        state = self.__dict__.copy()
+        del state["d_mat"]
+        del state["_kernels"]
+        return state
+
+    def __setstate__(self, state: dict):
+        """
+        The kernels of an unpickled dissimilarity are compiled again, unless they already have been in this process
+        (for the same dissimilarity, or an identically configured one).
+        """
+        self.__dict__.update(state)
+        self._set_kernels()
+
+    def kernel_key(self) -> Optional[Hashable]:
+        """
+        Parameters of the dissimilarity on which its compiled kernels (see `compile_d_mat` and `compile_d_batch`)
+        depend. The dissimilarities of the same class and with equal keys (compared by their ``repr``) share their
+        kernels, which are thus only compiled once. Arrays can be included with `array_fingerprint`. Subclasses
+        whose kernels depend on other parameters must override it.
+
+        Defaults to None : the kernels of each dissimilarity are compiled for it only.
+        """
+        return None
 
     @abc.abstractmethod
     def compile_d_mat(self) -> Callable[[np.ndarray, np.ndarray], float]:
@@ -78,6 +251,38 @@ class AbstractDissimilarity(metaclass=ABCMeta):
         """
         raise NotImplemented()
 
+    def compile_d_batch(self) -> Optional[Callable[[np.ndarray, np.ndarray, np.ndarray], None]]:
+        """
+        Can return a batched version of ``d_mat`` (decorated with @batch_dissimilarity_dec) : ``d_batch(units1,
+        units2, out)`` sets ``out[i, j]`` to the dissimilarity between ``units1[i]`` and ``units2[j]``, for
+        arrays of units. Its loops are compiled together with the dissimilarity, so it is much faster than
+        ``d_mat`` on large continua.
+
+        Defaults to None : the dissimilarities are then computed with ``d_mat``.
+        """
+        return None
+
+    @property
+    def d_batch(self) -> Optional[Callable[[np.ndarray, np.ndarray, np.ndarray], None]]:
+        """
+        The batched dissimilarity (see `compile_d_batch`), compiled when first used.
+        """
+        if "d_batch" not in self._kernels:
+            self._kernels["d_batch"] = self.compile_d_batch()
+            _identify_kernel(self._kernels["d_batch"], self._cache_token, "d_batch")
+        return self._kernels["d_batch"]
+
+    def gap_lower_bound(self, gap: float, max_duration: float) -> float:
+        """
+        Lower bound of the dissimilarity between two units that are ``gap`` apart on the timeline (time between
+        the end of the first one and the start of the second one, 0 if they overlap), and whose summed durations
+        are at most ``max_duration``. It must be non-decreasing with ``gap``.
+
+        It lets the search for possible unitary alignments skip the couples of units that are too far apart to be
+        aligned. Defaults to 0 (all the couples of units are compared), which is valid for any dissimilarity.
+        """
+        return 0.
+
     def check_if_dissim(self):
         nb_cat = 10000 if self.categories is None else len(self.categories)
         # random (not np.random) will be used to not mess up seeding.
@@ -98,34 +303,44 @@ class AbstractDissimilarity(metaclass=ABCMeta):
                                      f"Exception found :\n "
                                      f"d({unit}, {unit}) = {self.d_mat(unit, unit)}")
 
-    def _build_arrays_continuum(self, continuum: 'Continuum') -> nb.typed.List:
+    def _build_arrays_continuum(self, continuum: 'Continuum') -> Tuple[np.ndarray, np.ndarray]:
         """
         Builds the compact, array-shaped representation of a continuum.
-        It is a list of 2D arrays where :
-            - Each array corresponds to an annotator (alphabetical order)
-            - Each array[i] of an array corresponds to a unit
-            - array[i, 0 to 3] correspond respectively to:
+        It is a 2D array of all the units, with an array of offsets, where :
+            - The units of each annotator (alphabetical order) are contiguous : the ones of the i-th annotator
+              are array[offsets[i]:offsets[i + 1]]
+            - Each array[u] corresponds to a unit
+            - array[u, 0 to 3] correspond respectively to:
                 - Start of the segment
                 - End of the segment
                 - Duration of the segment
                 - Annotation of the unit (index of categories in alphabetical order)
+
+        Returns ``(array, offsets)``.
         """
         categories = continuum.categories if self.categories is None else self.categories
 
         assert categories.issuperset(continuum.categories)
 
-        unit_arrays = nb.typed.List()
-        for annotator_id, (annotator, units) in enumerate(continuum._annotations.items()):
-            # dim x : segment
-            # dim y : (start, end, dur, annotation)
-            unit_array = np.empty((len(units), 4), dtype=np.float32)
-            for unit_id, unit in enumerate(units):
-                unit_array[unit_id][0] = unit.segment.start
-                unit_array[unit_id][1] = unit.segment.end
-                unit_array[unit_id][2] = unit.segment.duration
-                unit_array[unit_id][3] = categories.index(unit.annotation)
-            unit_arrays.append(unit_array)
-        return unit_arrays
+        categories_ids = {category: category_id for category_id, category in enumerate(categories)}
+        offsets = np.zeros(len(continuum._annotations) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(units) for units in continuum._annotations.values()])
+        units = [unit for annotator_units in continuum._annotations.values() for unit in annotator_units]
+        try:
+            annotations = [categories_ids[unit.annotation] for unit in units]
+        except KeyError as error:
+            raise ValueError(f"{error.args[0]!r} is not in list")
+        segments = np.array([(unit.segment.start, unit.segment.end) for unit in units],
+                            dtype=np.float64).reshape((len(units), 2))
+        durations = segments[:, 1] - segments[:, 0]
+        # dim x : unit
+        # dim y : (start, end, dur, annotation)
+        unit_array = np.empty((len(units), 4), dtype=np.float32)
+        unit_array[:, :2] = segments
+        # Same duration as Segment.duration (0 for the segments shorter than pyannote's precision)
+        unit_array[:, 2] = np.where(durations > SEGMENT_PRECISION, durations, 0.)
+        unit_array[:, 3] = annotations
+        return unit_array, offsets
 
     def _build_arrays_alignment(self, alignment: 'Alignment') -> np.ndarray:
         """
@@ -158,10 +373,10 @@ class AbstractDissimilarity(metaclass=ABCMeta):
         return alignment_array
 
     @staticmethod
-    @nb.njit(nb.float32[:](nb.float32[:, :, ::1],
-                           nb.types.FunctionType(nb.float32(nb.float32[:],
-                                                            nb.float32[:])),
-                           nb.float32))
+    @lazy_njit(nb.float32[:](nb.float32[:, :, ::1],
+                             nb.types.FunctionType(nb.float32(nb.float32[:],
+                                                              nb.float32[:])),
+                             nb.float32), nogil=True, cache=True)
     def _compute_alignment_disorders(alignment_array: np.ndarray,
                                      d_mat: Callable[[np.ndarray, np.ndarray], float],
                                      delta_empty: float):
@@ -183,77 +398,158 @@ class AbstractDissimilarity(metaclass=ABCMeta):
         res /= c2n
         return res
 
-    @staticmethod
-    @nb.njit(nb.types.Tuple((nb.float32[:], nb.int16[:, :]))(nb.types.ListType(nb.float32[:, ::1]),
-                                                             nb.types.FunctionType(nb.float32(nb.float32[:],
-                                                                                   nb.float32[:])),
-                                                             nb.float32))
-    def _get_all_valid_alignments(unit_arrays: nb.typed.List,
-                                  d_mat: Callable[[np.ndarray, np.ndarray], float],
-                                  delta_empty: float) -> Tuple[np.ndarray, np.ndarray]:
-        chunk_size = 10000
-        nb_annotators = len(unit_arrays)
+    def _max_gaps(self, units: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        """
+        For each couple of annotators, maximal gap between two of their units whose dissimilarity is low enough for
+        them to be in the same possible unitary alignment (found by bisection on ``gap_lower_bound``), or
+        ``np.inf`` if there is none.
+        """
+        return self._max_gaps_from_durations([float(units[start:stop, 2].max()) if stop > start else 0.
+                                              for start, stop in zip(offsets[:-1], offsets[1:])])
+
+    def _max_gaps_from_durations(self, max_durations: List[float]) -> np.ndarray:
+        """
+        Same as ``_max_gaps``, given the maximal duration of the units of each annotator.
+        """
+        nb_annotators = len(max_durations)
         c2n = (nb_annotators * (nb_annotators - 1) // 2)
-        criterium = c2n * delta_empty * nb_annotators
-
-        sizes_with_null = np.empty(nb_annotators).astype(np.int16)
-        sizes = np.empty(nb_annotators).astype(np.int16)
-        for annotator_id in range(nb_annotators):
-            sizes[annotator_id] = len(unit_arrays[annotator_id])
-            sizes_with_null[annotator_id] = len(unit_arrays[annotator_id]) + 1
-
-        # PRECOMPUTATION OF ALL INTER-ANNOTATOR COUPLES OF UNITS:
-        # This block computes a nested list of lists of inter-annotator dissim matrix between units.
-        # Each distance matrix is a 2D array where
-        # D[i,j] = dissim(AnnotatorA.Units[i], AnnotatorB.Units[j])
-
-        # this is a list of lists of "placeholder" arrays as to play nice with numba
-        precomputation = nb.typed.List([nb.typed.List([np.empty((0, 0), dtype=np.float32)] * i)
-                                        for i in range(nb_annotators)])
+        # the margin covers the rounding errors of the compiled (float32) dissimilarity
+        max_dissimilarity = float(c2n * self.delta_empty * nb_annotators) * (1 + 1e-4)
+        max_gaps = np.full((nb_annotators, nb_annotators), np.inf)
         for annotator_a in range(nb_annotators):
             for annotator_b in range(annotator_a):
-                nb_annot_a, nb_annot_b = sizes[annotator_a], sizes[annotator_b]
-                matrix = np.empty((nb_annot_a + 1, nb_annot_b + 1), dtype=np.float32)  # +1 for empty units
-                for annot_a in range(nb_annot_a):
-                    for annot_b in range(nb_annot_b):
-                        matrix[annot_a, annot_b] = d_mat(unit_arrays[annotator_a][annot_a],
-                                                         unit_arrays[annotator_b][annot_b])
-                # Empty units are at index nb_annot_x, so matrix is filled with delta-empties.
-                for annot_b in range(nb_annot_b + 1):
-                    matrix[nb_annot_a, annot_b] = delta_empty
-                for annot_a in range(nb_annot_a + 1):
-                    matrix[annot_a, nb_annot_b] = delta_empty
-
-                # replacing "placeholder" array with the actual precomputation array
-                precomputation[annotator_a][annotator_b] = matrix
-
-        # Now, computing disorders for each potential alignments
-        disorders = np.empty(chunk_size, dtype=np.float32)
-        alignments = np.empty((chunk_size, nb_annotators), dtype=np.int16)
-        i_chosen = 0
-        for unitary_alignment in iter_tuples(sizes_with_null):
-            # for each tuple (corresponding to a unitary alignment), compute disorder
-            disorder = 0
-            for annot_a in range(nb_annotators):
-                for annot_b in range(annot_a):
-                    disorder += precomputation[annot_a][annot_b][unitary_alignment[annot_a],
-                                                                 unitary_alignment[annot_b]]
-            if disorder <= criterium:
-                disorders[i_chosen] = disorder
-                alignments[i_chosen] = unitary_alignment
-                i_chosen += 1
-                if i_chosen == chunk_size:
-                    # Increasing the size of the result array if full
-                    # (security, doesn't happen often since chunk size
-                    # is already decently high by default)
-                    add_size = chunk_size // 2
-                    disorders = extend_right_disorders(disorders, add_size)
-                    alignments = extend_right_alignments(alignments, add_size)
-                    chunk_size += add_size
-        disorders, alignments = disorders[:i_chosen - 1], alignments[:i_chosen - 1]  # removing empty unitary alignment
+                max_duration = max_durations[annotator_a] + max_durations[annotator_b]
+                too_far = max(max_duration, 1.)
+                for _ in range(64):
+                    if self.gap_lower_bound(too_far, max_duration) > max_dissimilarity:
+                        break
+                    too_far *= 2
+                else:
+                    continue
+                within_reach = 0.
+                for _ in range(64):
+                    gap = (within_reach + too_far) / 2
+                    if self.gap_lower_bound(gap, max_duration) > max_dissimilarity:
+                        too_far = gap
+                    else:
+                        within_reach = gap
+                max_gaps[annotator_a, annotator_b] = max_gaps[annotator_b, annotator_a] = too_far
+        return max_gaps
+
+    @staticmethod
+    @lazy_njit(nb.types.Tuple((nb.float32[:], nb.int16[:, :]))(nb.float32[::1],
+                                                               nb.int64[::1],
+                                                               nb.int64[::1],
+                                                               nb.int64[:, :, ::1],
+                                                               nb.int16[::1],
+                                                               nb.float32), nogil=True, cache=True)
+    def _get_all_valid_alignments(bands: np.ndarray,
+                                  band_starts: np.ndarray,
+                                  band_stops: np.ndarray,
+                                  layout: np.ndarray,
+                                  sizes: np.ndarray,
+                                  delta_empty: float) -> Tuple[np.ndarray, np.ndarray]:
+        nb_annotators = len(sizes)
+        c2n = (nb_annotators * (nb_annotators - 1) // 2)
+        nb_roots = sizes[nb_annotators - 1] + 1
+        # A first search counts the possible unitary alignments, so that the second one stores them in arrays
+        # of the exact size.
+        nb_chosen = enumerate_valid_alignments(bands, band_starts, band_stops, layout, sizes, delta_empty,
+                                               0, nb_roots,
+                                               np.empty(0, dtype=np.float32),
+                                               np.empty((0, nb_annotators), dtype=sizes.dtype))
+        disorders = np.empty(nb_chosen, dtype=np.float32)
+        alignments = np.empty((nb_chosen, nb_annotators), dtype=sizes.dtype)
+        enumerate_valid_alignments(bands, band_starts, band_stops, layout, sizes, delta_empty,
+                                   0, nb_roots, disorders, alignments)
         disorders /= c2n
         return disorders, alignments
 
+    # Same search, for the continua whose unit indexes don't fit in int16 (compiled when first used)
+    _get_all_valid_alignments_int32 = staticmethod(nb.njit(_get_all_valid_alignments.__func__.py_func,
+                                                                  nogil=True, cache=True))
+
+    @staticmethod
+    @nb.njit(parallel=True, nogil=True, cache=True)  # only compiled when first used, since it takes long
+    def _get_all_valid_alignments_parallel(bands: np.ndarray,
+                                           band_starts: np.ndarray,
+                                           band_stops: np.ndarray,
+                                           layout: np.ndarray,
+                                           sizes: np.ndarray,
+                                           delta_empty: float,
+                                           nb_threads: int) -> Tuple[np.ndarray, np.ndarray]:
+        nb_annotators = len(sizes)
+        c2n = (nb_annotators * (nb_annotators - 1) // 2)
+        # The search is split by the unit of its first assigned annotator (the last one), in more chunks
+        # than threads since the number of possible unitary alignments varies a lot from one unit to another.
+        nb_roots = sizes[nb_annotators - 1] + 1
+        nb_chunks = min(nb_roots, 4 * nb_threads)
+        # The possible unitary alignments of each chunk are counted first, so that each chunk then fills its
+        # own part of the output arrays.
+        chunks_sizes = np.zeros(nb_chunks + 1, dtype=np.int64)
+        for chunk in nb.prange(nb_chunks):
+            chunks_sizes[chunk + 1] = enumerate_valid_alignments(bands, band_starts, band_stops, layout,
+                                                                 sizes, delta_empty,
+                                                                 chunk * nb_roots // nb_chunks,
+                                                                 (chunk + 1) * nb_roots // nb_chunks,
+                                                                 np.empty(0, dtype=np.float32),
+                                                                 np.empty((0, nb_annotators), dtype=sizes.dtype))
+        chunks_starts = np.cumsum(chunks_sizes)
+        disorders = np.empty(chunks_starts[nb_chunks], dtype=np.float32)
+        alignments = np.empty((chunks_starts[nb_chunks], nb_annotators), dtype=sizes.dtype)
+        for chunk in nb.prange(nb_chunks):
+            enumerate_valid_alignments(bands, band_starts, band_stops, layout, sizes, delta_empty,
+                                       chunk * nb_roots // nb_chunks, (chunk + 1) * nb_roots // nb_chunks,
+                                       disorders[chunks_starts[chunk]:chunks_starts[chunk + 1]],
+                                       alignments[chunks_starts[chunk]:chunks_starts[chunk + 1]])
+        disorders /= c2n
+        return disorders, alignments
+
+    @staticmethod
+    @nb.njit(nogil=True, cache=True)  # only compiled when first used
+    def _store_valid_alignments(bands: np.ndarray,
+                                band_starts: np.ndarray,
+                                band_stops: np.ndarray,
+                                layout: np.ndarray,
+                                sizes: np.ndarray,
+                                delta_empty: float,
+                                disorders: np.ndarray,
+                                alignments: np.ndarray) -> int:
+        """
+        Same search, storing the possible unitary alignments into the given arrays (which may be memory-mapped).
+        Returns their number : with empty arrays, they are only counted.
+        """
+        nb_annotators = len(sizes)
+        c2n = (nb_annotators * (nb_annotators - 1) // 2)
+        nb_chosen = enumerate_valid_alignments(bands, band_starts, band_stops, layout, sizes, delta_empty,
+                                               0, sizes[nb_annotators - 1] + 1, disorders, alignments)
+        disorders /= c2n
+        return nb_chosen
+
+    def _pairwise_dissimilarities(self,
+                                  units: np.ndarray,
+                                  offsets: np.ndarray,
+                                  sizes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Dissimilarities between the units of each couple of annotators that are close enough to be aligned
+        (see ``band_layout``). They are kept in ``pairwise_dissimilarities_cache``, so that they are only
+        computed once when the same continuum is aligned several times with this dissimilarity.
+        """
+        key = (self._cache_token, continuum_fingerprint(units, offsets))
+        pairwise = pairwise_dissimilarities_cache.get(key)
+        if pairwise is None:
+            band_starts, band_stops, layout, nb_values = band_layout(units, offsets, self._max_gaps(units, offsets),
+                                                                     sizes)
+            bands = np.empty(nb_values, dtype=np.float32)
+            d_batch = self.d_batch if nb_values >= BATCHED_DISSIMILARITIES_MIN_PAIRS else None
+            if d_batch is None:
+                fill_bands(units, offsets, self.d_mat, band_starts, band_stops, layout, bands)
+            else:
+                fill_bands_batched(units, offsets, d_batch, band_starts, band_stops, layout, bands)
+            pairwise = bands, band_starts, band_stops, layout
+            pairwise_dissimilarities_cache.put(key, pairwise)
+        return pairwise
+
     @abc.abstractmethod
     def d(self, unit1: 'Unit', unit2: 'Unit'):
         """
@@ -261,15 +557,48 @@ class AbstractDissimilarity(metaclass=ABCMeta):
         """
         raise NotImplemented()
 
-    def valid_alignments(self, continuum: 'Continuum') -> Tuple[np.ndarray, np.ndarray]:
+    def valid_alignments(self,
+                         continuum: 'Continuum',
+                         parallel: bool = False,
+                         storage: Optional['ScratchStorage'] = None) -> Tuple[np.ndarray, np.ndarray]:
         """
         Returns all the unitary alignment (in matricial form), and their disorders that could
         potentially be in the best alignment of the continuum (based on the criterium detailed
         in section 5.1.1 of the gamma paper (https://aclanthology.org/J15-3003.pdf).
+
+        If ``parallel`` is set, they are searched on all of numba's threads (see ``numba.set_num_threads``).
+        Only one such search runs at a time : if another one is already running, this one is sequential.
+
+        Unit indexes are int16, or int32 if an annotator has 32767 units or more (see ``unit_index_dtype``).
+
+        If a ``storage`` is given, the possible unitary alignments are counted first, and then stored in arrays
+        of this storage, which are memory-mapped to files if they exceed its memory budget (see ``ScratchStorage``).
+        This search is sequential.
         """
-        units_array = self._build_arrays_continuum(continuum)
-        res = self._get_all_valid_alignments(units_array, self.d_mat, self.delta_empty)
-        return res
+        units, offsets = self._build_arrays_continuum(continuum)
+        sizes = np.diff(offsets)
+        index_dtype = unit_index_dtype(int(sizes.max(initial=0)))
+        sizes = sizes.astype(index_dtype)
+        pairwise = self._pairwise_dissimilarities(units, offsets, sizes)
+        if storage is not None:
+            nb_annotators = len(sizes)
+            nb_alignments = self._store_valid_alignments(*pairwise, sizes, self.delta_empty,
+                                                         np.empty(0, dtype=np.float32),
+                                                         np.empty((0, nb_annotators), dtype=index_dtype))
+            disorders = storage.empty(nb_alignments, np.float32)
+            alignments = storage.empty((nb_alignments, nb_annotators), index_dtype)
+            self._store_valid_alignments(*pairwise, sizes, self.delta_empty, disorders, alignments)
+            return disorders, alignments
+        if parallel and _parallel_search_lock.acquire(blocking=False):
+            try:
+                # (the number of threads is an argument, as kernels reading it can't be cached)
+                return self._get_all_valid_alignments_parallel(*pairwise, sizes, self.delta_empty,
+                                                               nb.get_num_threads())
+            finally:
+                _parallel_search_lock.release()
+        if index_dtype == np.int16:
+            return self._get_all_valid_alignments(*pairwise, sizes, self.delta_empty)
+        return self._get_all_valid_alignments_int32(*pairwise, sizes, self.delta_empty)
 
     def compute_disorder(self, alignment: 'Alignment') -> np.ndarray:
         """
@@ -302,6 +631,28 @@ class PositionalSporadicDissimilarity(AbstractDissimilarity):
             return dist * dist * delta_empty
         return d_mat
 
+    def compile_d_batch(self):
+        delta_empty = self.delta_empty
+
+        @batch_dissimilarity_dec
+        def d_batch(units1: np.ndarray, units2: np.ndarray, out: np.ndarray):
+            for i in range(units1.shape[0]):
+                for j in range(units2.shape[0]):
+                    dist = ((np.abs(units1[i, 0] - units2[j, 0]) + np.abs(units1[i, 1] - units2[j, 1])) /
+                            (units1[i, 2] + units2[j, 2]))
+                    out[i, j] = dist * dist * delta_empty
+        return d_batch
+
+    def kernel_key(self):
+        return self.delta_empty,
+
+    def gap_lower_bound(self, gap: float, max_duration: float) -> float:
+        if gap <= 0 or max_duration <= 0:
+            return 0.
+        # |start1 - start2| + |end1 - end2| = 2 * gap + duration1 + duration2 for units that don't overlap
+        pos = 1 + 2 * gap / max_duration
+        return pos * pos * self.delta_empty
+
     def d(self, unit1: 'Unit', unit2: 'Unit'):
         pos = ((abs(unit1.segment.start - unit2.segment.start) + abs(unit1.segment.end - unit2.segment.end)) /
                (unit1.segment.duration + unit2.segment.duration))
@@ -329,6 +680,19 @@ class AbsoluteCategoricalDissimilarity(CategoricalDissimilarity):
             return (0 if unit1[3] == unit2[3] else 1) * delta_empty
         return d_mat
 
+    def compile_d_batch(self):
+        delta_empty = self.delta_empty
+
+        @batch_dissimilarity_dec
+        def d_batch(units1: np.ndarray, units2: np.ndarray, out: np.ndarray):
+            for i in range(units1.shape[0]):
+                for j in range(units2.shape[0]):
+                    out[i, j] = (0 if units1[i, 3] == units2[j, 3] else 1) * delta_empty
+        return d_batch
+
+    def kernel_key(self):
+        return self.delta_empty,
+
     def d(self, unit1: 'Unit', unit2: 'Unit'):
         return float(unit1.annotation != unit2.annotation) * self.delta_empty
 
@@ -353,6 +717,20 @@ class PrecomputedCategoricalDissimilarity(CategoricalDissimilarity):
             return matrix[np.int8(unit1[3]), np.int8(unit2[3])] * delta_empty
         return d_mat
 
+    def compile_d_batch(self):
+        matrix = self._matrix
+        delta_empty = self.delta_empty
+
+        @batch_dissimilarity_dec
+        def d_batch(units1: np.ndarray, units2: np.ndarray, out: np.ndarray):
+            for i in range(units1.shape[0]):
+                for j in range(units2.shape[0]):
+                    out[i, j] = matrix[np.int8(units1[i, 3]), np.int8(units2[j, 3])] * delta_empty
+        return d_batch
+
+    def kernel_key(self):
+        return self.delta_empty, array_fingerprint(self._matrix)
+
     def d(self, unit1: 'Unit', unit2: 'Unit'):
         return self._matrix[self.categories.index(unit1.annotation),
                             self.categories.index(unit2.annotation)] * self.delta_empty
@@ -393,7 +771,7 @@ class LevenshteinCategoricalDissimilarity(LambdaCategoricalDissimilarity):
         super().__init__(labels, delta_empty)
 
     @staticmethod
-    @nb.njit(nb.float32(nb.types.string, nb.types.string))
+    @lazy_njit(nb.float32(nb.types.string, nb.types.string), cache=True)
     def levenshtein(str1: str, str2: str) -> float:
         n1, n2 = len(str1) + 1, len(str2) + 1
         matrix_lev = np.zeros((n1, n2), dtype=np.int16)
@@ -495,11 +873,15 @@ class CombinedCategoricalDissimilarity(AbstractDissimilarity):
         if cat_dissim is None:
             cat_dissim = AbsoluteCategoricalDissimilarity()
 
-        cat_dissim.delta_empty = delta_empty
+        cat_dissim.delta_empty = np.float32(delta_empty)
+        # Its kernels are scaled by this delta_empty too
+        cat_dissim._compile_kernels()
         self.positional_dissim: AbstractDissimilarity = pos_dissim
         self.categorical_dissim: CategoricalDissimilarity = cat_dissim
-        self.alpha = alpha
-        self.beta = beta
+        # Like delta_empty, the coefficients are converted, so that the same values given as ints or floats give
+        # the same kernels (see kernel_key)
+        self.alpha = float(alpha)
+        self.beta = float(beta)
 
         super().__init__(delta_empty=delta_empty, categories=cat_dissim.categories)
 
@@ -515,7 +897,33 @@ class CombinedCategoricalDissimilarity(AbstractDissimilarity):
                     beta * cat(unit1, unit2))
         return d_mat
 
+    def compile_d_batch(self):
+        pos = self.positional_dissim.d_batch
+        cat = self.categorical_dissim.d_batch
+        if pos is None or cat is None:
+            return None
+        alpha = self.alpha
+        beta = self.beta
+
+        @batch_dissimilarity_dec
+        def d_batch(units1: np.ndarray, units2: np.ndarray, out: np.ndarray):
+            pos(units1, units2, out)
+            cat_out = np.empty(out.shape, dtype=np.float32)
+            cat(units1, units2, cat_out)
+            for i in range(out.shape[0]):
+                for j in range(out.shape[1]):
+                    out[i, j] = alpha * out[i, j] + beta * cat_out[i, j]
+        return d_batch
+
+    def kernel_key(self):
+        # The kernels of the positional and categorical dissimilarities are identified by their cache tokens
+        return self.alpha, self.beta, self.positional_dissim._cache_token, self.categorical_dissim._cache_token
+
     def d(self, unit1: 'Unit', unit2: 'Unit'):
         return (self.alpha * self.positional_dissim.d(unit1, unit2)
                 + self.beta * self.categorical_dissim.d(unit1, unit2))
 
+    def gap_lower_bound(self, gap: float, max_duration: float) -> float:
+        return (self.alpha * self.positional_dissim.gap_lower_bound(gap, max_duration)
+                + self.beta * self.categorical_dissim.gap_lower_bound(gap, max_duration))
+
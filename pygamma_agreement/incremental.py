@@ -0,0 +1,270 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2020-2021 CoML
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+"""
+##########
+Incremental alignment
+##########
+
+"""
+from typing import Dict, List, Optional, Set, Tuple, Union, TYPE_CHECKING
+
+import numpy as np
+from pyannote.core import Segment
+
+from .continuum import Annotator, Continuum, Unit, _build_constraint_matrix
+from .dissimilarity import AbstractDissimilarity
+from .solvers import AbstractAlignmentSolver, SolverSession, get_solver
+
+if TYPE_CHECKING:
+    from .alignment import Alignment, UnitaryAlignment
+
+
+# Default number of times the re-aligned region around an edit is extended with the units within reach of it
+DEFAULT_DEPTH = 2
+
+
+class IncrementalAligner:
+    """
+    Keeps the best alignment of a continuum up to date while it is edited (with `add` and `remove`), without
+    re-aligning the whole continuum after each edit.
+
+    An edit can only change the unitary alignments of the units close enough to the edited unit to be aligned with
+    it (i.e. whose gap with it is at most the maximal gap given by the dissimilarity's ``gap_lower_bound``). The
+    re-aligned region is made of those units and of the units they are aligned with, and is then extended ``depth``
+    times with the units within reach of the region (and the units they are aligned with). Only the units of this
+    region are re-aligned : their pairwise dissimilarities, possible unitary alignments and best alignment are
+    computed again, and the rest of the previous best alignment is kept as it is. The edits are taken into account
+    when the best alignment is next requested.
+
+    The alignment found is the best one among those that keep the unitary alignments outside of the region. It is
+    the best alignment of the continuum when the region stops growing before ``depth`` extensions (i.e. it is
+    made of whole connected components of the alignment problem, see `split_components`), and in practice almost
+    always otherwise, since the effect of an edit quickly fades out along the timeline. `reset` re-aligns the whole
+    continuum.
+
+    Adding a unit of a new annotator changes the disorder of every unitary alignment : the whole continuum is then
+    re-aligned. The continuum must only be edited through the aligner (or `reset` must be called afterwards).
+
+    >>> aligner = IncrementalAligner(continuum, dissimilarity)
+    >>> aligner.get_best_alignment().disorder
+    0.54...
+    >>> aligner.add("annotator_a", Segment(12, 15), "Noun")
+    >>> aligner.get_best_alignment().disorder  # only the units close to the new one are re-aligned
+    0.55...
+
+    Parameters
+    ----------
+    continuum: Continuum
+        The edited continuum.
+    dissimilarity: AbstractDissimilarity, optional
+        The dissimilarity used to align the continuum. Defaults to the combined categorical dissimilarity.
+    solver: str or AbstractAlignmentSolver, optional
+        The MIP solver (or its name) used to re-align the edited parts of the continuum, in a single session.
+        Defaults to "auto".
+    depth: int
+        Number of extensions of the re-aligned region around an edit.
+    """
+
+    def __init__(self,
+                 continuum: Continuum,
+                 dissimilarity: Optional[AbstractDissimilarity] = None,
+                 solver: Union[str, AbstractAlignmentSolver, SolverSession, None] = None,
+                 depth: int = DEFAULT_DEPTH):
+        if dissimilarity is None:
+            from .dissimilarity import CombinedCategoricalDissimilarity
+            dissimilarity = CombinedCategoricalDissimilarity()
+        if depth < 0:
+            raise ValueError(f"The depth of the re-aligned regions must be positive (got {depth}).")
+        self.continuum = continuum
+        self.dissimilarity = dissimilarity
+        solver = get_solver(solver)
+        if isinstance(solver, AbstractAlignmentSolver):
+            solver = solver.session()
+        self.solver = solver
+        self.depth = depth
+        # Number of units re-aligned by the last update of the best alignment
+        self.nb_realigned_units = 0
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the best alignment : the whole continuum is re-aligned when the best alignment is next requested.
+        """
+        # Annotators of the continuum at the last update (None if the whole continuum must be re-aligned)
+        self._annotators: Optional[List[Annotator]] = None
+        # Unitary alignment of each unit in the best alignment
+        self._units_alignments: Dict[Tuple[Annotator, Unit], 'UnitaryAlignment'] = {}
+        self._unitary_alignments: Set['UnitaryAlignment'] = set()
+        # Maximal duration of the units of each annotator (only increasing, until the next reset)
+        self._max_durations: Dict[Annotator, float] = {}
+        # Units edited since the last update (the removed units being used as locations on the timeline)
+        self._edited_units: Set[Tuple[Annotator, Unit]] = set()
+        self._alignment: Optional['Alignment'] = None
+
+    def add(self, annotator: Annotator, segment: Segment, annotation: Optional[str] = None):
+        """
+        Adds a unit to the continuum (see `Continuum.add`).
+        """
+        self.continuum.add(annotator, segment, annotation)
+        self._alignment = None
+        if self._annotators is None or annotator not in self._max_durations:
+            return
+        self._edited_units.add((annotator, Unit(segment, annotation)))
+        self._max_durations[annotator] = max(self._max_durations[annotator], segment.duration)
+
+    def remove(self, annotator: Annotator, unit: Unit):
+        """
+        Removes a unit from the continuum (see `Continuum.remove`).
+
+        Raises
+        ------
+        KeyError
+            if the unit is not from the annotator's annotations.
+        """
+        self.continuum.remove(annotator, unit)
+        self._alignment = None
+        if self._annotators is None:
+            return
+        self._edited_units.add((annotator, unit))
+
+    def get_best_alignment(self) -> 'Alignment':
+        """
+        Returns the best alignment of the continuum for the aligner's dissimilarity, after re-aligning the parts
+        of the continuum edited since the last call.
+        """
+        assert len(self.continuum.annotators) >= 2 and self.continuum, \
+            "Disorder cannot be computed with less than two annotators, or without annotations."
+        if self._alignment is None:
+            self._update()
+            from .alignment import Alignment
+
+            unitary_alignments = list(self._unitary_alignments)
+            disorder = (np.sum([unitary_alignment.disorder for unitary_alignment in unitary_alignments])
+                        / self.continuum.avg_num_annotations_per_annotator)
+            self._alignment = Alignment(unitary_alignments,
+                                        continuum=self.continuum,
+                                        check_validity=False,
+                                        disorder=disorder)
+        return self._alignment
+
+    def _update(self):
+        """
+        Re-aligns the regions of the continuum around the units edited since the last update.
+        """
+        annotators = list(self.continuum.annotators)
+        if annotators != self._annotators:
+            self.reset()
+            self._annotators = annotators
+            self._max_durations = {annotator: max((unit.segment.duration for unit in units), default=0.)
+                                   for annotator, units in self.continuum._annotations.items()}
+            self.nb_realigned_units = self.continuum.num_units
+            self._align(self.continuum)
+            return
+
+        region = self._region()
+        self._edited_units.clear()
+        for unit in region:
+            unitary_alignment = self._units_alignments.pop(unit, None)
+            self._unitary_alignments.discard(unitary_alignment)
+        # The removed units are only used to locate the region
+        region = [(annotator, unit) for annotator, unit in region if unit in self.continuum._annotations[annotator]]
+        self.nb_realigned_units = len(region)
+        if not region:
+            return
+        region_continuum = Continuum(self.continuum.uri)
+        for annotator in annotators:
+            region_continuum.add_annotator(annotator)
+        for annotator, unit in region:
+            region_continuum.add(annotator, unit.segment, unit.annotation)
+        self._align(region_continuum)
+
+    def _region(self) -> Set[Tuple[Annotator, Unit]]:
+        """
+        The units re-aligned after the edits : the units within reach of the edited units, extended ``depth``
+        times with the units within reach of them, along with the units they are aligned with.
+        """
+        max_gaps = self.dissimilarity._max_gaps_from_durations([self._max_durations[annotator]
+                                                                for annotator in self._annotators])
+        region = set()
+        frontier = self._edited_units
+        for _ in range(self.depth + 1):
+            reached = set()
+            for unit in frontier:
+                if unit in self._units_alignments:
+                    reached.add(unit)
+                reached |= self._units_within_reach(unit, max_gaps)
+            # The units of a unitary alignment are re-aligned together
+            for unit in list(reached):
+                reached.update((annotator, other_unit)
+                               for annotator, other_unit in self._units_alignments[unit].n_tuple
+                               if other_unit is not None)
+            frontier = reached - region
+            if not frontier:
+                break
+            region |= frontier
+        # Added units aren't aligned yet
+        return region | self._edited_units
+
+    def _units_within_reach(self,
+                            unit: Tuple[Annotator, Unit],
+                            max_gaps: np.ndarray) -> Set[Tuple[Annotator, Unit]]:
+        """
+        The aligned units of the other annotators that are close enough to the given unit to be aligned with it.
+        """
+        annotator, unit = unit
+        annotator_id = self._annotators.index(annotator)
+        within_reach = set()
+        for other_id, other in enumerate(self._annotators):
+            if other_id == annotator_id:
+                continue
+            max_gap = max_gaps[annotator_id, other_id]
+            other_units = self.continuum._annotations[other]
+            # Units are sorted by their segment : the ones that start within reach are found by bisection
+            lowest_start = unit.segment.start - max_gap - self._max_durations[other]
+            highest_start = unit.segment.end + max_gap
+            first = (other_units.bisect_left(Unit(Segment(lowest_start, lowest_start)))
+                     if np.isfinite(lowest_start) else 0)
+            last = (other_units.bisect_right(Unit(Segment(highest_start, np.inf)))
+                    if np.isfinite(highest_start) else len(other_units))
+            for other_unit in other_units.islice(first, last):
+                if (other_unit.segment.end >= unit.segment.start - max_gap
+                        and (other, other_unit) in self._units_alignments):
+                    within_reach.add((other, other_unit))
+        return within_reach
+
+    def _align(self, region: Continuum):
+        """
+        Finds the best alignment of the given part of the continuum (which has all its annotators), and keeps its
+        unitary alignments.
+        """
+        sizes = np.array([len(units) for units in region._annotations.values()], dtype=np.int32)
+        disorders, possible_unitary_alignments = self.dissimilarity.valid_alignments(region)
+        A = _build_constraint_matrix(possible_unitary_alignments, sizes)
+        chosen_alignments_ids = self.solver.solve(disorders, A)
+        for unitary_alignment in region._indexes_to_unitary_alignments(
+                possible_unitary_alignments[chosen_alignments_ids], disorders[chosen_alignments_ids]):
+            self._unitary_alignments.add(unitary_alignment)
+            for annotator, unit in unitary_alignment.n_tuple:
+                if unit is not None:
+                    self._units_alignments[(annotator, unit)] = unitary_alignment
@@ -23,11 +23,77 @@
 # AUTHORS
 # Rachid RIAD, Hadrien TITEUX, Léopold FAVRE
 
+import threading
+import time
+import warnings
+from functools import update_wrapper
+from typing import Callable, Iterable
+
 import numba as nb
 import numpy as np
 
 
-@nb.njit(nb.float32(nb.types.string, nb.types.string))
+class LazyKernel:
+    """
+    Numba kernel with explicit signatures, that is only compiled (or loaded from numba's cache) when it is first
+    used, instead of when its module is imported : numba's initialization and the loading of the kernels are
+    then only paid for by the programs that actually run them. Calling the kernel, or reading any of the
+    attributes of its dispatcher (e.g. ``targetoptions``), compiles it.
+
+    Parameters
+    ----------
+    py_func: Callable
+        the python function of the kernel
+    signatures:
+        the signature(s) of the kernel, as given to ``numba.njit``
+    ignored_warnings: iterable of str
+        messages of the numba warnings that are silenced while compiling the kernel
+    options:
+        the other options of ``numba.njit``
+    """
+
+    def __init__(self, py_func: Callable, signatures, ignored_warnings: Iterable[str] = (), **options):
+        update_wrapper(self, py_func)
+        self.py_func = py_func
+        self._signatures = signatures
+        self._ignored_warnings = tuple(ignored_warnings)
+        self._options = options
+        self._dispatcher = None
+        self._lock = threading.Lock()
+
+    @property
+    def dispatcher(self):
+        """The numba dispatcher of the kernel, compiled when first accessed."""
+        if self._dispatcher is None:
+            with self._lock:
+                if self._dispatcher is None:
+                    with warnings.catch_warnings():
+                        for message in self._ignored_warnings:
+                            warnings.filterwarnings("ignore", message=message, category=nb.NumbaWarning)
+                        self._dispatcher = nb.njit(self._signatures, **self._options)(self.py_func)
+        return self._dispatcher
+
+    def __call__(self, *args):
+        return self.dispatcher(*args)
+
+    def __getattr__(self, name: str):
+        # Only called for the attributes that aren't the kernel's own (e.g. the ones of its dispatcher)
+        if name.startswith("__") or name in ("_dispatcher", "_lock", "py_func"):
+            raise AttributeError(name)
+        return getattr(self.dispatcher, name)
+
+    def __repr__(self):
+        return f"LazyKernel({self.py_func.__qualname__})"
+
+
+def lazy_njit(signatures, **options) -> Callable[[Callable], LazyKernel]:
+    """
+    Decorator that makes a `LazyKernel`, with the same arguments as ``numba.njit``.
+    """
+    return lambda py_func: LazyKernel(py_func, signatures, **options)
+
+
+@lazy_njit(nb.float32(nb.types.string, nb.types.string), cache=True)
 def levenshtein(str1: str, str2: str):
     n1, n2 = len(str1) + 1, len(str2) + 1
     matrix_lev = np.empty((n1, n2), dtype=np.int16)
@@ -44,57 +110,288 @@ def levenshtein(str1: str, str2: str):
     return matrix_lev[-1, -1]
 
 
-@nb.njit(nb.int16[:, ::1](nb.int16[:, ::1], nb.int64))
-def extend_right_alignments(arr: np.ndarray, n: int):
-    i, j = arr.shape
-    new_array = np.empty((i + n, j), dtype=np.int16)
-    new_array[:i, :] = arr
-    return new_array
+def unit_index_dtype(max_nb_units: int) -> type:
+    """
+    Integer type of the unit indexes in the arrays of unitary alignments : the compact int16 while the
+    index of the empty unit (the number of units of the annotator) fits in it, int32 otherwise.
+    """
+    return np.int16 if max_nb_units < np.iinfo(np.int16).max else np.int32
+
+
+@nb.njit(cache=True)
+def banded_dissimilarity(bands: np.ndarray, band_starts: np.ndarray, layout: np.ndarray, sizes: np.ndarray,
+                         delta_empty: float, annotator_a: int, annotator_b: int, unit_a: int, unit_b: int):
+    """
+    Dissimilarity between the unit_a-th unit of annotator_a and the unit_b-th unit of annotator_b
+    (annotator_b < annotator_a), read from the banded precomputation of their dissimilarities.
+    Index sizes[annotator] stands for the empty unit.
+    """
+    if unit_a == sizes[annotator_a] or unit_b == sizes[annotator_b]:
+        return delta_empty
+    offset, width, rows = layout[annotator_a, annotator_b]
+    return bands[offset + unit_a * width + unit_b - band_starts[rows + unit_a]]
+
+
+@lazy_njit([(nb.float32[:, ::1], nb.int64[::1], nb.float64[:, ::1], index_type[::1])
+            for index_type in (nb.int16, nb.int32)], nogil=True, cache=True)
+def band_layout(units: np.ndarray, offsets: np.ndarray, max_gaps: np.ndarray, sizes: np.ndarray):
+    """
+    Layout of the precomputed inter-annotator dissimilarities of units.
+    A unit of annotator A can only be aligned with the units of annotator B that are at most
+    max_gaps[A, B] away from it. Units being sorted by start, those form a band of indices
+    [starts[i], stops[i]) found by bisection, and the dissimilarities between units are stored in
+    a banded 2D array (of the width of the widest band) where
+    D[i,j - starts[i]] = dissim(AnnotatorA.Units[i], AnnotatorB.Units[j])
+    The units of annotator A are ``units[offsets[A]:offsets[A + 1]]`` (see
+    ``AbstractDissimilarity._build_arrays_continuum``).
 
+    To keep the lookups fast, all those arrays are stored flat : ``bands`` (of ``nb_values`` values, filled by
+    `fill_bands`) contains the banded arrays, and ``band_starts`` and ``band_stops`` the bands' limits for all
+    the couples of annotators. For the couple (A, B), with B < A, ``layout[A, B]`` contains the offset of its
+    banded array in ``bands``, its width, and the offset of its bands' limits.
 
-@nb.njit(nb.float32[:](nb.float32[:], nb.int64))
-def extend_right_disorders(arr: np.ndarray, n: int):
-    new_array = np.empty(len(arr) + n, dtype=np.float32)
-    new_array[:len(arr)] = arr
-    return new_array
+    Returns ``(band_starts, band_stops, layout, nb_values)``.
+    """
+    nb_annotators = len(sizes)
+    layout = np.zeros((nb_annotators, nb_annotators, 3), dtype=np.int64)
+    nb_rows = 0
+    for annotator_a in range(nb_annotators):
+        for annotator_b in range(annotator_a):
+            layout[annotator_a, annotator_b, 2] = nb_rows
+            nb_rows += sizes[annotator_a]
+    band_starts = np.zeros(nb_rows, dtype=np.int64)
+    band_stops = np.zeros(nb_rows, dtype=np.int64)
+
+    nb_values = 0
+    for annotator_a in range(nb_annotators):
+        units_a = units[offsets[annotator_a]:offsets[annotator_a + 1]]
+        for annotator_b in range(annotator_a):
+            units_b = units[offsets[annotator_b]:offsets[annotator_b + 1]]
+            nb_annot_a, nb_annot_b = sizes[annotator_a], sizes[annotator_b]
+            rows = layout[annotator_a, annotator_b, 2]
+            starts = band_starts[rows:rows + nb_annot_a]
+            stops = band_stops[rows:rows + nb_annot_a]
+            stops[:] = nb_annot_b
+            max_gap = max_gaps[annotator_a, annotator_b]
+            if max_gap < np.inf and nb_annot_b > 0 and np.all(units_b[1:, 0] >= units_b[:-1, 0]):
+                # Latest end of the first units of B, which is non-decreasing
+                max_ends = np.empty(nb_annot_b, dtype=np.float64)
+                max_end = -np.inf
+                for annot_b in range(nb_annot_b):
+                    max_end = max(max_end, units_b[annot_b, 1])
+                    max_ends[annot_b] = max_end
+                starts_b = units_b[:, 0].astype(np.float64)
+                for annot_a in range(nb_annot_a):
+                    starts[annot_a] = np.searchsorted(max_ends, units_a[annot_a, 0] - max_gap, side='left')
+                    stops[annot_a] = max(np.searchsorted(starts_b, units_a[annot_a, 1] + max_gap, side='right'),
+                                         starts[annot_a])
+            width = 0
+            for annot_a in range(nb_annot_a):
+                width = max(width, stops[annot_a] - starts[annot_a])
+            layout[annotator_a, annotator_b, 0] = nb_values
+            layout[annotator_a, annotator_b, 1] = width
+            nb_values += nb_annot_a * width
+    return band_starts, band_stops, layout, nb_values
 
 
-@nb.njit()
-def iter_tuples(sizes: np.ndarray):
+@lazy_njit(nb.void(nb.float32[:, ::1], nb.int64[::1],
+                   nb.types.FunctionType(nb.float32(nb.float32[:], nb.float32[:])),
+                   nb.int64[::1], nb.int64[::1], nb.int64[:, :, ::1], nb.float32[::1]), nogil=True, cache=True)
+def fill_bands(units: np.ndarray, offsets: np.ndarray, d_mat, band_starts: np.ndarray, band_stops: np.ndarray,
+               layout: np.ndarray, bands: np.ndarray):
     """
-    Iterates over all the arrays of {0..sizes[0]-1} * {0..size[1]-1} * ... * {0..size[n-1]-1}
+    Computes the banded inter-annotator dissimilarities of units (see `band_layout`), one couple of units
+    at a time.
+    """
+    nb_annotators = len(offsets) - 1
+    for annotator_a in range(nb_annotators):
+        units_a = units[offsets[annotator_a]:offsets[annotator_a + 1]]
+        for annotator_b in range(annotator_a):
+            units_b = units[offsets[annotator_b]:offsets[annotator_b + 1]]
+            offset, width, rows = layout[annotator_a, annotator_b]
+            for annot_a in range(len(units_a)):
+                start = band_starts[rows + annot_a]
+                for annot_b in range(start, band_stops[rows + annot_a]):
+                    bands[offset + annot_a * width + annot_b - start] = d_mat(units_a[annot_a], units_b[annot_b])
+
+
+@lazy_njit(nb.void(nb.float32[:, ::1], nb.int64[::1],
+                   nb.types.FunctionType(nb.void(nb.float32[:, :], nb.float32[:, :], nb.float32[:, :])),
+                   nb.int64[::1], nb.int64[::1], nb.int64[:, :, ::1], nb.float32[::1]), nogil=True, cache=True)
+def fill_bands_batched(units: np.ndarray, offsets: np.ndarray, d_batch, band_starts: np.ndarray,
+                       band_stops: np.ndarray, layout: np.ndarray, bands: np.ndarray):
+    """
+    Same as `fill_bands`, with a batched dissimilarity (see ``AbstractDissimilarity.compile_d_batch``) :
+    the dissimilarities of a couple of annotators are computed at once when all their units are compared,
+    and otherwise one band at a time.
+    """
+    nb_annotators = len(offsets) - 1
+    for annotator_a in range(nb_annotators):
+        units_a = units[offsets[annotator_a]:offsets[annotator_a + 1]]
+        for annotator_b in range(annotator_a):
+            units_b = units[offsets[annotator_b]:offsets[annotator_b + 1]]
+            offset, width, rows = layout[annotator_a, annotator_b]
+            banded = bands[offset:offset + len(units_a) * width].reshape((len(units_a), width))
+            starts = band_starts[rows:rows + len(units_a)]
+            stops = band_stops[rows:rows + len(units_a)]
+            if width == len(units_b) and np.all(starts == 0):
+                d_batch(units_a, units_b, banded)
+                continue
+            for annot_a in range(len(units_a)):
+                start, stop = starts[annot_a], stops[annot_a]
+                d_batch(units_a[annot_a:annot_a + 1], units_b[start:stop],
+                        banded[annot_a:annot_a + 1, :stop - start])
+
+
+@nb.njit(cache=True)
+def enumerate_valid_alignments(bands: np.ndarray, band_starts: np.ndarray, band_stops: np.ndarray,
+                               layout: np.ndarray, sizes: np.ndarray, delta_empty: float,
+                               roots_start: int, roots_stop: int, disorders: np.ndarray, alignments: np.ndarray):
+    """
+    Finds the possible unitary alignments whose unit of the last annotator is in [roots_start, roots_stop)
+    (sizes[-1] being the empty unit), with a depth-first search that assigns one annotator at a time (the
+    last annotator first, so that unitary alignments are found in the same order as the cartesian product
+    of the units). Only the units within reach of all the units assigned so far are tried, and the
+    dissimilarities being non-negative, a branch is cut as soon as the disorder between its assigned units
+    exceeds the criterium.
+
+    Returns the number of possible unitary alignments. The first ones are stored in ``alignments``, and
+    their (summed, not averaged) disorders in ``disorders``, as long as those arrays are big enough : a first
+    search with empty arrays counts them, so that a second one fills arrays of the exact size.
     """
     nb_annotators = len(sizes)
-    current = np.zeros(nb_annotators, dtype=np.int16)
-    while True:
-        yield current
-        for i in range(nb_annotators):
-            current[i] += 1
-            if current[i] < sizes[i]:
-                break
-            current[i] = 0
-        else:
-            return
-
-
-@nb.njit(nb.float32[:, ::1](nb.int16[:, :],
-                            nb.int32[:]))
+    c2n = (nb_annotators * (nb_annotators - 1) // 2)
+    criterium = c2n * delta_empty * nb_annotators
+
+    i_chosen = 0
+    # small slack so that the partial sums (accumulated in a different order) never cut a valid alignment
+    bound = criterium * (1. + 1e-6)
+    unitary_alignment = np.zeros(nb_annotators, dtype=np.int64)
+    candidates_stops = np.empty(nb_annotators, dtype=np.int64)
+    partial_disorders = np.zeros(nb_annotators, dtype=np.float64)
+    unitary_alignment[nb_annotators - 1] = roots_start - 1
+    candidates_stops[nb_annotators - 1] = sizes[nb_annotators - 1]
+    depth = 0
+    while depth >= 0:
+        annotator = nb_annotators - 1 - depth
+        unitary_alignment[annotator] += 1
+        if depth == 0 and unitary_alignment[annotator] >= roots_stop:
+            break
+        if candidates_stops[annotator] <= unitary_alignment[annotator] < sizes[annotator]:
+            # the next units are out of reach, only the empty unit is left
+            unitary_alignment[annotator] = sizes[annotator]
+        if unitary_alignment[annotator] > sizes[annotator]:
+            # all the candidate units (and the empty unit) of this annotator were tried : backtracking
+            depth -= 1
+            continue
+        partial_disorder = partial_disorders[depth]
+        for annot_a in range(annotator + 1, nb_annotators):
+            partial_disorder += banded_dissimilarity(bands, band_starts, layout, sizes, delta_empty,
+                                                     annot_a, annotator,
+                                                     unitary_alignment[annot_a], unitary_alignment[annotator])
+        if partial_disorder > bound:
+            continue
+        if annotator > 0:
+            depth += 1
+            partial_disorders[depth] = partial_disorder
+            # candidates of the next annotator : its units within reach of all the assigned (non-empty) units
+            candidates_start, candidates_stop = 0, sizes[annotator - 1]
+            for annot_a in range(annotator, nb_annotators):
+                if unitary_alignment[annot_a] < sizes[annot_a]:
+                    row = layout[annot_a, annotator - 1, 2] + unitary_alignment[annot_a]
+                    candidates_start = max(candidates_start, band_starts[row])
+                    candidates_stop = min(candidates_stop, band_stops[row])
+            unitary_alignment[annotator - 1] = candidates_start - 1
+            candidates_stops[annotator - 1] = candidates_stop
+            continue
+
+        is_empty = True
+        for annot_a in range(nb_annotators):
+            if unitary_alignment[annot_a] != sizes[annot_a]:
+                is_empty = False
+        if is_empty:
+            # removing empty unitary alignment
+            continue
+        if i_chosen >= len(disorders) and partial_disorder < criterium * (1. - 1e-6):
+            # the unitary alignment is only counted : its exact disorder is only needed close to the criterium
+            i_chosen += 1
+            continue
+        # for each tuple (corresponding to a unitary alignment), compute disorder
+        disorder = 0.
+        for annot_a in range(nb_annotators):
+            for annot_b in range(annot_a):
+                disorder += banded_dissimilarity(bands, band_starts, layout, sizes, delta_empty,
+                                                 annot_a, annot_b,
+                                                 unitary_alignment[annot_a], unitary_alignment[annot_b])
+        if disorder <= criterium:
+            if i_chosen < len(disorders):
+                disorders[i_chosen] = disorder
+                for annot_a in range(nb_annotators):
+                    alignments[i_chosen, annot_a] = unitary_alignment[annot_a]
+            i_chosen += 1
+    return i_chosen
+
+
+@nb.njit(nogil=True, cache=True)
+def fill_A_indptr(possible_unitary_alignments: np.ndarray,
+                  sizes: np.ndarray,
+                  indptr: np.ndarray):
+    """
+    Fills the ``indptr`` array of the CSC constraint matrix (see `build_A`), whose last value is the
+    number of non-zeros of the matrix.
+    """
+    n, nb_annotators = possible_unitary_alignments.shape
+    indptr[0] = 0
+    for p_id in range(n):
+        nnz = 0
+        for annotator_id in range(nb_annotators):
+            if possible_unitary_alignments[p_id, annotator_id] != sizes[annotator_id]:  # Non-null unit
+                nnz += 1
+        indptr[p_id + 1] = indptr[p_id] + nnz
+
+
+@nb.njit(nogil=True, cache=True)
+def fill_A_indices(possible_unitary_alignments: np.ndarray,
+                   sizes: np.ndarray,
+                   indptr: np.ndarray,
+                   indices: np.ndarray):
+    """
+    Fills the ``indices`` array of the CSC constraint matrix (see `build_A`), given its ``indptr`` array.
+    """
+    n, nb_annotators = possible_unitary_alignments.shape
+    for p_id in range(n):
+        annotator_units_start = 0
+        i = indptr[p_id]
+        for annotator_id in range(nb_annotators):
+            unit_id = possible_unitary_alignments[p_id, annotator_id]
+            if unit_id != sizes[annotator_id]:
+                indices[i] = annotator_units_start + unit_id
+                i += 1
+            annotator_units_start += sizes[annotator_id]
+
+
+@lazy_njit([nb.types.Tuple((nb.int64[:], nb.int64[:]))(nb.int16[:, :], nb.int32[:]),
+            nb.types.Tuple((nb.int64[:], nb.int64[:]))(nb.int32[:, :], nb.int32[:])], nogil=True, cache=True)
 def build_A(possible_unitary_alignments: np.ndarray,
             sizes: np.ndarray):
-    nb_units = np.sum(sizes)
+    """
+    Builds the sparse constraint matrix of the alignment problem ("every unit must appear once
+    and only once"), in CSC form : the matrix has one row per unit and one column per unitary alignment,
+    and each column contains at most one non-zero (always equal to 1) per annotator.
+
+    Returns the ``(indptr, indices)`` arrays of the CSC matrix, so that the memory used
+    only scales with the number of non-null units in the unitary alignments.
+    """
     n = len(possible_unitary_alignments)
-    A = np.zeros((nb_units, n), dtype=np.float32)
-    for p_id, unit_ids_tuple in enumerate(possible_unitary_alignments):
-        annotator_units_start = 0
-        for annotator_id, unit_id in enumerate(unit_ids_tuple):
-            if unit_id != sizes[annotator_id]:  # Non-null unit
-                A[annotator_units_start + unit_id, p_id] = 1
-            annotator_units_start += sizes[annotator_id]
-    return A
+    indptr = np.empty(n + 1, dtype=np.int64)
+    fill_A_indptr(possible_unitary_alignments, sizes, indptr)
+    indices = np.empty(indptr[n], dtype=np.int64)
+    fill_A_indices(possible_unitary_alignments, sizes, indptr, indices)
+    return indptr, indices
 
 
-@nb.njit(nb.float32[:, ::1](nb.int32,
-                            nb.int32[:]))
+@lazy_njit(nb.float32[:, ::1](nb.int32,
+                              nb.int32[:]), nogil=True, cache=True)
 def build_K(nb_units: int, sizes: np.ndarray):
     nb_annotators = len(sizes)
 
@@ -107,7 +404,272 @@ def build_K(nb_units: int, sizes: np.ndarray):
     return annotator_units
 
 
+# Both signatures are compiled, since the index arrays of scipy's sparse matrices are int32 or int64
+@lazy_njit([nb.boolean[::1](index_type[::1],
+                            index_type[::1],
+                            nb.float32[::1],
+                            nb.boolean[::1],
+                            nb.int64,
+                            nb.float64)
+            for index_type in (nb.int32, nb.int64)], nogil=True, cache=True)
+def merge_tied_alignments(indptr: np.ndarray,
+                          indices: np.ndarray,
+                          disorders: np.ndarray,
+                          chosen: np.ndarray,
+                          nb_units: int,
+                          tolerance: float):
+    """
+    Canonicalizes a best alignment (given as a boolean mask over the possible unitary alignments, whose
+    units are given by the CSC constraint matrix ``(indptr, indices)``) in case of ties: whenever a group
+    of chosen unitary alignments can be replaced by a single possible unitary alignment containing exactly
+    the same units and with the same disorder (up to ``tolerance``), the replacement is made.
+    This makes the best alignment independent of the MIP solver used.
+    """
+    n = len(disorders)
+    owner = np.full(nb_units, -1, dtype=np.int64)
+    max_nnz = 0
+    for p_id in range(n):
+        max_nnz = max(max_nnz, indptr[p_id + 1] - indptr[p_id])
+        if chosen[p_id]:
+            for i in range(indptr[p_id], indptr[p_id + 1]):
+                owner[indices[i]] = p_id
+
+    owners = np.empty(max_nnz, dtype=np.int64)
+    for p_id in range(n):
+        nnz = indptr[p_id + 1] - indptr[p_id]
+        if chosen[p_id] or nnz < 2:
+            continue
+        # Chosen unitary alignments that contain the units of p_id
+        nb_owners, nb_owned_units, owners_disorder = 0, 0, 0.0
+        for i in range(indptr[p_id], indptr[p_id + 1]):
+            unit_owner = owner[indices[i]]
+            for j in range(nb_owners):
+                if owners[j] == unit_owner:
+                    break
+            else:
+                owners[nb_owners] = unit_owner
+                nb_owners += 1
+                nb_owned_units += indptr[unit_owner + 1] - indptr[unit_owner]
+                owners_disorder += disorders[unit_owner]
+        if nb_owners < 2 or nb_owned_units != nnz or disorders[p_id] > owners_disorder + tolerance:
+            continue
+        for j in range(nb_owners):
+            chosen[owners[j]] = False
+        chosen[p_id] = True
+        for i in range(indptr[p_id], indptr[p_id + 1]):
+            owner[indices[i]] = p_id
+    return chosen
+
+
+@lazy_njit([nb.types.Tuple((nb.int64, nb.int64[::1]))(index_type[::1],
+                                                       index_type[::1],
+                                                       nb.int64)
+            for index_type in (nb.int32, nb.int64)], nogil=True, cache=True)
+def alignment_components(indptr: np.ndarray,
+                         indices: np.ndarray,
+                         nb_units: int):
+    """
+    Finds the connected components of the bipartite graph units/possible unitary alignments, given by the
+    CSC constraint matrix ``(indptr, indices)`` : two units are connected if they appear in a common possible
+    unitary alignment. Each of those components is an independent sub-problem of the best alignment problem.
+
+    Returns the number of components, and the component of each possible unitary alignment. Components are
+    numbered in the order of appearance of the possible unitary alignments.
+    """
+    # Union-find on the units, with path halving
+    parents = np.arange(nb_units)
+    for p_id in range(len(indptr) - 1):
+        if indptr[p_id] == indptr[p_id + 1]:
+            continue
+        root_a = indices[indptr[p_id]]
+        while parents[root_a] != root_a:
+            parents[root_a] = parents[parents[root_a]]
+            root_a = parents[root_a]
+        for i in range(indptr[p_id] + 1, indptr[p_id + 1]):
+            root_b = indices[i]
+            while parents[root_b] != root_b:
+                parents[root_b] = parents[parents[root_b]]
+                root_b = parents[root_b]
+            if root_a != root_b:
+                parents[root_b] = root_a
+
+    roots_labels = np.full(nb_units, -1, dtype=np.int64)
+    candidates_labels = np.empty(len(indptr) - 1, dtype=np.int64)
+    nb_components = 0
+    for p_id in range(len(indptr) - 1):
+        root = indices[indptr[p_id]]
+        while parents[root] != root:
+            root = parents[root]
+        if roots_labels[root] == -1:
+            roots_labels[root] = nb_components
+            nb_components += 1
+        candidates_labels[p_id] = roots_labels[root]
+    return nb_components, candidates_labels
+
+
+def set_partitioning_bb(indptr: np.ndarray,
+                        indices: np.ndarray,
+                        costs: np.ndarray,
+                        nb_units: int,
+                        incumbent: np.ndarray,
+                        upper_bound: float,
+                        mip_gap: float,
+                        deadline: float):
+    """
+    Exact depth-first branch-and-bound for the set partitioning problem given by the CSC matrix
+    ``(indptr, indices)`` (column p contains the units of candidate p) : returns the boolean mask of the
+    candidates that cover each unit exactly once, with minimal total cost, and a lower bound of this cost.
+
+    At each node, the search branches on the uncovered unit with the fewest candidates left, trying its candidates
+    by increasing cost per unit. A node is pruned when its cost plus the cost per unit of the cheapest remaining
+    candidate of each uncovered unit isn't lower than the cost of the best solution found (initially, ``incumbent``
+    and its cost ``upper_bound``, that can be set to +inf and an empty mask if no solution is known), reduced
+    by the relative gap ``mip_gap``.
+    The search stops when ``time.perf_counter()`` exceeds ``deadline`` (that can be set to +inf), the best solution
+    found so far being returned along with the bound of the root node.
+    """
+    nb_candidates = len(indptr) - 1
+    # Cost per unit of each candidate : the total cost is the sum of the shares of the units
+    shares = np.empty(nb_candidates, dtype=np.float64)
+    for p_id in range(nb_candidates):
+        shares[p_id] = costs[p_id] / max(indptr[p_id + 1] - indptr[p_id], 1)
+
+    # CSR transposition of the matrix (candidates of each unit), sorted by increasing share
+    row_ptr = np.zeros(nb_units + 1, dtype=np.int64)
+    for i in range(len(indices)):
+        row_ptr[indices[i] + 1] += 1
+    for unit in range(nb_units):
+        row_ptr[unit + 1] += row_ptr[unit]
+    order = np.argsort(shares, kind="mergesort")
+    row_candidates = np.empty(len(indices), dtype=np.int64)
+    filled = row_ptr[:-1].copy()
+    for p_id in order:
+        for i in range(indptr[p_id], indptr[p_id + 1]):
+            row_candidates[filled[indices[i]]] = p_id
+            filled[indices[i]] += 1
+
+    best = incumbent.copy()
+    tolerance = 1e-9 * max(1., np.sum(np.abs(costs)))
+    covered = np.zeros(nb_units, dtype=np.bool_)
+    # Number of chosen candidates sharing a unit with each candidate (which can be chosen only if it is 0)
+    conflicts = np.zeros(nb_candidates, dtype=np.int64)
+    # Number of candidates that can still be chosen for each unit
+    available = np.diff(row_ptr)
+    nb_covered = 0
+    cost = 0.
+    root_bound = -np.inf
+    nb_nodes = 0
+    aborted = False
+
+    frames_unit = np.empty(nb_units, dtype=np.int64)
+    frames_pos = np.empty(nb_units, dtype=np.int64)
+    frames_candidate = np.full(nb_units, -1, dtype=np.int64)
+    depth = -1
+    descend = True
+    while True:
+        if descend:
+            descend = False
+            nb_nodes += 1
+            if deadline < np.inf and nb_nodes % 1024 == 0:
+                with nb.objmode(now="float64"):
+                    now = time.perf_counter()
+                if now > deadline:
+                    aborted = True
+                    break
+            if nb_covered == nb_units:
+                if cost < upper_bound - tolerance:
+                    upper_bound = cost
+                    best[:] = False
+                    for d in range(depth + 1):
+                        best[frames_candidate[d]] = True
+            else:
+                # Lower bound of the cost of covering the remaining units, and choice of the branching unit
+                lower_bound = 0.
+                branching_unit = -1
+                for unit in range(nb_units):
+                    if covered[unit]:
+                        continue
+                    if available[unit] == 0:
+                        branching_unit = -1
+                        break
+                    pos = row_ptr[unit]
+                    while conflicts[row_candidates[pos]] > 0:
+                        pos += 1
+                    lower_bound += shares[row_candidates[pos]]
+                    if branching_unit == -1 or available[unit] < available[branching_unit]:
+                        branching_unit = unit
+                if depth < 0:
+                    root_bound = lower_bound if branching_unit >= 0 else np.inf
+                if (branching_unit >= 0
+                        and cost + lower_bound < (1. - mip_gap) * upper_bound - tolerance):
+                    depth += 1
+                    frames_unit[depth] = branching_unit
+                    frames_pos[depth] = row_ptr[branching_unit]
+                    frames_candidate[depth] = -1
+        if depth < 0:
+            break
+
+        # Undoing the current choice of the deepest node
+        p_id = frames_candidate[depth]
+        if p_id >= 0:
+            frames_candidate[depth] = -1
+            cost -= costs[p_id]
+            for i in range(indptr[p_id], indptr[p_id + 1]):
+                unit = indices[i]
+                covered[unit] = False
+                nb_covered -= 1
+                for j in range(row_ptr[unit], row_ptr[unit + 1]):
+                    other_id = row_candidates[j]
+                    conflicts[other_id] -= 1
+                    if conflicts[other_id] == 0:
+                        for k in range(indptr[other_id], indptr[other_id + 1]):
+                            available[indices[k]] += 1
 
+        # Next candidate of the branching unit
+        unit = frames_unit[depth]
+        pos = frames_pos[depth]
+        while pos < row_ptr[unit + 1] and conflicts[row_candidates[pos]] > 0:
+            pos += 1
+        if pos == row_ptr[unit + 1]:
+            depth -= 1
+            continue
+        p_id = row_candidates[pos]
+        frames_pos[depth] = pos + 1
 
+        # Choosing it
+        frames_candidate[depth] = p_id
+        cost += costs[p_id]
+        for i in range(indptr[p_id], indptr[p_id + 1]):
+            unit = indices[i]
+            covered[unit] = True
+            nb_covered += 1
+            for j in range(row_ptr[unit], row_ptr[unit + 1]):
+                other_id = row_candidates[j]
+                conflicts[other_id] += 1
+                if conflicts[other_id] == 1:
+                    for k in range(indptr[other_id], indptr[other_id + 1]):
+                        available[indices[k]] -= 1
+        descend = True
+    if nb_units == 0:
+        return best, 0.
+    if aborted:
+        return best, min(root_bound, upper_bound)
+    # All the solutions of the pruned nodes are at most (mip_gap * upper_bound) better than the one returned
+    # (the costs being non-negative)
+    return best, min(max(root_bound, (1. - mip_gap) * upper_bound), upper_bound)
 
 
+# The branch-and-bound reads the clock in object mode (i.e. with the GIL) every 1024 nodes, only when it has a
+# deadline : the rest of its search runs without the GIL. The warning that numba gives when compiling it is only
+# silenced for this kernel.
+set_partitioning_bb = LazyKernel(set_partitioning_bb,
+                                 nb.types.Tuple((nb.boolean[::1], nb.float64))(nb.int64[::1],
+                                                                               nb.int64[::1],
+                                                                               nb.float64[::1],
+                                                                               nb.int64,
+                                                                               nb.boolean[::1],
+                                                                               nb.float64,
+                                                                               nb.float64,
+                                                                               nb.float64),
+                                 ignored_warnings=["Code running in object mode won't allow parallel execution"],
+                                 nogil=True, cache=True)
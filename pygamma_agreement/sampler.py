@@ -251,6 +251,15 @@ class StatisticalContinuumSampler(AbstractContinuumSampler):
             self._categories_weight[categories_set.index(unit.annotation)] += 1
         self._categories_weight /= self._reference_continuum.num_units
 
+    def __getstate__(self) -> dict:
+        """
+        The samples only depend on the statistics of the reference continuum : its units aren't pickled.
+        """
+        state = self.__dict__.copy()
+        if self._reference_continuum is not None:
+            state["_reference_continuum"] = self._reference_continuum.copy_flush()
+        return state
+
     def init_sampling_custom(self, annotators: Iterable[str],
                              avg_num_units_per_annotator: float, std_num_units_per_annotator: float,
                              avg_gap: float, std_gap: float,
@@ -0,0 +1,1309 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2020-2021 CoML
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Rachid RIAD, Hadrien TITEUX, Léopold FAVRE
+"""
+##########
+Alignment solvers
+##########
+
+"""
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Type, Union, Optional, List, Tuple, Iterable, TYPE_CHECKING
+
+import numpy as np
+from scipy import sparse
+
+from .numba_utils import merge_tied_alignments, alignment_components, set_partitioning_bb
+
+if TYPE_CHECKING:
+    from .dissimilarity import AbstractDissimilarity
+
+# Tolerance on the disorders under which two alignments are considered as equally good
+TIE_TOLERANCE = 1e-6
+
+# Maximal distance to 0 or 1 of the variables of an LP relaxation's solution for it to be considered as integral
+INTEGRALITY_TOLERANCE = 1e-6
+
+# Relative tolerance of the cutoff on the total disorder given by an incumbent alignment (the disorders are
+# stored as 32-bit floats, so their sums are slightly imprecise)
+CUTOFF_TOLERANCE = 1e-5
+
+# Minimal number of possible unitary alignments per sub-problem, when the problem is split into its
+# connected components : tiny components are solved together, as one call to a MIP solver has a fixed cost.
+COMPONENTS_BATCH_SIZE = 2000
+# Number of columns of the constraint matrix read at once when the problem is split into its connected components
+SPLIT_CHUNK_SIZE = 2 ** 20
+
+# Factor of slowness (compared to the fastest solver) after which a solver isn't timed anymore on bigger problems
+# during the calibration
+TOO_SLOW_FACTOR = 50
+
+# Without calibration data, sub-problems with at most this number of possible unitary alignments are solved by
+# the native branch-and-bound solver (faster than MIP solvers on small problems)
+NATIVE_MAX_CANDIDATES = 200
+
+# Number of problem structures remembered by each thread of a solver session
+SESSION_CACHE_SIZE = 64
+
+# Environment variable that can be used to set the path of the solver calibration file
+CALIBRATION_PATH_ENV = "PYGAMMA_SOLVER_CALIBRATION"
+
+
+# Ways a sub-problem can be solved (see SolverReport)
+PATH_TRIVIAL = "trivial"  # the component contains a single possible unitary alignment
+PATH_RELAXATION = "relaxation"  # the solution of the LP relaxation is integral
+PATH_INCUMBENT = "incumbent"  # the LP relaxation proves that the incumbent (warm-start) is optimal
+PATH_SOLVER = "solver"  # the solver's own algorithm (e.g., branch-and-bound)
+
+
+@dataclass
+class SolverReport:
+    """
+    Summary of the resolution of a best alignment problem (available as ``alignment.solver_report``).
+
+    Attributes
+    ----------
+    solver: str
+        Name of the solver.
+    nb_candidates: int
+        Number of possible unitary alignments of the problem.
+    paths: dict
+        Number of sub-problems (connected components, or batches of components) solved by each path : trivially
+        (``"trivial"``), by an integral LP relaxation (``"relaxation"``), by an LP relaxation proving the optimality
+        of the incumbent (``"incumbent"``), or by the solver's algorithm (``"solver"``).
+    time: float
+        Solving time, in seconds.
+    disorder: float
+        Total disorder of the chosen unitary alignments.
+    lower_bound: float
+        Lower bound of the total disorder of the best solution, proven by the solver.
+    """
+    solver: str
+    nb_candidates: int
+    paths: Dict[str, int] = field(default_factory=dict)
+    time: float = 0.
+    disorder: float = 0.
+    lower_bound: float = 0.
+
+    @property
+    def gap(self) -> float:
+        """
+        Relative optimality gap of the solution : 0 if it is proven to be the best one, and otherwise the
+        relative difference between its disorder and the lower bound.
+        """
+        if self.disorder - self.lower_bound <= TIE_TOLERANCE * max(1., abs(self.lower_bound)):
+            return 0.
+        return (self.disorder - self.lower_bound) / abs(self.disorder)
+
+    @property
+    def path(self) -> str:
+        """The most expensive path taken to solve the sub-problems."""
+        for path in (PATH_SOLVER, PATH_RELAXATION, PATH_INCUMBENT):
+            if self.paths.get(path, 0) > 0:
+                return path
+        return PATH_TRIVIAL
+
+
+def _index_arrays(A: sparse.csc_matrix) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The ``(indptr, indices)`` arrays of a constraint matrix, as arrays of the same integer type (int32 or int64)
+    accepted by the numba functions. They are only copied if they aren't already.
+    """
+    index_dtype = np.int32 if A.indptr.dtype == A.indices.dtype == np.int32 else np.int64
+    return (np.ascontiguousarray(A.indptr, dtype=index_dtype),
+            np.ascontiguousarray(A.indices, dtype=index_dtype))
+
+
+def split_components(A: sparse.csc_matrix, batch_size: Optional[int] = None):
+    """
+    Splits the alignment problem into independent sub-problems, using the connected components of the
+    bipartite graph units/possible unitary alignments : units far apart on the timeline never share a
+    possible unitary alignment, so the best alignment of each component can be found separately.
+
+    Components containing a single possible unitary alignment (a unit that can only be aligned with itself)
+    are solved trivially. The other ones are grouped, in the order of the timeline, into sub-problems
+    of at least ``batch_size`` possible unitary alignments (defaults to ``COMPONENTS_BATCH_SIZE``).
+
+    Returns
+    -------
+    np.ndarray:
+        Indexes of the possible unitary alignments that are always chosen.
+    list of (np.ndarray, scipy.sparse.csc_matrix):
+        The sub-problems : indexes of their possible unitary alignments, and their constraint matrix
+        (restricted to their units).
+    """
+    if batch_size is None:
+        batch_size = COMPONENTS_BATCH_SIZE
+    nb_units, nb_candidates = A.shape
+    nb_components, labels = alignment_components(*_index_arrays(A), nb_units)
+    if nb_components <= 1:
+        return np.zeros(0, dtype=np.int64), [(np.arange(nb_candidates), A)]
+
+    components_sizes = np.bincount(labels, minlength=nb_components)
+    trivial, = np.where(components_sizes[labels] == 1)
+    # Consecutive non-trivial components are batched together
+    sizes = np.where(components_sizes > 1, components_sizes, 0)
+    components_batches = (np.cumsum(sizes) - sizes) // max(batch_size, 1)
+    components_batches[sizes == 0] = -1
+    candidates_batches = components_batches[labels]
+    order = np.argsort(candidates_batches, kind="stable")[len(trivial):]
+    batches_bounds = np.concatenate([[0], np.cumsum(np.bincount(candidates_batches[order]))])
+
+    # The units of each batch are numbered in their original order. The matrix may be memory-mapped (see
+    # ScratchStorage) : it is read by chunks of columns, and the sub-matrices are extracted one at a time.
+    units_batches = np.full(nb_units, -1, dtype=np.int64)
+    for start in range(0, nb_candidates, SPLIT_CHUNK_SIZE):
+        end = min(start + SPLIT_CHUNK_SIZE, nb_candidates)
+        indptr = A.indptr[start:end + 1]
+        units_batches[A.indices[indptr[0]:indptr[-1]]] = np.repeat(candidates_batches[start:end], np.diff(indptr))
+    units_order = np.argsort(units_batches, kind="stable")
+    units_bounds = np.searchsorted(units_batches[units_order], np.arange(len(batches_bounds)))
+    units_local_ids = np.empty(nb_units, dtype=np.int64)
+    units_local_ids[units_order] = np.arange(nb_units) - units_bounds[np.maximum(units_batches[units_order], 0)]
+
+    problems = []
+    for batch in range(len(batches_bounds) - 1):
+        start, end = batches_bounds[batch], batches_bounds[batch + 1]
+        if start == end:
+            continue
+        columns = A[:, order[start:end]]
+        sub_A = sparse.csc_matrix((columns.data, units_local_ids[columns.indices], columns.indptr),
+                                  shape=(units_bounds[batch + 1] - units_bounds[batch], end - start))
+        problems.append((order[start:end], sub_A))
+    return trivial, problems
+
+
+class AbstractAlignmentSolver(metaclass=ABCMeta):
+    """
+    Solver for the integer linear program of the best alignment : choosing the set of unitary alignments
+    of minimal total disorder, such that every unit of the continuum appears in exactly one of them
+    (or in at least one of them, for soft-alignments).
+
+    Parameters
+    ----------
+    decompose: bool
+        If set (default), the problem is split into its independent connected components
+        (see `split_components`), that are solved separately.
+    n_jobs: int
+        Number of threads used to solve the components of the problem in parallel.
+    lp_first: bool
+        If set, the LP relaxation of each sub-problem is solved first (with HiGHS' simplex) : when its solution
+        is integral, it is returned directly, without calling the solver's (much slower) integer algorithm.
+    time_limit: float, optional
+        Maximal time (in seconds) spent solving each best alignment problem. When it is reached, the best
+        alignment found so far is returned, and its optimality gap is reported (see `SolverReport`).
+    mip_gap: float
+        Relative optimality gap at which the solver stops : the disorder of the returned alignment is at most
+        ``mip_gap`` (relatively) above a lower bound of the best alignment's disorder. Defaults to 0, the best
+        alignment being found.
+    """
+    name: str
+    # Minimal size of the sub-problems given to the solver (defaults to ``COMPONENTS_BATCH_SIZE``)
+    components_batch_size: Optional[int] = None
+    # If False, the auto solver doesn't use this solver for problems bigger than the ones it was calibrated on
+    extrapolates: bool = True
+
+    def __init__(self,
+                 decompose: bool = True,
+                 n_jobs: int = 1,
+                 lp_first: bool = False,
+                 time_limit: Optional[float] = None,
+                 mip_gap: float = 0.):
+        self.decompose = decompose
+        self.n_jobs = n_jobs
+        self.lp_first = lp_first
+        self.time_limit = time_limit
+        self.mip_gap = mip_gap
+
+    @classmethod
+    @abstractmethod
+    def is_available(cls) -> bool:
+        """Returns True if the solver's dependencies are installed."""
+
+    @classmethod
+    def supports(cls, nb_annotators: Optional[int], soft: bool = False) -> bool:
+        """
+        Returns True if the solver can find the best (soft-)alignment of continua with the given number
+        of annotators (``None`` meaning any number of annotators).
+        """
+        return True
+
+    @abstractmethod
+    def _solve(self,
+               disorders: np.ndarray,
+               A: sparse.csc_matrix,
+               soft: bool,
+               incumbent: Optional[np.ndarray] = None,
+               time_limit: Optional[float] = None) -> Tuple[np.ndarray, float]:
+        """
+        Solves the integer linear program, and returns the boolean mask of the chosen unitary alignments, along
+        with a lower bound of the total disorder of the best solution (which is the disorder of the chosen
+        unitary alignments if they are optimal).
+        ``incumbent`` is the boolean mask of a known solution of the problem (or None), that can be used
+        as a starting point or to bound the total disorder. ``time_limit`` is the time (in seconds) left to
+        solve the problem, or None.
+        """
+
+    def _solve_in_session(self,
+                          session: 'SolverSession',
+                          disorders: np.ndarray,
+                          A: sparse.csc_matrix,
+                          soft: bool,
+                          incumbent: Optional[np.ndarray] = None,
+                          time_limit: Optional[float] = None) -> Tuple[np.ndarray, float]:
+        """
+        Same as `_solve`, for solvers that can reuse the objects kept in ``session.state(self.name)`` from one
+        problem to the next. By default, the session is ignored.
+        """
+        return self._solve(disorders, A, soft, incumbent, time_limit)
+
+    def _solve_relaxation(self,
+                          disorders: np.ndarray,
+                          A: sparse.csc_matrix,
+                          soft: bool,
+                          time_limit: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        Solves the LP relaxation of the problem, and returns the values of the variables (or None if it failed).
+        """
+        from scipy.optimize import linprog
+        c = disorders.astype(np.float64)
+        ones = np.ones(A.shape[0])
+        options = {} if time_limit is None else {"time_limit": time_limit}
+        try:
+            if soft:
+                res = linprog(c, A_ub=-A, b_ub=-ones, bounds=(0, 1), method="highs", options=options)
+            else:
+                res = linprog(c, A_eq=A, b_eq=ones, bounds=(0, 1), method="highs", options=options)
+        except ValueError:  # HiGHS is only available with scipy >= 1.6
+            logging.debug("The LP relaxation couldn't be solved.")
+            return None
+        return res.x if res.status == 0 else None
+
+    def _solve_problem(self,
+                       disorders: np.ndarray,
+                       A: sparse.csc_matrix,
+                       soft: bool,
+                       incumbent: Optional[np.ndarray] = None,
+                       session: Optional['SolverSession'] = None,
+                       time_limit: Optional[float] = None) -> Tuple[np.ndarray, str, float]:
+        """
+        Solves a sub-problem, and returns the boolean mask of its chosen unitary alignments, the path
+        that was taken to solve it, and a lower bound of the disorder of its best solution.
+        """
+        relaxation_bound = None
+        if self.lp_first:
+            x = self._solve_relaxation(disorders, A, soft, time_limit)
+            if x is not None:
+                if np.all(np.minimum(x, 1 - x) <= INTEGRALITY_TOLERANCE):
+                    return x > 0.5, PATH_RELAXATION, self._disorder(disorders, x > 0.5)
+                # The value of the LP relaxation is a lower bound of the disorder of the best alignment
+                relaxation_bound = float(disorders.astype(np.float64) @ x)
+                if incumbent is not None and self._within_gap(self._disorder(disorders, incumbent),
+                                                              relaxation_bound):
+                    return incumbent, PATH_INCUMBENT, relaxation_bound
+        if session is not None:
+            chosen, lower_bound = self._solve_in_session(session, disorders, A, soft, incumbent, time_limit)
+        else:
+            chosen, lower_bound = self._solve(disorders, A, soft, incumbent, time_limit)
+        if not self._within_gap(self._disorder(disorders, chosen), lower_bound):
+            # The solver stopped early : its bound is completed by the LP relaxation's
+            if relaxation_bound is None:
+                x = self._solve_relaxation(disorders, A, soft)
+                relaxation_bound = None if x is None else float(disorders.astype(np.float64) @ x)
+            if relaxation_bound is not None:
+                lower_bound = max(lower_bound, relaxation_bound)
+        return chosen, PATH_SOLVER, lower_bound
+
+    def _within_gap(self, disorder: float, lower_bound: float) -> bool:
+        """Returns True if a solution of the given disorder is close enough to the lower bound."""
+        return disorder - lower_bound <= max(TIE_TOLERANCE * max(1., abs(lower_bound)), self.mip_gap * abs(disorder))
+
+    @staticmethod
+    def _disorder(disorders: np.ndarray, chosen: np.ndarray) -> float:
+        return float(np.sum(disorders[chosen], dtype=np.float64))
+
+    def solve(self,
+              disorders: np.ndarray,
+              A: sparse.csc_matrix,
+              soft: bool = False,
+              incumbent: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Returns the indexes of the unitary alignments chosen by the solver (see `solve_with_report`).
+        """
+        chosen_alignments_ids, _ = self.solve_with_report(disorders, A, soft, incumbent)
+        return chosen_alignments_ids
+
+    def solve_with_report(self,
+                          disorders: np.ndarray,
+                          A: sparse.csc_matrix,
+                          soft: bool = False,
+                          incumbent: Optional[np.ndarray] = None,
+                          session: Optional['SolverSession'] = None) -> Tuple[np.ndarray, SolverReport]:
+        """
+        Returns the indexes of the unitary alignments chosen by the solver, and a report of how the problem
+        was solved.
+        If several best alignments exist, the one with the fewest unitary alignments is favored, so that
+        the output does not depend on the solver being used.
+
+        Parameters
+        ----------
+        disorders: np.ndarray
+            1D array containing the disorder of each possible unitary alignment.
+        A: scipy.sparse.csc_matrix
+            Constraint matrix, where A[u, a] = 1 if and only if unit u is in unitary alignment a.
+        soft: bool
+            If set, each unit only has to appear in at least one chosen unitary alignment.
+        incumbent: np.ndarray, optional
+            Indexes of unitary alignments forming a known valid alignment (e.g., the one found by the
+            fast-gamma algorithm). Its total disorder is used as an upper bound (and as a starting point
+            by the solvers supporting it), and it is returned if the solver fails to find a solution.
+        session: SolverSession, optional
+            Session of this solver, whose problem objects are reused (see `session`).
+        """
+        start = time.perf_counter()
+        deadline = None if self.time_limit is None else start + self.time_limit
+        report = SolverReport(self.name, len(disorders))
+        A = sparse.csc_matrix(A)
+        if incumbent is not None:
+            incumbent_ids = incumbent
+            incumbent = np.zeros(len(disorders), dtype=np.bool_)
+            incumbent[incumbent_ids] = True
+        if self.decompose:
+            trivial, problems = split_components(A, self.components_batch_size)
+        else:
+            trivial, problems = np.zeros(0, dtype=np.int64), [(np.arange(len(disorders)), A)]
+
+        def solve_problem(problem):
+            candidates, sub_A = problem
+            sub_incumbent = None if incumbent is None else incumbent[candidates]
+            # The time limit is shared by all the sub-problems
+            time_limit = None if deadline is None else max(deadline - time.perf_counter(), 0.)
+            return (candidates, *self._solve_problem(disorders[candidates], sub_A, soft, sub_incumbent,
+                                                     session, time_limit))
+
+        chosen = np.zeros(len(disorders), dtype=np.bool_)
+        chosen[trivial] = True
+        report.lower_bound = self._disorder(disorders, trivial)
+        if len(trivial):
+            report.paths[PATH_TRIVIAL] = len(trivial)
+        if self.n_jobs > 1 and len(problems) > 1:
+            with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
+                solutions = list(executor.map(solve_problem, problems))
+        else:
+            solutions = map(solve_problem, problems)
+        for candidates, sub_chosen, path, lower_bound in solutions:
+            chosen[candidates] = sub_chosen
+            report.paths[path] = report.paths.get(path, 0) + 1
+            report.lower_bound += lower_bound
+
+        if not soft:
+            chosen = merge_tied_alignments(*_index_arrays(A), disorders, chosen, A.shape[0], TIE_TOLERANCE)
+        chosen_alignments_ids, = np.where(chosen)
+        report.disorder = self._disorder(disorders, chosen_alignments_ids)
+        report.time = time.perf_counter() - start
+        if report.gap > 0:
+            logging.warning(f"The {self.name} solver stopped at an optimality gap of {report.gap:.2%}.")
+        return chosen_alignments_ids, report
+
+    def session(self) -> 'SolverSession':
+        """
+        Returns a new session of this solver (see `SolverSession`), that keeps the solver's problem objects
+        alive across the problems it solves.
+        """
+        return SolverSession(self)
+
+    @staticmethod
+    def _cutoff(disorders: np.ndarray, incumbent: np.ndarray) -> float:
+        """Upper bound on the total disorder of the best solution, given a known solution."""
+        upper_bound = float(np.sum(disorders[incumbent], dtype=np.float64))
+        return upper_bound + CUTOFF_TOLERANCE * max(1.0, abs(upper_bound))
+
+    @staticmethod
+    def _check_solution(x: Optional[np.ndarray],
+                        A: sparse.csc_matrix,
+                        incumbent: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """
+        Returns None if the solver found a solution. Otherwise, returns a fallback solution : the incumbent,
+        or else the alignment of each unit with null units only.
+
+        Raises
+        ------
+        RuntimeError
+            If there is no fallback solution.
+        """
+        if x is not None:
+            return None
+        if incumbent is not None:
+            logging.debug("The solver didn't find a better alignment than the incumbent.")
+            return incumbent
+        singletons = np.diff(A.indptr) == 1
+        if np.array_equal(np.bincount(A.indices[A.indptr[:-1][singletons]], minlength=A.shape[0]),
+                          np.ones(A.shape[0])):
+            logging.debug("The solver didn't find any alignment : the units of the sub-problem are left unaligned.")
+            return singletons
+        raise RuntimeError("The linear solver couldn't find an alignment with minimal disorder "
+                           "(likely because the amount of possible unitary alignments was too high)")
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
+
+class SolverSession:
+    """
+    Session of a solver, used to solve many alignment problems in a row. The session keeps the solver's problem
+    objects alive from one problem to the next :
+
+    - the HiGHS solver keeps its ``highspy.Highs`` instance (when the ``highspy`` package is installed), whose
+      options are only set once, and only has its costs modified when a problem has exactly the same constraint
+      matrix as the previous one,
+    - the cvxpy-based solvers keep a parametrized problem for each recurring constraint matrix, which is only
+      compiled once, the disorders being updated through a ``cvxpy.Parameter``.
+
+    This only saves work when the same constraint matrices come back, e.g. when the same continuum is aligned
+    with several dissimilarities or disorders. The random samples of `Continuum.compute_gamma` almost never have
+    the same constraint matrices : for them, the session only saves the creation of the solver's objects.
+
+    The results are the same as without a session. Sessions can be shared between threads (each thread has
+    its own problem objects), and are best used as context managers, the problem objects being released
+    when the session is closed.
+
+    Parameters
+    ----------
+    solver: AbstractAlignmentSolver
+        The solver used in the session.
+    """
+
+    def __init__(self, solver: AbstractAlignmentSolver):
+        self.solver = solver
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._states: List[Dict[str, dict]] = []
+
+    @property
+    def name(self) -> str:
+        return self.solver.name
+
+    def state(self, name: str) -> dict:
+        """
+        Returns the objects kept by the given solver for the current thread.
+        """
+        states = getattr(self._local, "states", None)
+        if states is None:
+            states = self._local.states = {}
+            with self._lock:
+                self._states.append(states)
+        return states.setdefault(name, {})
+
+    def solve(self,
+              disorders: np.ndarray,
+              A: sparse.csc_matrix,
+              soft: bool = False,
+              incumbent: Optional[np.ndarray] = None) -> np.ndarray:
+        """Same as `AbstractAlignmentSolver.solve`, reusing the session's problem objects."""
+        chosen_alignments_ids, _ = self.solve_with_report(disorders, A, soft, incumbent)
+        return chosen_alignments_ids
+
+    def solve_with_report(self,
+                          disorders: np.ndarray,
+                          A: sparse.csc_matrix,
+                          soft: bool = False,
+                          incumbent: Optional[np.ndarray] = None) -> Tuple[np.ndarray, SolverReport]:
+        """Same as `AbstractAlignmentSolver.solve_with_report`, reusing the session's problem objects."""
+        return self.solver.solve_with_report(disorders, A, soft, incumbent, session=self)
+
+    def close(self):
+        """Releases the problem objects kept by the session."""
+        with self._lock:
+            for states in self._states:
+                states.clear()
+
+    def __enter__(self) -> 'SolverSession':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.solver})"
+
+
+class HighsAlignmentSolver(AbstractAlignmentSolver):
+    """
+    Solves the alignment problem with the HiGHS MIP solver, by handing the disorders and the sparse
+    constraint matrix directly to ``scipy.optimize.milp`` (requires scipy >= 1.9).
+    """
+    name = "highs"
+
+    @classmethod
+    def is_available(cls) -> bool:
+        # scipy.optimize (which provides milp since scipy 1.9) is long to import, and isn't needed by small problems
+        import scipy
+        return tuple(int(number) for number in scipy.__version__.split(".")[:2]) >= (1, 9)
+
+    def _solve(self,
+               disorders: np.ndarray,
+               A: sparse.csc_matrix,
+               soft: bool,
+               incumbent: Optional[np.ndarray] = None,
+               time_limit: Optional[float] = None) -> Tuple[np.ndarray, float]:
+        from scipy.optimize import milp, LinearConstraint, Bounds
+        n = len(disorders)
+        c = disorders.astype(np.float64)
+        constraints = [LinearConstraint(A, lb=1, ub=np.inf if soft else 1)]
+        if incumbent is not None:
+            # scipy's interface to HiGHS doesn't take starting solutions : the incumbent is used as a cutoff
+            constraints.append(LinearConstraint(sparse.csr_matrix(c[np.newaxis, :]),
+                                                lb=-np.inf, ub=self._cutoff(disorders, incumbent)))
+        # HiGHS stops at a 0.01% gap by default, but the *best* alignment is required
+        options = {"mip_rel_gap": self.mip_gap}
+        if time_limit is not None:
+            options["time_limit"] = time_limit
+        res = milp(c=c,
+                   constraints=constraints,
+                   integrality=np.ones(n, dtype=np.uint8),
+                   bounds=Bounds(0, 1),
+                   options=options)
+        return self._highs_result(disorders, A, incumbent, res.x, res.status == 0, res.status == 2,
+                                  getattr(res, "mip_dual_bound", None))
+
+    def _solve_in_session(self,
+                          session: SolverSession,
+                          disorders: np.ndarray,
+                          A: sparse.csc_matrix,
+                          soft: bool,
+                          incumbent: Optional[np.ndarray] = None,
+                          time_limit: Optional[float] = None) -> Tuple[np.ndarray, float]:
+        try:
+            import highspy
+        except ImportError:
+            return self._solve(disorders, A, soft, incumbent, time_limit)
+        state = session.state(self.name)
+        highs = state.get("highs")
+        if highs is None:
+            highs = state["highs"] = highspy.Highs()
+            highs.setOptionValue("output_flag", False)
+        highs.setOptionValue("mip_rel_gap", self.mip_gap)
+        highs.setOptionValue("time_limit", np.inf if time_limit is None else time_limit)
+        n, m = len(disorders), A.shape[0]
+        c = disorders.astype(np.float64)
+        structure = state.get("structure")
+        if (structure is not None and structure[0] == (A.shape, soft)
+                and np.array_equal(structure[1], A.indptr) and np.array_equal(structure[2], A.indices)):
+            # Same constraints as the previous problem : only the costs are modified
+            highs.changeColsCost(n, np.arange(n, dtype=np.int32), c)
+        else:
+            highs.passModel(n, m, A.nnz, int(highspy.MatrixFormat.kColwise), int(highspy.ObjSense.kMinimize), 0.0,
+                            c, np.zeros(n), np.ones(n),
+                            np.ones(m), np.full(m, np.inf if soft else 1.0),
+                            A.indptr.astype(np.int32), A.indices.astype(np.int32), np.ones(A.nnz),
+                            np.ones(n, dtype=np.int32))
+            state["structure"] = ((A.shape, soft), A.indptr.copy(), A.indices.copy())
+        if incumbent is not None:
+            # highspy takes starting solutions, unlike scipy's interface
+            start = highspy.HighsSolution()
+            start.col_value = incumbent.astype(np.float64)
+            highs.setSolution(start)
+        highs.run()
+        status, info = highs.getModelStatus(), highs.getInfo()
+        x = None
+        if info.primal_solution_status == 2:  # feasible solution
+            x = np.array(highs.getSolution().col_value)
+        return self._highs_result(disorders, A, incumbent, x, status == highspy.HighsModelStatus.kOptimal,
+                                  status == highspy.HighsModelStatus.kInfeasible, info.mip_dual_bound)
+
+    def _highs_result(self,
+                      disorders: np.ndarray,
+                      A: sparse.csc_matrix,
+                      incumbent: Optional[np.ndarray],
+                      x: Optional[np.ndarray],
+                      optimal: bool,
+                      infeasible: bool,
+                      dual_bound: Optional[float]) -> Tuple[np.ndarray, float]:
+        if infeasible and incumbent is not None:
+            # No solution is better than the cutoff : the incumbent is optimal
+            return incumbent, self._disorder(disorders, incumbent)
+        fallback = self._check_solution(x, A, incumbent)
+        chosen = fallback if fallback is not None else x > 0.5
+        if dual_bound is None or not np.isfinite(dual_bound):
+            dual_bound = self._disorder(disorders, chosen) if optimal else 0.
+        return chosen, min(float(dual_bound), self._disorder(disorders, chosen))
+
+
+class NativeAlignmentSolver(AbstractAlignmentSolver):
+    """
+    Built-in exact solver, without any dependency : a depth-first branch-and-bound written with numba
+    (see `numba_utils.set_partitioning_bb`), bounded by the cheapest possible unitary alignment of each unit.
+    Combined with the splitting of the problem into its connected components, it is well suited to small
+    and medium-sized problems. Soft-alignments aren't supported.
+
+    As the search doesn't take advantage of independent sub-problems, each connected component is solved
+    separately (calling the solver has no fixed cost), and disabling the decomposition is not advised.
+    """
+    name = "native"
+    components_batch_size = 1
+    extrapolates = False
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return True
+
+    @classmethod
+    def supports(cls, nb_annotators: Optional[int], soft: bool = False) -> bool:
+        return not soft
+
+    def _solve(self,
+               disorders: np.ndarray,
+               A: sparse.csc_matrix,
+               soft: bool,
+               incumbent: Optional[np.ndarray] = None,
+               time_limit: Optional[float] = None) -> Tuple[np.ndarray, float]:
+        if soft:
+            raise ValueError("The native solver can't find soft-alignments.")
+        costs = disorders.astype(np.float64)
+        if incumbent is None:
+            start, upper_bound = np.zeros(len(disorders), dtype=np.bool_), np.inf
+        else:
+            start = np.ascontiguousarray(incumbent, dtype=np.bool_)
+            upper_bound = float(np.sum(costs[start]))
+        deadline = np.inf if time_limit is None else time.perf_counter() + time_limit
+        chosen, lower_bound = set_partitioning_bb(A.indptr.astype(np.int64), A.indices.astype(np.int64),
+                                                  costs, A.shape[0], start, upper_bound, self.mip_gap, deadline)
+        fallback = self._check_solution(chosen if chosen.any() or A.shape[0] == 0 else None, A, incumbent)
+        if fallback is not None:
+            return fallback, min(lower_bound, self._disorder(disorders, fallback))
+        return chosen, lower_bound
+
+
+class MatchingAlignmentSolver(AbstractAlignmentSolver):
+    """
+    Exact solver for continua with two annotators, in polynomial time. With two annotators, a possible
+    unitary alignment is either a single unit (aligned with the null unit), or a couple of units of both
+    annotators : the best alignment is a minimum-cost bipartite matching between the units of both annotators,
+    units being left unmatched at the cost of their alignment with the null unit.
+
+    This matching is solved by ``scipy.sparse.csgraph.min_weight_full_bipartite_matching`` (LAPJVsp), on the
+    sparse graph of the possible unitary alignments. As the matching is solved in polynomial time, the problem
+    isn't split into its connected components by default.
+    """
+    name = "matching"
+
+    def __init__(self,
+                 decompose: bool = False,
+                 n_jobs: int = 1,
+                 lp_first: bool = False,
+                 time_limit: Optional[float] = None,
+                 mip_gap: float = 0.):
+        super().__init__(decompose=decompose, n_jobs=n_jobs, lp_first=lp_first,
+                         time_limit=time_limit, mip_gap=mip_gap)
+
+    @classmethod
+    def is_available(cls) -> bool:
+        try:
+            from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+        except ImportError:
+            return False
+        return True
+
+    @classmethod
+    def supports(cls, nb_annotators: Optional[int], soft: bool = False) -> bool:
+        return nb_annotators is not None and nb_annotators <= 2 and not soft
+
+    @staticmethod
+    def is_matching_problem(A: sparse.csc_matrix) -> bool:
+        """
+        Returns True if the problem is a bipartite matching : each possible unitary alignment contains at most two
+        units, and the units can be split in two sides such that no couple contains two units of the same side.
+        As units are numbered annotator by annotator, the first unit of a couple is put on the first side.
+        """
+        A = sparse.csc_matrix(A)
+        A.sort_indices()
+        nb_units_per_candidate = np.diff(A.indptr)
+        if np.any(nb_units_per_candidate > 2):
+            return False
+        couples, = np.where(nb_units_per_candidate == 2)
+        is_first = np.zeros(A.shape[0], dtype=np.bool_)
+        is_first[A.indices[A.indptr[couples]]] = True
+        return not np.any(is_first[A.indices[A.indptr[couples] + 1]])
+
+    def _solve(self,
+               disorders: np.ndarray,
+               A: sparse.csc_matrix,
+               soft: bool,
+               incumbent: Optional[np.ndarray] = None,
+               time_limit: Optional[float] = None) -> Tuple[np.ndarray, float]:
+        from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+        if soft:
+            raise ValueError("The matching solver can't find soft-alignments.")
+        if not self.is_matching_problem(A):
+            raise ValueError("The matching solver can only align the units of two annotators.")
+        A = A.copy()
+        A.sort_indices()
+        nb_units, nb_candidates = A.shape
+        nb_units_per_candidate = np.diff(A.indptr)
+        singles, = np.where(nb_units_per_candidate == 1)
+        couples, = np.where(nb_units_per_candidate == 2)
+        # Units are numbered annotator by annotator : the first unit of a couple is from the first annotator
+        first_units = A.indices[A.indptr[couples]]
+        second_units = A.indices[A.indptr[couples] + 1]
+
+        is_second = np.zeros(nb_units, dtype=np.bool_)
+        is_second[second_units] = True
+        firsts, = np.where(~is_second)
+        seconds, = np.where(is_second)
+        nb_firsts, nb_seconds = len(firsts), len(seconds)
+        # Rows : first units, then a dummy row per second unit. Columns : second units, then a dummy column per
+        # first unit. Matching a unit with its dummy means aligning it with the null unit.
+        local_ids = np.empty(nb_units, dtype=np.int64)
+        local_ids[firsts] = np.arange(nb_firsts)
+        local_ids[seconds] = np.arange(nb_seconds)
+        single_units = A.indices[A.indptr[singles]]
+        singles_are_second = is_second[single_units]
+        single_firsts, single_seconds = singles[~singles_are_second], singles[singles_are_second]
+        rows = np.concatenate([local_ids[first_units],
+                               local_ids[A.indices[A.indptr[single_firsts]]],
+                               nb_firsts + local_ids[A.indices[A.indptr[single_seconds]]],
+                               # dummy edges, that allow matching the dummies of matched units together
+                               nb_firsts + local_ids[second_units]])
+        cols = np.concatenate([local_ids[second_units],
+                               nb_seconds + local_ids[A.indices[A.indptr[single_firsts]]],
+                               local_ids[A.indices[A.indptr[single_seconds]]],
+                               nb_seconds + local_ids[first_units]])
+        # All perfect matchings have the same number of edges : the offset of 1 keeps the solution unchanged
+        # while preventing null weights from being mistaken for missing edges.
+        weights = np.concatenate([disorders[couples], disorders[single_firsts], disorders[single_seconds],
+                                  np.zeros(len(couples))]).astype(np.float64) + 1.0
+        candidates = np.concatenate([couples, single_firsts, single_seconds,
+                                     np.full(len(couples), -1, dtype=np.int64)])
+        graph = sparse.csr_matrix((np.arange(1, len(weights) + 1, dtype=np.float64), (rows, cols)),
+                                  shape=(nb_firsts + nb_seconds, nb_firsts + nb_seconds))
+        edges_ids = graph.data.astype(np.int64) - 1  # position of each stored edge in the arrays above
+        graph.data = weights[edges_ids]
+        try:
+            matched_rows, matched_cols = min_weight_full_bipartite_matching(graph)
+        except ValueError:
+            matched_rows = None
+        fallback = self._check_solution(matched_rows, A, incumbent)
+        if fallback is not None:
+            return fallback, 0.
+
+        # Retrieving the candidates corresponding to the matched edges
+        edges_ids = sparse.csr_matrix((edges_ids + 1, graph.indices, graph.indptr), shape=graph.shape)
+        chosen_candidates = candidates[np.asarray(edges_ids[matched_rows, matched_cols]).ravel() - 1]
+        chosen = np.zeros(nb_candidates, dtype=np.bool_)
+        chosen[chosen_candidates[chosen_candidates >= 0]] = True
+        # The matching is solved exactly
+        return chosen, self._disorder(disorders, chosen)
+
+
+class CvxpyAlignmentSolver(AbstractAlignmentSolver, metaclass=ABCMeta):
+    """
+    Solves the alignment problem through cvxpy's MIP-solving framework.
+    """
+    cvxpy_solver: str
+
+    @classmethod
+    def is_available(cls) -> bool:
+        try:
+            import cvxpy as cp
+        except ImportError:
+            return False
+        return cls.cvxpy_solver in cp.installed_solvers()
+
+    def _constraints(self, x, A: sparse.csc_matrix, soft: bool):
+        if soft:
+            return [A @ x >= 1]
+        return [A @ x == 1]
+
+    @abstractmethod
+    def _solver_options(self, time_limit: Optional[float]) -> dict:
+        """Options of the cvxpy solver, setting its time limit and relative gap."""
+
+    def _solve(self,
+               disorders: np.ndarray,
+               A: sparse.csc_matrix,
+               soft: bool,
+               incumbent: Optional[np.ndarray] = None,
+               time_limit: Optional[float] = None) -> Tuple[np.ndarray, float]:
+        import cvxpy as cp
+        x = cp.Variable(shape=(len(disorders),), boolean=True)
+        constraints = self._constraints(x, A, soft)
+        if incumbent is not None:
+            constraints.append(disorders.T @ x <= self._cutoff(disorders, incumbent))
+            # Starting point, for the solvers supporting warm-starts
+            x.value = incumbent.astype(np.float64)
+        problem = cp.Problem(cp.Minimize(disorders.T @ x), constraints)
+        return self._cvxpy_result(disorders, A, incumbent, x, problem, time_limit)
+
+    def _solve_in_session(self,
+                          session: SolverSession,
+                          disorders: np.ndarray,
+                          A: sparse.csc_matrix,
+                          soft: bool,
+                          incumbent: Optional[np.ndarray] = None,
+                          time_limit: Optional[float] = None) -> Tuple[np.ndarray, float]:
+        import cvxpy as cp
+        state = session.state(self.name)
+        problems: OrderedDict = state.setdefault("problems", OrderedDict())
+        key = (A.shape, soft, A.indptr.tobytes(), A.indices.tobytes())
+        if key not in problems:
+            # Parametrized problems are slower to compile : they are only built for recurring structures
+            problems[key] = None
+            if len(problems) > SESSION_CACHE_SIZE:
+                problems.popitem(last=False)
+            return self._solve(disorders, A, soft, incumbent, time_limit)
+        problems.move_to_end(key)
+        if problems[key] is None:
+            x = cp.Variable(shape=(len(disorders),), boolean=True)
+            costs, cutoff = cp.Parameter(shape=(len(disorders),)), cp.Parameter()
+            constraints = self._constraints(x, A, soft) + [costs @ x <= cutoff]
+            problems[key] = (x, costs, cutoff, cp.Problem(cp.Minimize(costs @ x), constraints))
+        x, costs, cutoff, problem = problems[key]
+        costs.value = disorders.astype(np.float64)
+        if incumbent is not None:
+            cutoff.value = self._cutoff(disorders, incumbent)
+            x.value = incumbent.astype(np.float64)
+        else:
+            # No bound : disorders are non-negative
+            cutoff.value = float(np.sum(np.abs(costs.value))) + 1.0
+        return self._cvxpy_result(disorders, A, incumbent, x, problem, time_limit)
+
+    def _cvxpy_result(self,
+                      disorders: np.ndarray,
+                      A: sparse.csc_matrix,
+                      incumbent: Optional[np.ndarray],
+                      x,
+                      problem,
+                      time_limit: Optional[float]) -> Tuple[np.ndarray, float]:
+        """Solves the cvxpy problem, and returns the chosen unitary alignments and the lower bound."""
+        import cvxpy as cp
+        try:
+            problem.solve(solver=self.cvxpy_solver, warm_start=incumbent is not None,
+                          **self._solver_options(time_limit))
+        except cp.error.SolverError:
+            # e.g., the time limit was reached without any solution
+            status, values = cp.SOLVER_ERROR, None
+        else:
+            status, values = problem.status, x.value
+        if status in (cp.INFEASIBLE, cp.INFEASIBLE_INACCURATE) and incumbent is not None:
+            # No solution is better than the cutoff : the incumbent is optimal
+            return incumbent, self._disorder(disorders, incumbent)
+        fallback = self._check_solution(values, A, incumbent)
+        if fallback is not None:
+            return fallback, 0.
+        # compare with 0.9 as cvxpy returns 1.000 or small values i.e. 10e-14
+        chosen = values > 0.9
+        if status != cp.OPTIMAL:
+            # cvxpy doesn't give the solver's bound
+            return chosen, 0.
+        disorder = self._disorder(disorders, chosen)
+        return chosen, disorder - self.mip_gap * abs(disorder)
+
+
+class CBCAlignmentSolver(CvxpyAlignmentSolver):
+    """Solves the alignment problem with the COIN-OR CBC solver (requires ``cvxpy`` and ``cylp``)."""
+    name = "cbc"
+    cvxpy_solver = "CBC"
+
+    @classmethod
+    def is_available(cls) -> bool:
+        try:
+            import cylp
+        except ImportError:
+            return False
+        return super().is_available()
+
+    def _solver_options(self, time_limit: Optional[float]) -> dict:
+        options = {"allowableFractionGap": self.mip_gap}
+        if time_limit is not None:
+            options["maximumSeconds"] = time_limit
+        return options
+
+
+class GLPKAlignmentSolver(CvxpyAlignmentSolver):
+    """Solves the alignment problem with the GNU Linear Programming Kit (requires ``cvxpy`` and ``cvxopt``)."""
+    name = "glpk"
+    cvxpy_solver = "GLPK_MI"
+
+    def _constraints(self, x, A: sparse.csc_matrix, soft: bool):
+        matmul = A @ x
+        if soft:
+            return [1 <= matmul]
+        return [1 <= matmul, matmul <= 1]
+
+    def _solver_options(self, time_limit: Optional[float]) -> dict:
+        options = {"mip_gap": self.mip_gap}
+        if time_limit is not None:
+            # in milliseconds
+            options["tm_lim"] = int(np.ceil(time_limit * 1000))
+        return options
+
+
+SOLVERS: Dict[str, Type[AbstractAlignmentSolver]] = {}
+# Order of preference of the solvers when no calibration data is available
+SOLVERS_PREFERENCE: List[str] = []
+
+
+def register_solver(solver_class: Type[AbstractAlignmentSolver], preference: Optional[int] = None):
+    """
+    Adds a solver to the registry, so that it can be selected by its name (e.g. with
+    ``continuum.compute_gamma(solver="highs")``) and automatically by the ``"auto"`` solver.
+
+    Parameters
+    ----------
+    solver_class: type
+        The solver class (subclass of AbstractAlignmentSolver), with a unique ``name`` attribute.
+    preference: int, optional
+        Position of the solver in the order of preference used when no calibration data is available.
+        If not set, the solver is added as the least preferred one.
+    """
+    SOLVERS[solver_class.name] = solver_class
+    if solver_class.name in SOLVERS_PREFERENCE:
+        SOLVERS_PREFERENCE.remove(solver_class.name)
+    if preference is None:
+        SOLVERS_PREFERENCE.append(solver_class.name)
+    else:
+        SOLVERS_PREFERENCE.insert(preference, solver_class.name)
+
+
+for _solver_class in (HighsAlignmentSolver, CBCAlignmentSolver, GLPKAlignmentSolver):
+    register_solver(_solver_class)
+# Polynomial-time, so preferred to MIP solvers for the problems it supports
+register_solver(MatchingAlignmentSolver, preference=0)
+# Always available, but can be very slow on big problems : used only if no MIP solver is installed
+register_solver(NativeAlignmentSolver)
+
+
+def available_solvers() -> List[str]:
+    """Returns the names of the registered solvers that are installed, by order of preference."""
+    return [name for name in SOLVERS_PREFERENCE if SOLVERS[name].is_available()]
+
+
+def get_default_solver(nb_annotators: Optional[int] = None, soft: bool = False) -> AbstractAlignmentSolver:
+    """
+    Returns the preferred installed solver (by default : HiGHS, CBC, GLPK and then the native solver)
+    supporting continua with the given number of annotators (any number of annotators if not set). For instance,
+    continua with two annotators are aligned with the matching solver.
+
+    Raises
+    ------
+    ImportError
+        If none of these solvers is installed (which is only possible for soft-alignments).
+    """
+    # The availability of the less preferred solvers isn't checked, since importing cvxpy takes long
+    preferred = next((name for name in SOLVERS_PREFERENCE
+                      if SOLVERS[name].supports(nb_annotators, soft) and SOLVERS[name].is_available()), None)
+    if preferred is None:
+        raise ImportError("No MIP solver available : please install scipy >= 1.9 (for HiGHS), "
+                          "or cvxpy with CBC or GLPK.")
+    if preferred == GLPKAlignmentSolver.name:
+        logging.warning("Neither HiGHS (scipy >= 1.9) nor CBC solvers are installed. Using GLPK.")
+    elif preferred == NativeAlignmentSolver.name:
+        logging.warning("No MIP solver is installed : using the native solver, which can be very slow "
+                        "on continua with many overlapping units. Please install scipy >= 1.9 (for HiGHS).")
+    return SOLVERS[preferred]()
+
+
+def default_calibration_path() -> Path:
+    """
+    Returns the path of the solver calibration file : the value of the ``PYGAMMA_SOLVER_CALIBRATION``
+    environment variable if set, else ``$XDG_CACHE_HOME/pygamma_agreement/solver_calibration.json``.
+    """
+    if CALIBRATION_PATH_ENV in os.environ:
+        return Path(os.environ[CALIBRATION_PATH_ENV])
+    cache_dir = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return Path(cache_dir) / "pygamma_agreement" / "solver_calibration.json"
+
+
+class AutoAlignmentSolver(AbstractAlignmentSolver):
+    """
+    Solver that picks, for each problem, the fastest installed solver given the number of units,
+    annotators and possible unitary alignments.
+
+    The problem is split into its connected components, and a solver is picked for each one of them. The choice
+    is based on the crossover points measured by `calibrate_solvers` on the current machine. If no calibration data
+    is available, the matching solver is used for two annotators, the native solver for components with at
+    most ``NATIVE_MAX_CANDIDATES`` possible unitary alignments, and the preferred installed solver otherwise.
+
+    Parameters
+    ----------
+    calibration: dict or path, optional
+        Calibration data (as returned by `calibrate_solvers`), or the path of the JSON file where it is stored.
+        Defaults to the file at `default_calibration_path()`, if it exists.
+    decompose: bool
+        If set (default), the problem is split into its independent connected components.
+    n_jobs: int
+        Number of threads used to solve the components of the problem in parallel.
+    lp_first: bool
+        If set, the LP relaxation of each component is solved first, and returned if its solution is integral.
+    time_limit: float, optional
+        Maximal time (in seconds) spent solving each best alignment problem.
+    mip_gap: float
+        Relative optimality gap at which the selected solvers stop.
+    """
+    name = "auto"
+    components_batch_size = 1
+
+    def __init__(self,
+                 calibration: Optional[Union[dict, str, Path]] = None,
+                 decompose: bool = True,
+                 n_jobs: int = 1,
+                 lp_first: bool = False,
+                 time_limit: Optional[float] = None,
+                 mip_gap: float = 0.):
+        super().__init__(decompose=decompose, n_jobs=n_jobs, lp_first=lp_first,
+                         time_limit=time_limit, mip_gap=mip_gap)
+        if calibration is None:
+            path = default_calibration_path()
+            calibration = path if path.is_file() else {}
+        if not isinstance(calibration, dict):
+            with open(calibration) as calibration_file:
+                calibration = json.load(calibration_file)
+        # {nb_annotators: [(max_nb_candidates, solver_name), ...]}
+        self.crossovers: Dict[int, List[Tuple[Optional[int], str]]] = {
+            int(nb_annotators): [tuple(crossover) for crossover in crossovers]
+            for nb_annotators, crossovers in calibration.get("crossovers", {}).items()
+        }
+        self._solvers: Dict[Tuple[str, float], AbstractAlignmentSolver] = {}
+        self._default_solvers: Dict[Tuple[int, bool], str] = {}
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return any(SOLVERS[name].is_available() for name in SOLVERS_PREFERENCE)
+
+    def _get_solver(self, name: str) -> AbstractAlignmentSolver:
+        # The relative gap of the auto solver can be changed after its creation (see `get_solver`)
+        key = (name, self.mip_gap)
+        if key not in self._solvers:
+            self._solvers[key] = SOLVERS[name](mip_gap=self.mip_gap)
+        return self._solvers[key]
+
+    def select(self,
+               nb_units: int,
+               nb_annotators: int,
+               nb_candidates: int,
+               soft: bool = False) -> AbstractAlignmentSolver:
+        """
+        Returns the solver that will be used for a problem of the given size.
+        """
+        if self.crossovers:
+            # Using the crossovers measured with the closest number of annotators
+            closest = min(self.crossovers, key=lambda calibrated: abs(calibrated - nb_annotators))
+            for max_nb_candidates, name in self.crossovers[closest]:
+                if max_nb_candidates is None or nb_candidates <= max_nb_candidates:
+                    if (name in SOLVERS and SOLVERS[name].is_available()
+                            and SOLVERS[name].supports(nb_annotators, soft)):
+                        return self._get_solver(name)
+                    break
+        if (nb_annotators, soft) not in self._default_solvers:
+            self._default_solvers[(nb_annotators, soft)] = get_default_solver(nb_annotators, soft).name
+        default = self._get_solver(self._default_solvers[(nb_annotators, soft)])
+        if (nb_candidates <= NATIVE_MAX_CANDIDATES and NativeAlignmentSolver.supports(nb_annotators, soft)
+                and not isinstance(default, MatchingAlignmentSolver)):
+            return self._get_solver(NativeAlignmentSolver.name)
+        return default
+
+    def _select_for(self, A: sparse.csc_matrix, soft: bool) -> AbstractAlignmentSolver:
+        nb_units, nb_candidates = A.shape
+        # A unitary alignment contains at most one unit per annotator
+        nb_annotators = int(np.max(np.diff(A.indptr), initial=0))
+        if nb_annotators <= 2 and not MatchingAlignmentSolver.is_matching_problem(A):
+            # couples of units from more than two annotators
+            nb_annotators = 3
+        return self.select(nb_units, nb_annotators, nb_candidates, soft)
+
+    def _solve(self,
+               disorders: np.ndarray,
+               A: sparse.csc_matrix,
+               soft: bool,
+               incumbent: Optional[np.ndarray] = None,
+               time_limit: Optional[float] = None) -> Tuple[np.ndarray, float]:
+        return self._select_for(A, soft)._solve(disorders, A, soft, incumbent, time_limit)
+
+    def _solve_in_session(self,
+                          session: SolverSession,
+                          disorders: np.ndarray,
+                          A: sparse.csc_matrix,
+                          soft: bool,
+                          incumbent: Optional[np.ndarray] = None,
+                          time_limit: Optional[float] = None) -> Tuple[np.ndarray, float]:
+        return self._select_for(A, soft)._solve_in_session(session, disorders, A, soft, incumbent, time_limit)
+
+
+def get_solver(solver: Union[str, AbstractAlignmentSolver, SolverSession, None] = None,
+               **options) -> Union[AbstractAlignmentSolver, SolverSession]:
+    """
+    Returns a solver instance from its registered name (``"auto"``, ``"highs"``, ``"matching"``, ``"cbc"``...).
+    Solver instances and sessions are returned as is, and ``None`` is equivalent to ``"auto"``.
+
+    The given options (e.g. ``lp_first=True``) are passed to the solver's constructor, options set to None being
+    ignored. If a solver instance is given with options, a copy of it with these options is returned (and
+    a new session of this copy, if a session is given).
+
+    Raises
+    ------
+    ValueError
+        If the solver name is unknown.
+    ImportError
+        If the requested solver is not installed.
+    """
+    options = {option: value for option, value in options.items() if value is not None}
+    if isinstance(solver, SolverSession):
+        if not options:
+            return solver
+        return get_solver(solver.solver, **options).session()
+    if isinstance(solver, AbstractAlignmentSolver):
+        if not options:
+            return solver
+        solver = copy.copy(solver)
+        for option, value in options.items():
+            if not hasattr(solver, option):
+                raise TypeError(f"Unknown option '{option}' for solver {solver}.")
+            setattr(solver, option, value)
+        return solver
+    if solver is None or solver == AutoAlignmentSolver.name:
+        return AutoAlignmentSolver(**options)
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver '{solver}'. Available solvers are : "
+                         f"{', '.join([AutoAlignmentSolver.name] + list(SOLVERS))}")
+    if not SOLVERS[solver].is_available():
+        raise ImportError(f"Solver '{solver}' is not installed.")
+    return SOLVERS[solver](**options)
+
+
+def calibrate_solvers(solvers: Optional[Iterable[str]] = None,
+                      nb_annotators: Iterable[int] = (2, 3, 4),
+                      nb_units: Iterable[int] = (5, 10, 20, 40, 80),
+                      repeats: int = 3,
+                      dissimilarity: Optional['AbstractDissimilarity'] = None,
+                      output_path: Optional[Union[str, Path]] = None) -> dict:
+    """
+    Small benchmark that measures the solving time of each installed solver on randomly generated continua
+    of increasing size, and records the crossover points (number of possible unitary alignments after which
+    another solver becomes faster) used by the ``"auto"`` solver. As the auto solver picks a solver for each
+    connected component of the problem, the solvers are timed on the biggest component of each continuum.
+
+    Parameters
+    ----------
+    solvers: iterable of str, optional
+        Names of the solvers to benchmark. Defaults to all the installed ones.
+    nb_annotators: iterable of int
+        Numbers of annotators of the generated continua.
+    nb_units: iterable of int
+        Numbers of units per annotator of the generated continua.
+    repeats: int
+        Number of measures per solver and continuum (the fastest one is kept).
+    dissimilarity: AbstractDissimilarity, optional
+        Dissimilarity used to build the problems. Defaults to the combined categorical dissimilarity.
+    output_path: str or Path, optional
+        Where the calibration is saved (as JSON). Defaults to `default_calibration_path()`.
+
+    Returns
+    -------
+    dict:
+        The calibration data, i.e. the measured timings and the crossover points per number of annotators.
+    """
+    from .continuum import _build_constraint_matrix
+    from .cst import CorpusShufflingTool
+    from .dissimilarity import CombinedCategoricalDissimilarity
+    from .sampler import StatisticalContinuumSampler
+
+    solvers = available_solvers() if solvers is None else list(solvers)
+    if dissimilarity is None:
+        dissimilarity = CombinedCategoricalDissimilarity(alpha=3, beta=1)
+    output_path = default_calibration_path() if output_path is None else Path(output_path)
+
+    timings = []
+    crossovers = {}
+    for nb_annot in nb_annotators:
+        measures = []
+        too_slow = set()
+        for nb_units_per_annotator in nb_units:
+            sampler = StatisticalContinuumSampler()
+            sampler.init_sampling_custom(annotators=["Ref"],
+                                         avg_num_units_per_annotator=nb_units_per_annotator,
+                                         std_num_units_per_annotator=0,
+                                         avg_duration=80, std_duration=20,
+                                         avg_gap=40, std_gap=20,
+                                         categories=np.array([str(i) for i in range(4)]))
+            cst = CorpusShufflingTool(0.3, sampler.sample_from_continuum)
+            continuum = cst.corpus_shuffle([f"annotator_{i}" for i in range(nb_annot)],
+                                           shift=True, false_neg=True, cat_shuffle=True)
+            sizes = np.array([len(continuum[annotator]) for annotator in continuum.annotators], dtype=np.int32)
+            disorders, possible_unitary_alignments = dissimilarity.valid_alignments(continuum)
+            A = _build_constraint_matrix(possible_unitary_alignments, sizes)
+            _, problems = split_components(A, batch_size=1)
+            candidates, A = max(problems, key=lambda problem: problem[1].shape[1],
+                                default=(np.arange(len(disorders)), A))
+            disorders = disorders[candidates]
+
+            times = {}
+            for name in solvers:
+                if not SOLVERS[name].supports(nb_annot) or name in too_slow:
+                    continue
+                solver = SOLVERS[name](decompose=False)
+                solver.solve(disorders, A)  # warm-up (imports, compilation...)
+                best_time = np.inf
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    solver.solve(disorders, A)
+                    best_time = min(best_time, time.perf_counter() - start)
+                times[name] = best_time
+            # Solvers far slower than the fastest one aren't timed on bigger problems
+            too_slow.update(name for name, solver_time in times.items()
+                            if solver_time > TOO_SLOW_FACTOR * min(times.values()))
+            logging.info(f"{nb_annot} annotators, {len(disorders)} possible unitary alignments : {times}")
+            timings.append({"nb_annotators": nb_annot,
+                            "nb_units": A.shape[0],
+                            "nb_candidates": len(disorders),
+                            "times": times})
+            measures.append((len(disorders), min(times, key=times.get)))
+
+        # Crossovers : the fastest solver for each range of problem sizes
+        measures.sort()
+        annot_crossovers = []
+        for i, (nb_candidates, fastest) in enumerate(measures):
+            if annot_crossovers and annot_crossovers[-1][1] == fastest:
+                annot_crossovers[-1][0] = nb_candidates
+            else:
+                annot_crossovers.append([nb_candidates, fastest])
+        if not SOLVERS[annot_crossovers[-1][1]].extrapolates:
+            annot_crossovers.append([None, get_default_solver(nb_annot).name])
+        annot_crossovers[-1][0] = None  # The last solver is used for any bigger problem
+        crossovers[str(nb_annot)] = annot_crossovers
+
+    calibration = {"timings": timings, "crossovers": crossovers}
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w") as output_file:
+        json.dump(calibration, output_file, indent=4)
+    return calibration
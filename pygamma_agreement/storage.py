@@ -0,0 +1,116 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2020-2021 CoML
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Rachid RIAD, Hadrien TITEUX, Léopold FAVRE
+"""
+##########
+Scratch storage
+##########
+
+"""
+import tempfile
+import threading
+import weakref
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+# Default memory budget of a scratch storage, in bytes
+DEFAULT_MEMORY_BUDGET = 2 ** 30
+
+
+class ScratchStorage:
+    """
+    Storage of the large arrays of an alignment problem (the possible unitary alignments, their disorders, and
+    the constraint matrix of the problem) : the arrays are kept in memory as long as their total size fits in the
+    memory budget, and the next ones are memory-mapped (see ``np.memmap``) to temporary files of a scratch
+    directory, so that the alignment problems of continua whose possible unitary alignments don't fit in RAM can
+    still be solved.
+
+    The budget only bounds the arrays of the storage that are alive (an array leaves the budget when it is
+    deleted) : the pairwise dissimilarities have their own bound (see ``PairwiseDissimilaritiesCache``), and the
+    sub-problems extracted from the constraint matrix (see ``split_components``) and the memory used by the
+    solvers aren't bounded. The temporary files are deleted along with their arrays.
+
+    Parameters
+    ----------
+    memory_budget: int
+        Maximal total size (in bytes) of the arrays kept in memory. Defaults to 1 GiB. When the storage is
+        sent to worker processes (see the ``executor`` argument of ``Continuum.compute_gamma``), each
+        process has its own budget.
+    scratch_dir: str or Path, optional
+        Directory of the temporary files. If not set, the default temporary directory is used
+        (see ``tempfile.gettempdir``).
+    """
+
+    def __init__(self,
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                 scratch_dir: Optional[Union[str, Path]] = None):
+        if memory_budget < 0:
+            raise ValueError(f"The memory budget must be positive, got {memory_budget}.")
+        self.memory_budget = memory_budget
+        self.scratch_dir = scratch_dir
+        # Total size of the arrays of the storage kept in memory
+        self.nbytes = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # The arrays kept in memory by this process don't count in the budget of another one
+        return {"memory_budget": self.memory_budget, "scratch_dir": self.scratch_dir}
+
+    def __setstate__(self, state: dict):
+        self.__init__(**state)
+
+    def is_mapped(self, shape: Union[int, Tuple[int, ...]], dtype: np.dtype) -> bool:
+        """
+        Whether a new array of the given shape and dtype would be stored in a file, i.e. whether it would
+        exceed the memory budget along with the arrays of the storage already kept in memory.
+        """
+        return self.nbytes + _nbytes(shape, dtype) > self.memory_budget
+
+    def _release(self, nbytes: int):
+        with self._lock:
+            self.nbytes -= nbytes
+
+    def empty(self, shape: Union[int, Tuple[int, ...]], dtype: np.dtype) -> np.ndarray:
+        """
+        Returns a new (uninitialized) array, memory-mapped to a temporary file if it exceeds the memory budget.
+        """
+        nbytes = _nbytes(shape, dtype)
+        with self._lock:
+            in_memory = self.nbytes + nbytes <= self.memory_budget
+            if in_memory:
+                self.nbytes += nbytes
+        if in_memory:
+            array = np.empty(shape, dtype=dtype)
+            weakref.finalize(array, self._release, nbytes)
+            return array
+        # The (anonymous) temporary file is removed once it is closed, i.e., when the array is deleted
+        with tempfile.TemporaryFile(dir=self.scratch_dir) as file:
+            array = np.memmap(file, dtype=dtype, mode="w+", shape=shape)
+        return array.view(np.ndarray)
+
+
+def _nbytes(shape: Union[int, Tuple[int, ...]], dtype: np.dtype) -> int:
+    return int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
@@ -67,17 +67,26 @@ setup(
     entry_points={
         'console_scripts': [
             'pygamma-agreement = pygamma_agreement.cli_apps:pygamma_cmd',
+            'pygamma-agreement-calibrate = pygamma_agreement.cli_apps:pygamma_calibrate_cmd',
+            'pygamma-agreement-warmup = pygamma_agreement.cli_apps:pygamma_warmup_cmd',
         ]
     },
     extras_require={
         "notebook": [
             "matplotlib",
         ],
+        "cvxpy": [
+            "cvxpy>=1.0.25",
+            "cvxopt==1.3.2"
+        ],
         "CBC": [
+            "cvxpy>=1.0.25",
             "cylp"
         ],
         "testing": [
             "pytest",
+            "cvxpy>=1.0.25",
+            "cvxopt==1.3.2",
             "cylp"
         ],
         "docs": [
@@ -1,13 +1,16 @@
 """Test of the Alignment class pygamma_agreement.alignment"""
 
+import random
+
 import numpy as np
 import pytest
 from pyannote.core import Annotation, Segment
 
 from pygamma_agreement.alignment import SetPartitionError
 from pygamma_agreement.alignment import UnitaryAlignment, Alignment
-from pygamma_agreement.continuum import Continuum, Unit
+from pygamma_agreement.continuum import Continuum, Unit, _build_constraint_matrix
 from pygamma_agreement.dissimilarity import CombinedCategoricalDissimilarity, PrecomputedCategoricalDissimilarity
+from pygamma_agreement.incremental import IncrementalAligner
 from sortedcontainers import SortedSet
 
 def test_alignment_checking():
@@ -235,4 +238,55 @@ def test_best_alignment():
 
     assert best_alignment.disorder == pytest.approx(0.43478875578596043,
                                                     0.001)
-    assert best_alignment.disorder < alignment.compute_disorder(combi_dis)
\ No newline at end of file
+    assert best_alignment.disorder < alignment.compute_disorder(combi_dis)
+
+def test_sparse_constraint_matrix():
+    continuum = Continuum.from_csv("tests/data/3by100.csv")
+    dissim = CombinedCategoricalDissimilarity(alpha=3)
+    sizes = np.array([len(continuum[annotator]) for annotator in continuum.annotators], dtype=np.int32)
+    _, possible_unitary_alignments = dissim.valid_alignments(continuum)
+
+    A = _build_constraint_matrix(possible_unitary_alignments, sizes)
+    assert A.shape == (continuum.num_units, len(possible_unitary_alignments))
+    # one non-zero per non-null unit of each unitary alignment
+    assert A.nnz == np.sum(possible_unitary_alignments != sizes)
+    assert np.all(A.sum(axis=0) == np.sum(possible_unitary_alignments != sizes, axis=1))
+    for p_id in (0, len(possible_unitary_alignments) // 2, len(possible_unitary_alignments) - 1):
+        column = A[:, p_id].toarray().ravel()
+        expected = np.zeros(continuum.num_units)
+        start = 0
+        for unit_id, size in zip(possible_unitary_alignments[p_id], sizes):
+            if unit_id != size:
+                expected[start + unit_id] = 1
+            start += size
+        assert np.array_equal(column, expected)
+
+
+def test_incremental_alignment():
+    continuum = Continuum.from_csv("tests/data/3by100.csv")
+    dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1)
+    aligner = IncrementalAligner(continuum, dissim)
+    assert aligner.get_best_alignment().disorder == pytest.approx(continuum.get_best_alignment(dissim).disorder,
+                                                                  rel=1e-5)
+    assert aligner.nb_realigned_units == continuum.num_units
+
+    random.seed(4577)
+    for _ in range(10):
+        annotator = random.choice(continuum.annotators)
+        if random.random() < 0.5:
+            aligner.remove(annotator, continuum[annotator][random.randrange(len(continuum[annotator]))])
+        else:
+            start = random.uniform(continuum.bound_inf, continuum.bound_sup)
+            aligner.add(annotator, Segment(start, start + random.uniform(1, 10)), random.choice(continuum.categories))
+        alignment = aligner.get_best_alignment()
+        # Only the units around the edit are re-aligned
+        assert 0 < aligner.nb_realigned_units < continuum.num_units / 2
+        assert alignment.disorder == pytest.approx(continuum.get_best_alignment(dissim).disorder, rel=1e-5)
+        alignment.check(continuum)
+
+    # The best alignment is only updated after an edit, and a new annotator re-aligns the whole continuum
+    assert aligner.get_best_alignment() is alignment
+    aligner.add("new_annotator", Segment(1, 2), continuum.categories[0])
+    assert aligner.get_best_alignment().disorder == pytest.approx(continuum.get_best_alignment(dissim).disorder,
+                                                                  rel=1e-5)
+    assert aligner.nb_realigned_units == continuum.num_units
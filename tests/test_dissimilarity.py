@@ -12,7 +12,11 @@ from pygamma_agreement.dissimilarity import (PositionalSporadicDissimilarity,
                                              PrecomputedCategoricalDissimilarity,
                                              AbstractDissimilarity,
                                              CategoricalDissimilarity,
-                                             LambdaCategoricalDissimilarity)
+                                             LambdaCategoricalDissimilarity,
+                                             LevenshteinCategoricalDissimilarity,
+                                             AbsoluteCategoricalDissimilarity,
+                                             PairwiseDissimilaritiesCache,
+                                             pairwise_dissimilarities_cache)
 
 
 def test_categorical_dissimilarity():
@@ -258,6 +262,9 @@ def test_custom_dissimilarity():
     gamma_results_2 = continuum.compute_gamma(dissim2)
 
     assert gamma_results_1.gamma != gamma_results_2.gamma
+    # Custom dissimilarities have no batched version, unless they inherit one
+    assert pos_dissim.d_batch is None and dissim1.d_batch is None and dissim2.d_batch is None
+    assert cat_dissim.d_batch is not None
 
 
 
@@ -265,3 +272,328 @@ def test_custom_dissimilarity():
 
 
 
+
+
+def test_valid_alignments_enumeration():
+    from itertools import product
+
+    continuum = Continuum.from_csv("tests/data/AlexPaulSuzan.csv")
+    for dissim in (CombinedCategoricalDissimilarity(alpha=3, beta=1), PositionalSporadicDissimilarity()):
+        disorders, alignments = dissim.valid_alignments(continuum)
+        units, offsets = dissim._build_arrays_continuum(continuum)
+        sizes = np.diff(offsets).tolist()
+        nb_annotators = len(sizes)
+        c2n = nb_annotators * (nb_annotators - 1) // 2
+
+        # Brute force : all the tuples of units (annotator 0 varies fastest), except the empty one
+        expected = []
+        for reversed_tuple in product(*(range(size + 1) for size in reversed(sizes))):
+            unitary_alignment = reversed_tuple[::-1]
+            if unitary_alignment == tuple(sizes):
+                continue
+            disorder = 0.
+            for annot_a in range(nb_annotators):
+                for annot_b in range(annot_a):
+                    i_a, i_b = unitary_alignment[annot_a], unitary_alignment[annot_b]
+                    if i_a == sizes[annot_a] or i_b == sizes[annot_b]:
+                        disorder += dissim.delta_empty
+                    else:
+                        disorder += dissim.d_mat(units[offsets[annot_a] + i_a], units[offsets[annot_b] + i_b])
+            if disorder <= c2n * dissim.delta_empty * nb_annotators:
+                expected.append((unitary_alignment, disorder / c2n))
+
+        assert [tuple(alignment) for alignment in alignments] == [alignment for alignment, _ in expected]
+        assert disorders == pytest.approx([disorder for _, disorder in expected], abs=1e-5)
+
+
+def test_gap_lower_bound():
+    dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1)
+    np.random.seed(4772)
+    for _ in range(100):
+        start_1, start_2 = np.random.uniform(0, 100, 2)
+        duration_1, duration_2 = np.random.uniform(0.1, 20, 2)
+        unit_1 = Unit(Segment(start_1, start_1 + duration_1), "A")
+        unit_2 = Unit(Segment(start_2, start_2 + duration_2), "B")
+        gap = max(0., start_2 - start_1 - duration_1, start_1 - start_2 - duration_2)
+        assert dissim.gap_lower_bound(gap, duration_1 + duration_2) <= dissim.d(unit_1, unit_2) + 1e-6
+        assert dissim.gap_lower_bound(gap, 40.) <= dissim.d(unit_1, unit_2) + 1e-6
+
+    # Skipping the units out of reach doesn't change the possible unitary alignments
+    for path in ("tests/data/2by1000.csv", "tests/data/3by100.csv"):
+        continuum = Continuum.from_csv(path)
+        units, offsets = dissim._build_arrays_continuum(continuum)
+        max_gaps = dissim._max_gaps(units, offsets)
+        assert np.isfinite(max_gaps[1, 0])
+        disorders, alignments = dissim.valid_alignments(continuum)
+        unbounded_dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1)
+        unbounded_dissim.gap_lower_bound = lambda gap, max_duration: 0.
+        assert np.all(np.isinf(unbounded_dissim._max_gaps(units, offsets)))
+        unbounded = unbounded_dissim.valid_alignments(continuum)
+        assert np.array_equal(disorders, unbounded[0])
+        assert np.array_equal(alignments, unbounded[1])
+
+
+def test_parallel_valid_alignments():
+    dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1)
+    for path in ("tests/data/3by100.csv", "tests/data/AlexPaulSuzan.csv", "tests/data/2by1000.csv"):
+        continuum = Continuum.from_csv(path)
+        disorders, alignments = dissim.valid_alignments(continuum)
+        parallel_disorders, parallel_alignments = dissim.valid_alignments(continuum, parallel=True)
+        assert np.array_equal(disorders, parallel_disorders)
+        assert np.array_equal(alignments, parallel_alignments)
+
+    alignment = continuum.get_best_alignment(dissim, parallel=True)
+    assert alignment.disorder == pytest.approx(continuum.get_best_alignment(dissim).disorder, abs=1e-6)
+
+
+def test_int32_unit_indexes():
+    dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1)
+    continuum = Continuum.from_csv("tests/data/3by100.csv")
+    disorders, alignments = dissim.valid_alignments(continuum)
+    assert alignments.dtype == np.int16
+    units, offsets = dissim._build_arrays_continuum(continuum)
+    sizes = np.diff(offsets).astype(np.int32)
+    pairwise = dissim._pairwise_dissimilarities(units, offsets, sizes)
+    for kernel, threads_args in ((dissim._get_all_valid_alignments_int32, ()),
+                                 (dissim._get_all_valid_alignments_parallel, (2,))):
+        wide_disorders, wide_alignments = kernel(*pairwise, sizes, dissim.delta_empty, *threads_args)
+        assert wide_alignments.dtype == np.int32
+        assert np.array_equal(disorders, wide_disorders)
+        assert np.array_equal(alignments, wide_alignments)
+
+    # An annotator with more units than int16 can index
+    continuum = Continuum()
+    for i in range(33000):
+        continuum.add("Alice", Segment(i, i + 0.8), "A")
+        if i % 2 == 0:
+            continuum.add("Bob", Segment(i + 0.1, i + 0.9), "A")
+    disorders, alignments = dissim.valid_alignments(continuum)
+    assert alignments.dtype == np.int32
+    assert alignments[:, 0].max() == len(continuum["Alice"])
+    alignment = continuum.get_best_alignment(dissim, solver="matching")
+    alignment.check()
+    assert len(alignment.unitary_alignments) == 33000
+
+
+def test_pairwise_dissimilarities_cache():
+    dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1)
+    continuum = Continuum.from_csv("tests/data/3by100.csv")
+    pairwise_dissimilarities_cache.clear()
+    disorders, alignments = dissim.valid_alignments(continuum)
+    assert len(pairwise_dissimilarities_cache) == 1
+    units, offsets = dissim._build_arrays_continuum(continuum)
+    sizes = np.diff(offsets).astype(np.int16)
+    cached = dissim._pairwise_dissimilarities(units, offsets, sizes)
+    assert cached is dissim._pairwise_dissimilarities(*dissim._build_arrays_continuum(continuum), sizes)
+    cached_disorders, cached_alignments = dissim.valid_alignments(continuum)
+    assert np.array_equal(disorders, cached_disorders)
+    assert np.array_equal(alignments, cached_alignments)
+    assert len(pairwise_dissimilarities_cache) == 1
+
+    # Another dissimilarity, or another continuum, aren't in the cache
+    other_dissim = CombinedCategoricalDissimilarity(alpha=1, beta=1)
+    assert other_dissim._pairwise_dissimilarities(units, offsets, sizes) is not cached
+    continuum.add("annotator_1", Segment(0, 1), "1")
+    dissim.valid_alignments(continuum)
+    assert len(pairwise_dissimilarities_cache) == 3
+
+    # The least recently used entries are evicted to stay under the memory cap
+    cache = PairwiseDissimilaritiesCache(max_bytes=2 * sum(array.nbytes for array in cached))
+    for key in ("a", "b", "a", "c"):
+        cache.put(key, cached)
+        assert cache.get(key) is cached
+    assert cache.get("b") is None and cache.get("a") is cached
+    assert cache.nbytes <= cache.max_bytes
+    cache.max_bytes = 0
+    cache.clear()
+    cache.put("a", cached)
+    assert len(cache) == 0
+
+
+def test_batched_dissimilarities(monkeypatch):
+    continuum = Continuum.from_csv("tests/data/3by100.csv")
+    dissims = [PositionalSporadicDissimilarity(),
+               AbsoluteCategoricalDissimilarity(),
+               LevenshteinCategoricalDissimilarity(continuum.categories),
+               CombinedCategoricalDissimilarity(alpha=3, beta=1, delta_empty=2),
+               CombinedCategoricalDissimilarity(alpha=2, beta=0.5,
+                                                cat_dissim=LevenshteinCategoricalDissimilarity(continuum.categories))]
+    units, offsets = dissims[0]._build_arrays_continuum(continuum)
+    for dissim in dissims:
+        units1, units2 = units[:offsets[1]], units[offsets[1]:offsets[2]][5:40]
+        out = np.empty((len(units1), len(units2)), dtype=np.float32)
+        dissim.d_batch(units1, units2, out)
+        assert out.tolist() == [[dissim.d_mat(unit1, unit2) for unit2 in units2] for unit1 in units1]
+
+        # The possible unitary alignments found with the batched dissimilarity are exactly the same
+        reference = dissim.valid_alignments(continuum)
+        monkeypatch.setattr("pygamma_agreement.dissimilarity.BATCHED_DISSIMILARITIES_MIN_PAIRS", 0)
+        pairwise_dissimilarities_cache.clear()
+        batched = dissim.valid_alignments(continuum)
+        monkeypatch.undo()
+        assert np.array_equal(reference[0], batched[0]) and np.array_equal(reference[1], batched[1])
+
+
+def test_kernels_release_the_gil():
+    from concurrent.futures import ThreadPoolExecutor
+    from pygamma_agreement import numba_utils
+
+    # The numerical kernels run in compute_gamma's threads : they must not hold the GIL
+    kernels = [numba_utils.band_layout, numba_utils.fill_bands, numba_utils.fill_bands_batched,
+               numba_utils.fill_A_indptr, numba_utils.fill_A_indices, numba_utils.build_A, numba_utils.build_K,
+               numba_utils.merge_tied_alignments, numba_utils.alignment_components, numba_utils.set_partitioning_bb,
+               AbstractDissimilarity._compute_alignment_disorders, AbstractDissimilarity._get_all_valid_alignments,
+               AbstractDissimilarity._get_all_valid_alignments_int32,
+               AbstractDissimilarity._get_all_valid_alignments_parallel,
+               AbstractDissimilarity._store_valid_alignments]
+    for kernel in kernels:
+        assert kernel.targetoptions.get("nogil"), kernel
+
+    # Concurrent searches give the same results as a sequential one
+    dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1)
+    continuum = Continuum.from_csv("tests/data/3by100.csv")
+    disorders, alignments = dissim.valid_alignments(continuum)
+    pairwise_dissimilarities_cache.clear()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        for threaded_disorders, threaded_alignments in pool.map(lambda _: dissim.valid_alignments(continuum),
+                                                                range(8)):
+            assert np.array_equal(disorders, threaded_disorders)
+            assert np.array_equal(alignments, threaded_alignments)
+
+
+def test_pickled_dissimilarities():
+    import pickle
+
+    continuum = Continuum.from_csv("tests/data/3by100.csv")
+    units = [unit for _, unit in continuum][:10]
+    dissims = [PositionalSporadicDissimilarity(delta_empty=2),
+               CombinedCategoricalDissimilarity(alpha=3, beta=1, delta_empty=2),
+               CombinedCategoricalDissimilarity(cat_dissim=LevenshteinCategoricalDissimilarity(continuum.categories))]
+    for dissim in dissims:
+        # Only the parameters are pickled : the kernels are compiled again when unpickled...
+        pickled = pickle.dumps(dissim)
+        assert len(pickled) < 2000
+        unpickled = pickle.loads(pickled)
+        assert ([unpickled.d(unit1, unit2) for unit1 in units for unit2 in units]
+                == [dissim.d(unit1, unit2) for unit1 in units for unit2 in units])
+        disorders, alignments = dissim.valid_alignments(continuum)
+        unpickled_disorders, unpickled_alignments = unpickled.valid_alignments(continuum)
+        assert np.array_equal(disorders, unpickled_disorders)
+        assert np.array_equal(alignments, unpickled_alignments)
+        # ... once per process
+        assert pickle.loads(pickled).d_mat is unpickled.d_mat is dissim.d_mat
+
+    # The kernels of a combined dissimilarity's categorical dissimilarity are scaled by its delta_empty
+    dissim = dissims[1]
+    unit1, unit2 = Unit(Segment(0, 1), "A"), Unit(Segment(0, 1), "B")
+    assert dissim.categorical_dissim.d(unit1, unit2) == 2
+    assert dissim.d_mat(np.array([0, 1, 1, 0], dtype=np.float32), np.array([0, 1, 1, 1], dtype=np.float32)) == 2
+
+
+def test_shared_kernels():
+    categories = SortedSet(['A', 'B', 'C'])
+    matrix = 1 - np.eye(3, dtype=np.float32)
+
+    # Identically configured dissimilarities share their kernels
+    dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1,
+                                              cat_dissim=PrecomputedCategoricalDissimilarity(categories, matrix))
+    same_dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1,
+                                                   cat_dissim=PrecomputedCategoricalDissimilarity(categories,
+                                                                                                  matrix.copy()))
+    assert same_dissim.d_mat is dissim.d_mat
+    assert same_dissim._cache_token == dissim._cache_token
+    assert same_dissim.d_batch is dissim.d_batch
+
+    other_dissims = [CombinedCategoricalDissimilarity(alpha=2, beta=1,
+                                                      cat_dissim=PrecomputedCategoricalDissimilarity(categories,
+                                                                                                     matrix)),
+                     CombinedCategoricalDissimilarity(alpha=3, beta=1,
+                                                      cat_dissim=PrecomputedCategoricalDissimilarity(categories,
+                                                                                                     matrix / 2)),
+                     CombinedCategoricalDissimilarity(alpha=3, beta=1, delta_empty=2,
+                                                      cat_dissim=PrecomputedCategoricalDissimilarity(categories,
+                                                                                                     matrix))]
+    for other_dissim in other_dissims:
+        assert other_dissim.d_mat is not dissim.d_mat
+        assert other_dissim._cache_token != dissim._cache_token
+
+    # Numerical parameters given as ints or floats give the same kernels
+    int_dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1, delta_empty=1)
+    float_dissim = CombinedCategoricalDissimilarity(alpha=3.0, beta=1.0, delta_empty=1.0)
+    assert int_dissim._cache_token == float_dissim._cache_token
+    assert int_dissim.d_mat is float_dissim.d_mat
+
+    # The categorical dissimilarity of a combined dissimilarity shares the kernels of a standalone one
+    combined = CombinedCategoricalDissimilarity()
+    standalone = AbsoluteCategoricalDissimilarity()
+    assert combined.categorical_dissim._cache_token == standalone._cache_token
+    assert combined.categorical_dissim.d_mat is standalone.d_mat
+
+    # Dissimilarities that don't declare the parameters of their kernels don't share them
+    class MyAbsoluteDissimilarity(AbsoluteCategoricalDissimilarity):
+        def kernel_key(self):
+            return None
+
+    assert MyAbsoluteDissimilarity().d_mat is not MyAbsoluteDissimilarity().d_mat
+
+
+def test_cached_kernels(monkeypatch):
+    import subprocess
+    import sys
+    from numba.core.caching import NullCache
+    from pygamma_agreement import numba_utils, warmup
+
+    # The compiled kernels are cached on disk
+    kernels = [numba_utils.band_layout, numba_utils.fill_bands, numba_utils.fill_bands_batched,
+               numba_utils.enumerate_valid_alignments, numba_utils.build_A, numba_utils.set_partitioning_bb,
+               AbstractDissimilarity._get_all_valid_alignments, AbstractDissimilarity._get_all_valid_alignments_int32,
+               AbstractDissimilarity._get_all_valid_alignments_parallel, AbstractDissimilarity._store_valid_alignments,
+               CombinedCategoricalDissimilarity(alpha=5, beta=2).d_mat]
+    for kernel in kernels:
+        assert not isinstance(kernel._cache, NullCache), kernel
+
+    # ... including the ones of the dissimilarities, which capture the kernels of other dissimilarities :
+    # another process loads them instead of compiling them
+    hits = subprocess.run([sys.executable, "-c",
+                           "from pygamma_agreement import CombinedCategoricalDissimilarity\n"
+                           "print(sum(CombinedCategoricalDissimilarity(alpha=5, beta=2).d_mat.stats.cache_hits"
+                           ".values()))"],
+                          capture_output=True, text=True, check=True).stdout
+    assert int(hits) == 1
+
+    # Without numba's private uuid API, the kernels are left as they are (and only compiled again by each process)
+    from numba.core.dispatcher import _MemoMixin
+    monkeypatch.delattr(_MemoMixin, "_set_uuid")
+    dissim = CombinedCategoricalDissimilarity(alpha=7, beta=3)
+    assert dissim.d_mat._MemoMixin__uuid is None
+    assert dissim.d_mat(np.array([0, 1, 1, 0], dtype=np.float32), np.array([0, 1, 1, 1], dtype=np.float32)) == 3
+    monkeypatch.undo()
+
+    # The warmup compiles everything, without changing the state of numpy's random generator
+    np.random.seed(4772)
+    expected = np.random.rand()
+    np.random.seed(4772)
+    warmup([CombinedCategoricalDissimilarity(alpha=5, beta=2)], parallel=False)
+    assert np.random.rand() == expected
+
+
+def test_lazy_import():
+    import subprocess
+    import sys
+
+    # Importing the package loads neither its submodules nor numba, and the kernels are only loaded when first used
+    loaded = subprocess.run([sys.executable, "-c",
+                             "import sys\n"
+                             "import pygamma_agreement\n"
+                             "print('numba' in sys.modules, 'pygamma_agreement.continuum' in sys.modules)\n"
+                             "from pygamma_agreement import numba_utils\n"
+                             "print(numba_utils.build_K._dispatcher is None)\n"
+                             "numba_utils.build_K(2, numba_utils.np.array([1, 1], dtype=numba_utils.np.int32))\n"
+                             "print(numba_utils.build_K._dispatcher is None)"],
+                            capture_output=True, text=True, check=True).stdout.split()
+    assert loaded == ["False", "False", "True", "False"]
+
+    import pygamma_agreement
+    assert pygamma_agreement.Continuum is Continuum
+    with pytest.raises(AttributeError):
+        pygamma_agreement.NotAnObject
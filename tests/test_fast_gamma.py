@@ -3,6 +3,7 @@ from pygamma_agreement import (Continuum,
                                StatisticalContinuumSampler,
                                CorpusShufflingTool)
 import numpy as np
+import pytest
 
 
 def test_fast_gamma():
@@ -44,3 +45,44 @@ def test_fast_gamma():
             assert abs(gamma - gamma_fast) < 0.0001
 
 
+
+
+def test_warm_start(monkeypatch):
+    np.random.seed(4557)
+
+    sampler = StatisticalContinuumSampler()
+    sampler.init_sampling_custom(annotators=['Ref'],
+                                 avg_num_units_per_annotator=40, std_num_units_per_annotator=0,
+                                 avg_duration=80, std_duration=20,
+                                 avg_gap=40, std_gap=20,
+                                 categories=np.array([str(i) for i in range(4)]))
+    cst = CorpusShufflingTool(0.4, sampler.sample_from_continuum)
+    dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1)
+
+    for nb_annotator in [2, 3]:
+        continuum = cst.corpus_shuffle(nb_annotator, shift=True, false_neg=True, cat_shuffle=True, split=True)
+        best_alignment = continuum.get_best_alignment(dissim)
+        warm_started = continuum.get_best_alignment(dissim, warm_start=True)
+        assert np.isclose(warm_started.disorder, best_alignment.disorder, atol=1e-6)
+        assert len(warm_started.unitary_alignments) == len(best_alignment.unitary_alignments)
+
+        # the best alignment is its own (optimal) starting solution
+        from_best = continuum.get_best_alignment(dissim, warm_start=best_alignment)
+        assert np.isclose(from_best.disorder, best_alignment.disorder, atol=1e-6)
+
+    # compute_gamma measures the window size of the warm starts once, on the observed continuum
+    measures = []
+    measure_best_window_size = Continuum.measure_best_window_size
+
+    def counted_measure(self, *args, **kwargs):
+        measures.append(self)
+        return measure_best_window_size(self, *args, **kwargs)
+
+    monkeypatch.setattr(Continuum, "measure_best_window_size", counted_measure)
+    continuum.best_window_size = np.inf
+    np.random.seed(4772)
+    reference = continuum.compute_gamma(dissim, n_samples=5)
+    np.random.seed(4772)
+    warm_started = continuum.compute_gamma(dissim, n_samples=5, warm_start=True)
+    assert measures == [continuum]
+    assert warm_started.gamma == pytest.approx(reference.gamma, abs=1e-6)
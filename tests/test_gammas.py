@@ -1,4 +1,6 @@
 """Tests for the gamma computations"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import numpy as np
@@ -55,6 +57,34 @@ def test_gamma_3by100():
     assert 0.96 <= gamma_results.gamma_k('Prep')
 
 
+def test_gamma_3by100_processes():
+    continuum = Continuum.from_csv(Path("tests/data/3by100.csv"))
+    dissim = CombinedCategoricalDissimilarity(delta_empty=1,
+                                              alpha=3,
+                                              beta=1)
+    observed_disorder = continuum.get_best_alignment(dissim).disorder
+
+    np.random.seed(4772)
+    gamma_results = continuum.compute_gamma(dissim, executor="process")
+    assert gamma_results.best_alignment.continuum is continuum
+    assert gamma_results.observed_disorder == pytest.approx(observed_disorder)
+    assert 0.79 <= gamma_results.gamma <= 0.81
+    assert 0.89 <= gamma_results.gamma_cat <= 0.91
+    assert 0.81 <= gamma_results.gamma_k('Adj') <= 0.83
+
+    # The samples are seeded from numpy's random generator
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("forkserver")) as executor:
+        np.random.seed(4772)
+        first_results = continuum.compute_gamma(dissim, n_samples=5, executor=executor)
+        np.random.seed(4772)
+        second_results = continuum.compute_gamma(dissim, n_samples=5, executor=executor)
+    assert first_results.expected_disorder == second_results.expected_disorder
+    assert len({alignment.disorder for alignment in first_results.chance_alignments}) == 5
+
+    with pytest.raises(ValueError):
+        continuum.compute_gamma(dissim, executor="cluster")
+
+
 def test_gamma_alexpaulsuzan():
     np.random.seed(4772)
     continuum = Continuum.from_csv(Path("tests/data/AlexPaulSuzan.csv"))
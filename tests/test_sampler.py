@@ -55,6 +55,22 @@ def test_statistical_sampler():
     assert 0.35 <= gamma_results.gamma_cat <= 0.38
 
 
+def test_pickled_statistical_sampler():
+    import pickle
+
+    continuum = Continuum.from_csv(Path("tests/data/3by100.csv"))
+    sampler = StatisticalContinuumSampler()
+    sampler.init_sampling(continuum)
+    # The units of the reference continuum aren't pickled, only its statistics
+    pickled = pickle.dumps(sampler)
+    assert len(pickled) < len(pickle.dumps(continuum)) / 4
+    unpickled = pickle.loads(pickled)
+    np.random.seed(4778)
+    sample = sampler.sample_from_continuum
+    np.random.seed(4778)
+    assert unpickled.sample_from_continuum == sample
+
+
 def test_statistical_sampler_manual():
     np.random.seed(7455)
     sampler = StatisticalContinuumSampler()
@@ -0,0 +1,275 @@
+"""Tests for the MIP solvers used to find the best alignment"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from pygamma_agreement.continuum import Continuum, _build_constraint_matrix
+from pygamma_agreement.dissimilarity import CombinedCategoricalDissimilarity
+from pygamma_agreement.solvers import (HighsAlignmentSolver,
+                                       MatchingAlignmentSolver,
+                                       NativeAlignmentSolver,
+                                       CBCAlignmentSolver,
+                                       GLPKAlignmentSolver,
+                                       AutoAlignmentSolver,
+                                       SolverSession,
+                                       SOLVERS,
+                                       available_solvers,
+                                       calibrate_solvers,
+                                       get_default_solver,
+                                       get_solver,
+                                       split_components)
+from pygamma_agreement.storage import ScratchStorage
+
+SOLVER_CLASSES = [solver_class for solver_class in (HighsAlignmentSolver, CBCAlignmentSolver, GLPKAlignmentSolver)
+                  if solver_class.is_available()]
+
+
+def test_default_solver():
+    solver = get_default_solver()
+    assert solver.is_available()
+    if HighsAlignmentSolver.is_available():
+        assert isinstance(solver, HighsAlignmentSolver)
+
+
+@pytest.mark.parametrize("solver_class", SOLVER_CLASSES)
+def test_solvers_agree(solver_class):
+    continuum = Continuum.from_csv(Path("tests/data/3by100.csv"))
+    dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1)
+
+    reference = continuum.get_best_alignment(dissim, solver=SOLVER_CLASSES[0]())
+    alignment = continuum.get_best_alignment(dissim, solver=solver_class())
+    alignment.check()
+    assert alignment.disorder == pytest.approx(reference.disorder, abs=1e-6)
+    assert alignment.compute_disorder(dissim) == pytest.approx(reference.disorder, abs=1e-5)
+
+    # ties between best alignments are resolved the same way whatever the solver
+    continuum = Continuum.from_csv(Path("tests/data/AlexPaulSuzan.csv"))
+    alignment = continuum.get_best_alignment(dissim, solver=solver_class())
+    assert len(alignment.unitary_alignments) == 6
+    assert alignment.disorder == pytest.approx(0.96, 0.01)
+
+    soft_alignment = continuum.get_best_soft_alignment(dissim, solver=solver_class())
+    soft_alignment.check()
+    assert soft_alignment.disorder <= alignment.disorder + 1e-6
+
+
+def test_solver_registry():
+    assert isinstance(get_solver(None), AutoAlignmentSolver)
+    assert isinstance(get_solver("auto"), AutoAlignmentSolver)
+    for name in available_solvers():
+        assert isinstance(get_solver(name), SOLVERS[name])
+    solver = GLPKAlignmentSolver()
+    assert get_solver(solver) is solver
+    with pytest.raises(ValueError):
+        get_solver("lpsolve")
+
+
+def test_auto_solver_selection():
+    installed = available_solvers()
+    small, big = installed[-1], installed[0]
+    auto = AutoAlignmentSolver({"crossovers": {"2": [[100, small], [None, big]],
+                                               "4": [[None, small]]}})
+    assert isinstance(auto.select(10, 2, 50), SOLVERS[small])
+    assert isinstance(auto.select(10, 2, 5000), SOLVERS[big])
+    assert isinstance(auto.select(100, 5, 5000), SOLVERS[small])
+    # without calibration data, the preferred solver is used
+    assert isinstance(AutoAlignmentSolver({}).select(10, 3, 50), NativeAlignmentSolver)
+    assert isinstance(AutoAlignmentSolver({}).select(10, 3, 5000), type(get_default_solver()))
+    assert isinstance(AutoAlignmentSolver({}).select(10, 2, 50), MatchingAlignmentSolver)
+    assert isinstance(AutoAlignmentSolver({}).select(10, 2, 50, soft=True), type(get_default_solver()))
+
+    continuum = Continuum.from_csv(Path("tests/data/AlexPaulSuzan.csv"))
+    dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1)
+    np.random.seed(4772)
+    gamma_results = continuum.compute_gamma(dissim, solver=auto)
+    assert gamma_results.best_alignment.disorder == pytest.approx(0.96, 0.01)
+
+
+def test_calibrate_solvers(tmp_path):
+    output_path = tmp_path / "calibration.json"
+    calibration = calibrate_solvers(nb_annotators=(2,), nb_units=(3, 6), repeats=1, output_path=output_path)
+    assert output_path.is_file()
+    assert len(calibration["timings"]) == 2
+    crossovers = calibration["crossovers"]["2"]
+    assert crossovers[-1][0] is None
+    assert all(solver in available_solvers() for _, solver in crossovers)
+
+    auto = AutoAlignmentSolver(output_path)
+    assert auto.crossovers[2] == [tuple(crossover) for crossover in crossovers]
+
+
+def test_components_decomposition():
+    continuum = Continuum.from_csv(Path("tests/data/3by100.csv"))
+    dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1)
+    disorders, possible_unitary_alignments = dissim.valid_alignments(continuum)
+    sizes = np.array([len(continuum[annotator]) for annotator in continuum.annotators], dtype=np.int32)
+    A = _build_constraint_matrix(possible_unitary_alignments, sizes)
+
+    trivial, problems = split_components(A, batch_size=1)
+    assert len(problems) > 1
+    candidates = np.concatenate([trivial] + [problem_candidates for problem_candidates, _ in problems])
+    assert len(np.unique(candidates)) == len(candidates) == len(disorders)
+    for problem_candidates, sub_A in problems:
+        # units of a sub-problem are only used by its own possible unitary alignments
+        assert sub_A.shape[0] == len(np.unique(A[:, problem_candidates].indices))
+        assert sub_A.nnz == A[:, problem_candidates].nnz
+
+    solver = SOLVER_CLASSES[0]
+    monolithic = solver(decompose=False).solve(disorders, A)
+    decomposed = solver(n_jobs=2).solve(disorders, A)
+    assert disorders[decomposed].sum() == pytest.approx(disorders[monolithic].sum(), abs=1e-5)
+    assert set(decomposed) == set(monolithic)
+
+
+def test_matching_solver():
+    dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1)
+    continuum = Continuum.from_csv(Path("tests/data/2by1000.csv"))
+    reference = continuum.get_best_alignment(dissim, solver=SOLVER_CLASSES[0]())
+    alignment = continuum.get_best_alignment(dissim, solver="matching")
+    alignment.check()
+    assert alignment.disorder == pytest.approx(reference.disorder, abs=1e-6)
+    assert len(alignment.unitary_alignments) == len(reference.unitary_alignments)
+    assert alignment.compute_disorder(dissim) == pytest.approx(reference.disorder, abs=1e-5)
+
+    continuum = Continuum.from_csv(Path("tests/data/AlexPaulSuzan.csv"))
+    with pytest.raises(ValueError):
+        continuum.get_best_alignment(dissim, solver="matching")
+    with pytest.raises(ValueError):
+        continuum.get_best_soft_alignment(dissim, solver="matching")
+
+
+def test_native_solver():
+    dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1)
+    for path in ("tests/data/3by100.csv", "tests/data/AlexPaulSuzan.csv"):
+        continuum = Continuum.from_csv(Path(path))
+        reference = continuum.get_best_alignment(dissim, solver=SOLVER_CLASSES[0]())
+        alignment = continuum.get_best_alignment(dissim, solver="native")
+        alignment.check()
+        assert alignment.disorder == pytest.approx(reference.disorder, abs=1e-6)
+        assert len(alignment.unitary_alignments) == len(reference.unitary_alignments)
+
+    # the incumbent is kept if it is optimal
+    disorders, possible_unitary_alignments = dissim.valid_alignments(continuum)
+    sizes = np.array([len(continuum[annotator]) for annotator in continuum.annotators], dtype=np.int32)
+    A = _build_constraint_matrix(possible_unitary_alignments, sizes)
+    best = NativeAlignmentSolver().solve(disorders, A)
+    assert set(NativeAlignmentSolver().solve(disorders, A, incumbent=best)) == set(best)
+
+    with pytest.raises(ValueError):
+        continuum.get_best_soft_alignment(dissim, solver="native")
+
+
+def test_lp_first():
+    continuum = Continuum.from_csv(Path("tests/data/3by100.csv"))
+    dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1)
+    reference = continuum.get_best_alignment(dissim, solver=SOLVER_CLASSES[0]())
+    assert reference.solver_report.paths.get("relaxation", 0) == 0
+
+    for solver_class in SOLVER_CLASSES + [NativeAlignmentSolver, AutoAlignmentSolver]:
+        alignment = continuum.get_best_alignment(dissim, solver=solver_class(lp_first=True))
+        assert alignment.disorder == pytest.approx(reference.disorder, abs=1e-6)
+        assert len(alignment.unitary_alignments) == len(reference.unitary_alignments)
+        report = alignment.solver_report
+        assert report.nb_candidates == reference.solver_report.nb_candidates
+        assert report.paths.get("relaxation", 0) > 0
+
+    soft_alignment = continuum.get_best_soft_alignment(dissim, solver=get_solver("highs", lp_first=True))
+    soft_alignment.check()
+
+    # options are set on a copy of solver instances
+    solver = get_solver(HighsAlignmentSolver(), lp_first=True)
+    assert solver.lp_first and isinstance(solver, HighsAlignmentSolver)
+    assert get_solver(solver, lp_first=None) is solver
+
+
+@pytest.mark.parametrize("solver_class", SOLVER_CLASSES + [AutoAlignmentSolver])
+def test_solver_session(solver_class):
+    continuum = Continuum.from_csv(Path("tests/data/AlexPaulSuzan.csv"))
+    dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1)
+    disorders, possible_unitary_alignments = dissim.valid_alignments(continuum)
+    A = _build_constraint_matrix(possible_unitary_alignments,
+                                 np.array([len(continuum[annotator]) for annotator in continuum.annotators],
+                                          dtype=np.int32))
+    solver = solver_class()
+    with solver.session() as session:
+        assert get_solver(session) is session
+        # The same constraints with different disorders : the session's problem objects are reused
+        for factor in (1.0, 1.5, 1.0, 0.5):
+            scaled = (disorders * np.linspace(factor, 1.0, len(disorders))).astype(np.float32)
+            reference = solver.solve(scaled, A)
+            assert np.array_equal(session.solve(scaled, A), reference)
+            assert np.array_equal(session.solve(scaled, A, incumbent=reference), reference)
+        assert isinstance(get_solver(session, lp_first=True), SolverSession)
+
+    reference = continuum.get_best_alignment(dissim, solver=solver)
+    alignment = continuum.get_best_alignment(dissim, solver=solver.session())
+    assert alignment.disorder == pytest.approx(reference.disorder, abs=1e-6)
+
+
+def test_time_limit_and_gap():
+    continuum = Continuum.from_csv(Path("tests/data/3by100.csv"))
+    dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1)
+    reference = continuum.get_best_alignment(dissim, solver=HighsAlignmentSolver())
+    assert reference.gap == 0.
+    assert reference.solver_report.lower_bound == pytest.approx(reference.solver_report.disorder)
+
+    for solver, max_gap in ((HighsAlignmentSolver(time_limit=0.), 1.),
+                            (NativeAlignmentSolver(time_limit=0.), 1.),
+                            (NativeAlignmentSolver(mip_gap=0.1), 0.1),
+                            (AutoAlignmentSolver(mip_gap=0.1), 0.1),
+                            (HighsAlignmentSolver(time_limit=0.).session(), 1.)):
+        alignment = continuum.get_best_alignment(dissim, solver=solver)
+        alignment.check()
+        report = alignment.solver_report
+        # The lower bound is valid, and the gap is consistent with it
+        assert report.lower_bound <= reference.solver_report.disorder + 1e-6
+        assert alignment.disorder >= reference.disorder - 1e-6
+        assert alignment.gap == pytest.approx(max(report.disorder - report.lower_bound, 0) / report.disorder,
+                                              abs=1e-5)
+        assert alignment.gap <= max_gap + 1e-6
+
+    gamma_results = continuum.compute_gamma(dissim, n_samples=2, solver="highs", time_limit=60, mip_gap=0.)
+    assert gamma_results.best_alignment.gap == 0.
+    assert get_solver("auto", time_limit=60, mip_gap=0.5).mip_gap == 0.5
+
+
+def test_scratch_storage(tmp_path):
+    continuum = Continuum.from_csv(Path("tests/data/3by100.csv"))
+    dissim = CombinedCategoricalDissimilarity(alpha=3, beta=1)
+    sizes = np.array([len(continuum[annotator]) for annotator in continuum.annotators], dtype=np.int32)
+    disorders, possible_unitary_alignments = dissim.valid_alignments(continuum)
+    A = _build_constraint_matrix(possible_unitary_alignments, sizes)
+
+    # Every array exceeds an empty memory budget : they are all memory-mapped
+    storage = ScratchStorage(memory_budget=0, scratch_dir=tmp_path)
+    stored_disorders, stored_alignments = dissim.valid_alignments(continuum, storage=storage)
+    assert isinstance(stored_disorders.base, np.memmap) and isinstance(stored_alignments.base, np.memmap)
+    assert np.array_equal(stored_disorders, disorders)
+    assert np.array_equal(stored_alignments, possible_unitary_alignments)
+    stored_A = _build_constraint_matrix(stored_alignments, sizes, storage)
+    assert (stored_A != A).nnz == 0
+
+    reference = continuum.get_best_alignment(dissim)
+    alignment = continuum.get_best_alignment(dissim, storage=storage, warm_start=True)
+    alignment.check()
+    assert alignment.disorder == pytest.approx(reference.disorder, abs=1e-6)
+    assert len(alignment.unitary_alignments) == len(reference.unitary_alignments)
+    soft_alignment = continuum.get_best_soft_alignment(dissim, storage=storage)
+    assert soft_alignment.disorder <= alignment.disorder + 1e-6
+
+    np.random.seed(4772)
+    reference = continuum.compute_gamma(dissim, n_samples=3)
+    np.random.seed(4772)
+    assert continuum.compute_gamma(dissim, n_samples=3, storage=storage).gamma == pytest.approx(reference.gamma)
+    # Arrays that fit in the budget are kept in memory, as long as their total size fits in it
+    small_storage = ScratchStorage(memory_budget=600)
+    kept = small_storage.empty(100, np.float32)
+    assert kept.base is None and small_storage.nbytes == 400
+    assert isinstance(small_storage.empty(100, np.float32).base, np.memmap)
+    del kept
+    assert small_storage.nbytes == 0
+    assert small_storage.empty(100, np.float32).base is None
+
+    del stored_disorders, stored_alignments, stored_A, alignment, soft_alignment
+    assert not list(tmp_path.iterdir())